@@ -1,3 +1,4 @@
+import os
 from logging.config import fileConfig
 
 from sqlalchemy import engine_from_config
@@ -19,6 +20,7 @@ from app.db.base_class import Base
 # 导入你所有的模型，以便 Base.metadata 知道它们
 # (这一步是必需的!)
 from app.models import models
+from app.db.sqlite import is_sqlite_url, sync_database_url
 
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
@@ -29,6 +31,14 @@ config = context.config
 if config.config_file_name is not None:
     fileConfig(config.config_file_name)
 
+# 设置了 DATABASE_URL 环境变量时优先使用 (与应用一致，如 sqlite+aiosqlite:///./xince.sqlite3)，
+# 异步驱动换成对应的同步驱动
+if os.environ.get("DATABASE_URL"):
+    config.set_main_option("sqlalchemy.url", sync_database_url(os.environ["DATABASE_URL"]))
+
+# SQLite 不支持大部分 ALTER TABLE，使用 batch 模式 (复制表) 执行结构变更
+RENDER_AS_BATCH = is_sqlite_url(config.get_main_option("sqlalchemy.url"))
+
 # add your model's MetaData object here
 # for 'autogenerate' support
 # from myapp import mymodel
@@ -59,6 +69,7 @@ def run_migrations_offline() -> None:
         target_metadata=target_metadata,
         literal_binds=True,
         dialect_opts={"paramstyle": "named"},
+        render_as_batch=RENDER_AS_BATCH,
     )
 
     with context.begin_transaction():
@@ -80,7 +91,8 @@ def run_migrations_online() -> None:
 
     with connectable.connect() as connection:
         context.configure(
-            connection=connection, target_metadata=target_metadata
+            connection=connection, target_metadata=target_metadata,
+            render_as_batch=RENDER_AS_BATCH,
         )
 
         with context.begin_transaction():
@@ -0,0 +1,28 @@
+"""Add tests.scoring_spec
+
+Revision ID: 3c9a1f2e7b40
+Revises: 09ebfb649241
+Create Date: 2026-10-17 10:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3c9a1f2e7b40'
+down_revision: Union[str, Sequence[str], None] = '09ebfb649241'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('tests', sa.Column('scoring_spec', sa.JSON(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_column('tests', 'scoring_spec')
@@ -0,0 +1,33 @@
+"""Add write_behind_checkpoints for idempotent spool replay
+
+Revision ID: 5b8e2d4f9a16
+Revises: f4b27c8e1d60
+Create Date: 2026-10-17 23:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b8e2d4f9a16'
+down_revision: Union[str, Sequence[str], None] = 'f4b27c8e1d60'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'write_behind_checkpoints',
+        sa.Column('spool_id', sa.String(length=64), nullable=False),
+        sa.Column('seq', sa.BigInteger(), nullable=False),
+        sa.PrimaryKeyConstraint('spool_id')
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('write_behind_checkpoints')
@@ -0,0 +1,45 @@
+"""Add test_stats counters
+
+Revision ID: 7d2e5b8c1a93
+Revises: 3c9a1f2e7b40
+Create Date: 2026-10-17 11:05:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '7d2e5b8c1a93'
+down_revision: Union[str, Sequence[str], None] = '3c9a1f2e7b40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'test_stats',
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('session_count', sa.Integer(), server_default='0', nullable=False),
+        sa.Column('updated_at', sa.TIMESTAMP(), server_default=sa.text('CURRENT_TIMESTAMP'), nullable=True),
+        sa.ForeignKeyConstraint(['test_id'], ['tests.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('test_id')
+    )
+    op.create_index('idx_test_stats_session_count', 'test_stats', ['session_count'], unique=False)
+
+    # 用历史数据初始化计数
+    op.execute(
+        "INSERT INTO test_stats (test_id, session_count) "
+        "SELECT tests.id, COUNT(test_sessions.id) FROM tests "
+        "LEFT OUTER JOIN test_sessions ON test_sessions.test_id = tests.id "
+        "GROUP BY tests.id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_test_stats_session_count', table_name='test_stats')
+    op.drop_table('test_stats')
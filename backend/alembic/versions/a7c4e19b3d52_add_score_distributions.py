@@ -0,0 +1,51 @@
+"""Add score_distributions histograms
+
+Revision ID: a7c4e19b3d52
+Revises: e58a3d71c2f4
+Create Date: 2026-10-17 16:20:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7c4e19b3d52'
+down_revision: Union[str, Sequence[str], None] = 'e58a3d71c2f4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'score_distributions',
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('dimension_code', sa.String(length=10), server_default='', nullable=False),
+        sa.Column('score', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('session_count', sa.Integer(), server_default='0', nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['tests.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('test_id', 'dimension_code', 'score')
+    )
+
+    # 用历史数据初始化：总分与逐行存储的维度
+    # (紧凑存储的会话维度需要运行 python -m app.cli.rebuild_score_distributions)
+    op.execute(
+        "INSERT INTO score_distributions (test_id, dimension_code, score, session_count) "
+        "SELECT test_id, '', total_score, COUNT(*) FROM test_sessions "
+        "GROUP BY test_id, total_score"
+    )
+    op.execute(
+        "INSERT INTO score_distributions (test_id, dimension_code, score, session_count) "
+        "SELECT test_sessions.test_id, test_session_dimensions.dimension_code, "
+        "test_session_dimensions.score, COUNT(*) FROM test_session_dimensions "
+        "JOIN test_sessions ON test_sessions.id = test_session_dimensions.session_id "
+        "GROUP BY test_sessions.test_id, test_session_dimensions.dimension_code, test_session_dimensions.score"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('score_distributions')
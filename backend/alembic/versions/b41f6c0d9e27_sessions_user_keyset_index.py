@@ -0,0 +1,31 @@
+"""Composite index for keyset pagination of user sessions
+
+Revision ID: b41f6c0d9e27
+Revises: 7d2e5b8c1a93
+Create Date: 2026-10-17 11:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b41f6c0d9e27'
+down_revision: Union[str, Sequence[str], None] = '7d2e5b8c1a93'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index('idx_sessions_user_created', 'test_sessions', ['user_id', 'created_at', 'id'], unique=False)
+    # 组合索引的前缀已覆盖 user_id 单列索引
+    op.drop_index(op.f('ix_test_sessions_user_id'), table_name='test_sessions')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index(op.f('ix_test_sessions_user_id'), 'test_sessions', ['user_id'], unique=False)
+    op.drop_index('idx_sessions_user_created', table_name='test_sessions')
@@ -0,0 +1,42 @@
+"""Explicit indexes on foreign key columns
+
+Revision ID: c3e81f5a6d07
+Revises: a7c4e19b3d52
+Create Date: 2026-10-17 17:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c3e81f5a6d07'
+down_revision: Union[str, Sequence[str], None] = 'a7c4e19b3d52'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# MySQL 会为外键列隐式建索引，SQLite 不会 (按 session_id / test_id 的 IN 查询会全表扫描)。
+# 显式建立后 MySQL 会自动丢弃原来的隐式索引。
+_INDEXES = [
+    ('ix_user_answers_session_id', 'user_answers', 'session_id'),
+    ('ix_questions_test_id', 'questions', 'test_id'),
+    ('ix_question_options_question_id', 'question_options', 'question_id'),
+    ('ix_test_results_test_id', 'test_results', 'test_id'),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for name, table, column in _INDEXES:
+        op.create_index(name, table, [column], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # MySQL 上这些索引已在支撑外键约束，不能删除
+    if op.get_bind().dialect.name == 'mysql':
+        return
+    for name, table, _ in reversed(_INDEXES):
+        op.drop_index(name, table_name=table)
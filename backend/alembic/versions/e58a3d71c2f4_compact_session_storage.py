@@ -0,0 +1,31 @@
+"""Compact session storage columns
+
+Revision ID: e58a3d71c2f4
+Revises: b41f6c0d9e27
+Create Date: 2026-10-17 12:10:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e58a3d71c2f4'
+down_revision: Union[str, Sequence[str], None] = 'b41f6c0d9e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('test_sessions', sa.Column('answers_packed', sa.LargeBinary(), nullable=True))
+    op.add_column('test_sessions', sa.Column('dimensions_packed', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # 注意：降级前需先用 `python -m app.cli.pack_sessions --unpack` 把紧凑会话还原为逐行存储
+    op.drop_column('test_sessions', 'dimensions_packed')
+    op.drop_column('test_sessions', 'answers_packed')
@@ -0,0 +1,45 @@
+"""Add archived_sessions index for cold session archives
+
+Revision ID: f4b27c8e1d60
+Revises: c3e81f5a6d07
+Create Date: 2026-10-17 21:40:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f4b27c8e1d60'
+down_revision: Union[str, Sequence[str], None] = 'c3e81f5a6d07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'archived_sessions',
+        sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('user_id', sa.String(length=255), nullable=False),
+        sa.Column('test_id', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.TIMESTAMP(), nullable=True),
+        sa.Column('archive', sa.String(length=255), nullable=False),
+        sa.Column('member_offset', sa.BigInteger(), nullable=False),
+        sa.Column('member_length', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['test_id'], ['tests.id']),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_archived_sessions_test_id'), 'archived_sessions', ['test_id'], unique=False)
+    op.create_index(
+        'idx_archived_sessions_user_created', 'archived_sessions', ['user_id', 'created_at', 'id'], unique=False
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('idx_archived_sessions_user_created', table_name='archived_sessions')
+    op.drop_index(op.f('ix_archived_sessions_test_id'), table_name='archived_sessions')
+    op.drop_table('archived_sessions')
@@ -1,13 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException
+import logging
+from datetime import datetime
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from typing import List, Union
-from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from typing import List, Optional, Union
 
+from app.core.admin import require_admin
+from app.core.config import settings
+from app.core.fast_json import FastJSONResponse
+from app.core.http_cache import encoded_json_response
+from app.core.rate_limit import charge
 from app.db.session import get_db
 from app.schemas import schemas
-from app.services import test_service, session_service 
-from app.models.models import TestSession 
+from app.services import (
+    distribution_service, export_service, import_service, test_service, session_service, write_behind
+)
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
@@ -18,12 +27,30 @@ async def create_new_test(
     test_in: schemas.TestCreate, 
     db: AsyncSession = Depends(get_db)
 ):
-    existing_test = await test_service.get_test_by_type(db, test_in.test_type)
-    if existing_test:
+    # 只查唯一索引判断是否存在，不加载整套题目
+    existing = await test_service.get_test_ids_by_type(db, [test_in.test_type])
+    if existing:
         raise HTTPException(status_code=400, detail=f"Test with type '{test_in.test_type}' already exists.")
     db_test = await test_service.create_test(db=db, test=test_in)
     return db_test
 
+@router.post("/tests/import", response_model=List[schemas.TestImportResult])
+async def import_tests(
+    request: Request,
+    import_in: schemas.TestImport,
+    db: AsyncSession = Depends(get_db)
+):
+    # 按 test_type upsert 多个测试定义；已存在的测试只写入差异，逐条返回结果或错误
+    if not import_in.tests:
+        raise HTTPException(status_code=400, detail="No tests in import")
+    if len(import_in.tests) > settings.TEST_IMPORT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Import too large: at most {settings.TEST_IMPORT_MAX_ITEMS} tests per request."
+        )
+    await charge(request, settings.RATE_LIMIT_IMPORT_ITEM_COST * len(import_in.tests))
+    return await import_service.import_tests(db=db, tests=import_in.tests)
+
 @router.get("/tests/popular", response_model=List[schemas.PopularTest])
 async def get_popular_tests(db: AsyncSession = Depends(get_db)):
     popular_tests = await test_service.get_popular_tests(db=db, limit=6)
@@ -31,14 +58,28 @@ async def get_popular_tests(db: AsyncSession = Depends(get_db)):
 
 @router.get("/tests/{test_type}", response_model=Union[schemas.Test, schemas.TestForTaking])
 async def get_test_for_taking(
+    request: Request,
     test_type: str, 
     include_scores: bool = False, 
     db: AsyncSession = Depends(get_db)
 ):
-    db_test = await test_service.get_test_by_type(db=db, test_type=test_type, include_scores=include_scores)
-    if db_test is None:
+    # 直接返回预序列化、预压缩的响应体；客户端带 If-None-Match 命中时返回 304
+    payload = await test_service.get_test_payload(db=db, test_type=test_type, include_scores=include_scores)
+    if payload is None:
         raise HTTPException(status_code=404, detail="Test not found")
-    return db_test
+    return encoded_json_response(request, payload, cache_control=settings.TEST_PAYLOAD_CACHE_CONTROL)
+
+@router.get("/tests/{test_id}/distribution", response_model=schemas.ScoreDistribution)
+async def get_score_distribution(
+    test_id: int,
+    dimension_code: Optional[str] = None,
+    score: Optional[int] = None,
+    db: AsyncSession = Depends(get_db)
+):
+    # 读取增量维护的直方图 (score_distributions)，不扫描会话表；dimension_code 为空时为总分分布
+    return await distribution_service.get_score_distribution(
+        db=db, test_id=test_id, dimension_code=dimension_code, score=score
+    )
 
 # --- Session/Submission Endpoints ---
 
@@ -48,55 +89,134 @@ async def submit_test(
     submission_in: schemas.TestSubmission,
     db: AsyncSession = Depends(get_db)
 ):
+    # FAST_JSON_RESPONSES：service 直接返回 dict，由 FastJSONResponse 编码，不再经过 response_model 校验
+    fast = settings.FAST_JSON_RESPONSES
     try:
-        result_session = await session_service.calculate_and_save_session(
-            db=db, test_id=test_id, submission=submission_in
-        )
-        return result_session
+        if settings.SUBMIT_WRITE_BEHIND:
+            # 先返回计分结果，会话由后台批量写库 (此时响应中的 id 为空)
+            result_session = await write_behind.calculate_and_queue_session(
+                db=db, test_id=test_id, submission=submission_in, as_dict=fast
+            )
+        else:
+            result_session = await session_service.calculate_and_save_session(
+                db=db, test_id=test_id, submission=submission_in, as_dict=fast
+            )
+        return FastJSONResponse(result_session) if fast else result_session
     except HTTPException as e:
         raise e
-    except Exception as e:
-        print(f"An unexpected error occurred: {e}")
+    except Exception:
+        logger.exception("submission for test %s failed", test_id)
         raise HTTPException(status_code=500, detail="An internal error occurred while processing the submission.")
 
+@router.post("/sessions/batch", response_model=List[schemas.BatchSubmissionResult])
+async def submit_tests_batch(
+    request: Request,
+    batch_in: schemas.BatchSubmission,
+    db: AsyncSession = Depends(get_db)
+):
+    # 离线收集的多份问卷一次上传，可以跨多个测试；逐条返回结果或错误
+    if not batch_in.items:
+        raise HTTPException(status_code=400, detail="No submissions in batch")
+    if len(batch_in.items) > settings.BATCH_SUBMIT_MAX_ITEMS:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch too large: at most {settings.BATCH_SUBMIT_MAX_ITEMS} submissions per request."
+        )
+    # 限流：按条目数扣减令牌 (中间件对该路由不扣减)
+    await charge(request, settings.RATE_LIMIT_BATCH_ITEM_COST * len(batch_in.items))
+    fast = settings.FAST_JSON_RESPONSES
+    try:
+        results = await session_service.calculate_and_save_sessions(db=db, items=batch_in.items, as_dict=fast)
+        return FastJSONResponse(results) if fast else results
+    except HTTPException as e:
+        raise e
+    except Exception:
+        logger.exception("batch submission of %d items failed", len(batch_in.items))
+        raise HTTPException(status_code=500, detail="An internal error occurred while processing the batch.")
+
+@router.get("/sessions/export", dependencies=[Depends(require_admin)])
+async def export_sessions(
+    fmt: str = Query("ndjson", alias="format", pattern="^(ndjson|csv)$"),
+    test_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    gzip: bool = False,
+    include_archived: bool = True
+):
+    # 流式导出会话 (含答案和维度)，边读边发；需要管理令牌，每个 worker 的并发导出数有上限。
+    # 生成器每批短暂借用一个数据库连接，不使用请求级 session
+    slots = export_service.export_slots
+    if slots.locked():
+        raise HTTPException(
+            status_code=503, detail="Too many concurrent exports, retry later", headers={"Retry-After": "30"}
+        )
+
+    async def chunks():
+        # 开始输出时才占用名额，输出结束、出错或客户端断开时归还；
+        # 响应体没有开始迭代 (客户端提前断开、发送响应头失败等) 时不占用名额
+        async with slots:
+            async for chunk in export_service.export_chunks(
+                fmt=fmt, test_id=test_id, created_from=created_from, created_to=created_to, compress=gzip,
+                include_archived=include_archived
+            ):
+                yield chunk
+
+    filename = f"sessions.{fmt}" + (".gz" if gzip else "")
+    return StreamingResponse(
+        chunks(),
+        media_type="application/gzip" if gzip else export_service.MEDIA_TYPES[fmt],
+        headers={
+            "Content-Disposition": f'attachment; filename="{filename}"',
+            # 提示反向代理不要缓冲整个响应
+            "X-Accel-Buffering": "no",
+        },
+    )
+
 @router.get("/sessions/{session_id}", response_model=schemas.TestSession)
 async def get_session_result(
+    request: Request,
     session_id: int,
     db: AsyncSession = Depends(get_db)
 ):
-    stmt = (
-        select(TestSession)
-        .where(TestSession.id == session_id)
-        # [关键修复] 添加了 selectinload(TestSession.dimensions)
-        .options(
-            selectinload(TestSession.answers),
-            selectinload(TestSession.dimensions) 
-        )
-    )
-    result = await db.execute(stmt)
-    session = result.scalars().first()
+    # 会话写入后不再变化：命中结果缓存时不访问数据库，响应带 ETag 与 Cache-Control: immutable
+    if settings.SESSION_RESULT_CACHE_MAX_BYTES > 0:
+        payload = await session_service.get_session_payload(db=db, session_id=session_id)
+        if payload is None:
+            raise HTTPException(status_code=404, detail="Session not found")
+        return encoded_json_response(request, payload, cache_control=settings.SESSION_RESULT_CACHE_CONTROL)
+
+    # 预加载答案和维度；紧凑存储的会话由 service 透明解码
+    fast = settings.FAST_JSON_RESPONSES
+    session = await session_service.get_session(db=db, session_id=session_id, as_dict=fast)
     
     if session is None:
         raise HTTPException(status_code=404, detail="Session not found")
         
-    return session
+    return FastJSONResponse(session) if fast else session
 
-@router.get("/users/{user_id}/sessions", response_model=List[schemas.TestSession])
+@router.get("/sessions/{session_id}/percentiles", response_model=schemas.SessionPercentiles)
+async def get_session_percentiles(
+    session_id: int,
+    db: AsyncSession = Depends(get_db)
+):
+    # "和其他人相比如何"：本次总分及各维度分在同一测试所有会话中的百分位
+    session = await session_service.get_session(db=db, session_id=session_id, include_answers=False)
+    if session is None:
+        raise HTTPException(status_code=404, detail="Session not found")
+    histograms = await distribution_service.get_histograms(db, session.test_id)
+    return distribution_service.session_percentiles(session, histograms)
+
+@router.get("/users/{user_id}/sessions", response_model=schemas.TestSessionPage)
 async def get_user_sessions(
     user_id: str,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    include_answers: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
-    stmt = (
-        select(TestSession)
-        .where(TestSession.user_id == user_id)
-        # [关键修复] 添加了 selectinload(TestSession.dimensions)
-        .options(
-            selectinload(TestSession.answers),
-            selectinload(TestSession.dimensions)
-        )
-        .order_by(TestSession.created_at.desc())
+    # keyset 分页：把上一页返回的 next_cursor 作为 cursor 传入获取下一页
+    fast = settings.FAST_JSON_RESPONSES
+    page = await session_service.get_user_sessions(
+        db=db, user_id=user_id, limit=limit, cursor=cursor, include_answers=include_answers, as_dict=fast
     )
-    result = await db.execute(stmt)
-    sessions = result.scalars().all()
-    
-    return sessions
\ No newline at end of file
+    return FastJSONResponse(page) if fast else page
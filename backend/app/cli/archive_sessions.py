@@ -0,0 +1,47 @@
+"""
+把早于指定天数的会话移出 test_sessions / user_answers，归档到 ARCHIVE_DIR 下的压缩文件。
+归档后的会话仍可通过导出、用户历史和 GET /sessions/{session_id} 读取。
+
+用法 (在 backend 目录下):
+    python -m app.cli.archive_sessions [--older-than-days 365] [--batch-size 500]
+    python -m app.cli.archive_sessions --older-than-days 180 --dry-run
+"""
+import argparse
+import asyncio
+from datetime import timedelta
+
+from app.core.clock import utc_now
+from app.core.config import settings
+from app.db.session import AsyncSessionLocal
+from app.services.archive_service import archive_session_batch, count_archivable
+
+
+async def main(args: argparse.Namespace) -> None:
+    # created_at 按 UTC 保存
+    cutoff = utc_now() - timedelta(days=args.older_than_days)
+    if args.dry_run:
+        async with AsyncSessionLocal() as db:
+            count = await count_archivable(db, cutoff)
+        print(f"{count} sessions created before {cutoff.isoformat()} would be archived")
+        return
+
+    total = 0
+    last_id = 0
+    while True:
+        # 每批一个事务，中断后重新运行会从未归档的会话继续
+        async with AsyncSessionLocal() as db:
+            count, last_id = await archive_session_batch(db, cutoff, last_id, args.batch_size)
+            await db.commit()
+        if count == 0:
+            break
+        total += count
+        print(f"archived {total} sessions (last id {last_id})")
+    print(f"done: {total} sessions created before {cutoff.isoformat()} archived to {settings.ARCHIVE_DIR}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--older-than-days", type=int, default=settings.ARCHIVE_MIN_AGE_DAYS)
+    parser.add_argument("--batch-size", type=int, default=settings.ARCHIVE_BATCH_SIZE)
+    parser.add_argument("--dry-run", action="store_true", help="只统计将被归档的会话数")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,49 @@
+"""
+流式导出会话 (含答案和维度) 为 NDJSON 或 CSV，可选 gzip；内存占用与数据量无关。
+
+用法 (在 backend 目录下):
+    python -m app.cli.export_sessions --format csv --test-id 3 --from 2026-01-01 --to 2026-02-01 -o jan.csv.gz --gzip
+    python -m app.cli.export_sessions > sessions.ndjson
+    python -m app.cli.export_sessions --no-archived > hot.ndjson
+"""
+import argparse
+import asyncio
+import sys
+from datetime import datetime
+
+from app.services.export_service import EXPORT_FORMATS, export_chunks
+
+
+async def main(args: argparse.Namespace) -> None:
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    written = 0
+    try:
+        async for chunk in export_chunks(
+            fmt=args.format,
+            test_id=args.test_id,
+            created_from=args.created_from,
+            created_to=args.created_to,
+            compress=args.gzip,
+            batch_size=args.batch_size,
+            include_archived=not args.no_archived,
+        ):
+            out.write(chunk)
+            written += len(chunk)
+        out.flush()
+    finally:
+        if args.output:
+            out.close()
+    print(f"exported {written} bytes", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="ndjson")
+    parser.add_argument("--test-id", type=int)
+    parser.add_argument("--from", dest="created_from", type=datetime.fromisoformat, help="起始时间 (含)")
+    parser.add_argument("--to", dest="created_to", type=datetime.fromisoformat, help="结束时间 (不含)")
+    parser.add_argument("--gzip", action="store_true")
+    parser.add_argument("--batch-size", type=int)
+    parser.add_argument("--no-archived", action="store_true", help="不包含已归档的会话")
+    parser.add_argument("-o", "--output", help="输出文件，默认写到标准输出")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,65 @@
+"""
+从 JSON / YAML 文件批量导入测试定义 (按 test_type upsert，已存在的测试只写入差异)。
+文件内容为测试定义的列表，或 {"tests": [...]}；格式与 POST /tests 的请求体相同。
+
+用法 (在 backend 目录下):
+    python -m app.cli.import_tests scales.yaml more_scales.json [--dry-run]
+"""
+import argparse
+import asyncio
+import json
+import sys
+from pathlib import Path
+from typing import List
+
+try:
+    import yaml  # (可选依赖) 没有安装时只支持 JSON
+except ImportError:
+    yaml = None
+
+from pydantic import ValidationError
+
+from app.db.session import AsyncSessionLocal
+from app.schemas import schemas
+from app.services.import_service import import_tests
+
+
+def load_definitions(path: Path) -> List[schemas.TestCreate]:
+    text = path.read_text(encoding="utf-8")
+    if path.suffix.lower() in (".yaml", ".yml"):
+        if yaml is None:
+            raise SystemExit(f"{path}: reading YAML requires PyYAML (pip install pyyaml)")
+        data = yaml.safe_load(text)
+    else:
+        data = json.loads(text)
+    if isinstance(data, dict):
+        data = data.get("tests", [])
+    try:
+        return schemas.TestImport(tests=data).tests
+    except ValidationError as e:
+        raise SystemExit(f"{path}: {e}")
+
+
+async def main(args: argparse.Namespace) -> None:
+    tests = [t for path in args.files for t in load_definitions(Path(path))]
+    async with AsyncSessionLocal() as db:
+        results = await import_tests(db, tests)
+        if args.dry_run:
+            await db.rollback()
+        else:
+            await db.commit()
+
+    for r in results:
+        detail = r.error if r.status == "error" else (f"{r.changes} changes" if r.status == "updated" else "")
+        print(f"{r.test_type:<24} {r.status:<9} {r.test_id or '':<6} {detail}")
+    counts = {status: sum(r.status == status for r in results) for status in ("created", "updated", "unchanged", "error")}
+    print(", ".join(f"{status}: {n}" for status, n in counts.items()) + (" (dry run)" if args.dry_run else ""))
+    if counts["error"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("files", nargs="+", help="JSON / YAML 文件")
+    parser.add_argument("--dry-run", action="store_true", help="只计算结果，不提交")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,53 @@
+"""
+在空数据库上按当前模型建表，并把 alembic 版本标记为最新 (head)。
+
+最早的表结构是在 alembic 之外建立的 (初始迁移只补了索引)，
+新部署 (例如单机 SQLite) 无法从空库执行 alembic upgrade head，需要先用本命令初始化；
+之后的结构变更照常使用 alembic upgrade head。
+
+用法 (在 backend 目录下):
+    DATABASE_URL=sqlite+aiosqlite:///./xince.sqlite3 python -m app.cli.init_db
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import inspect
+
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.session import engine
+from app.models import models  # noqa: F401  (注册所有模型到 Base.metadata)
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+async def create_schema() -> bool:
+    """
+    库中还没有任何业务表时建表，返回是否建表
+    """
+    async with engine.begin() as conn:
+        existing = await conn.run_sync(lambda sync_conn: inspect(sync_conn).get_table_names())
+        if set(existing) & set(Base.metadata.tables):
+            return False
+        await conn.run_sync(Base.metadata.create_all)
+    await engine.dispose()
+    return True
+
+
+def main() -> None:
+    if not asyncio.run(create_schema()):
+        print("Database already has tables; use `alembic upgrade head` instead.")
+        sys.exit(1)
+
+    # alembic env.py 从 DATABASE_URL 环境变量读取连接串 (.env 中的配置也一并生效)
+    os.environ["DATABASE_URL"] = settings.DATABASE_URL
+    command.stamp(Config(str(ALEMBIC_INI)), "head")
+    print(f"Schema created and stamped at head: {settings.DATABASE_URL}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+把已有会话回填为紧凑存储 (或反向还原)。
+
+用法 (在 backend 目录下):
+    python -m app.cli.pack_sessions [--batch-size 1000] [--keep-rows]
+    python -m app.cli.pack_sessions --unpack
+"""
+import argparse
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.services.compact_storage import pack_session_batch, unpack_session_batch
+
+
+async def main(args: argparse.Namespace) -> None:
+    total = 0
+    last_id = 0
+    while True:
+        # 每批一个事务，中断后重新运行会从未处理的会话继续
+        async with AsyncSessionLocal() as db:
+            if args.unpack:
+                count, last_id = await unpack_session_batch(db, last_id, args.batch_size)
+            else:
+                count, last_id = await pack_session_batch(db, last_id, args.batch_size, args.keep_rows)
+            await db.commit()
+        if count == 0:
+            break
+        total += count
+        print(f"{'unpacked' if args.unpack else 'packed'} {total} sessions (last id {last_id})")
+    print(f"done: {total} sessions")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--keep-rows", action="store_true", help="打包后保留逐行存储的答案和维度")
+    parser.add_argument("--unpack", action="store_true", help="把紧凑存储还原为逐行存储")
+    asyncio.run(main(parser.parse_args()))
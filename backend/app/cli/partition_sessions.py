@@ -0,0 +1,48 @@
+"""
+按创建月份对 test_sessions / user_answers 做范围分区 (仅 MySQL，见 services/partition_service.py)。
+首次运行启用分区 (会删除这几张表上的外键)，之后每月初运行一次，把刚结束的月份拆成独立分区；
+--drop-archived 删除已被 app.cli.archive_sessions 清空的旧分区。
+默认只打印将要执行的 DDL，加 --apply 才执行。
+
+用法 (在 backend 目录下):
+    python -m app.cli.partition_sessions
+    python -m app.cli.partition_sessions --apply
+    python -m app.cli.partition_sessions --drop-archived --apply
+"""
+import argparse
+import asyncio
+import sys
+
+from sqlalchemy import text
+
+from app.db.session import engine
+from app.services.partition_service import load_state, plan_statements
+
+
+async def main(args: argparse.Namespace) -> None:
+    if engine.dialect.name != "mysql":
+        print(f"Partitioning is only supported on MySQL (current: {engine.dialect.name}); "
+              "app.cli.archive_sessions works without it.")
+        sys.exit(1)
+
+    async with engine.connect() as conn:
+        state = await load_state(conn)
+        statements = plan_statements(state, drop_archived=args.drop_archived)
+        if not statements:
+            print("partitions are up to date")
+            return
+        for statement in statements:
+            print(statement + ";")
+            if args.apply:
+                await conn.execute(text(statement))
+        await conn.commit()
+    await engine.dispose()
+    if not args.apply:
+        print("(dry run; re-run with --apply to execute)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--apply", action="store_true", help="执行 DDL (默认只打印)")
+    parser.add_argument("--drop-archived", action="store_true", help="删除已被归档清空的旧分区")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,21 @@
+"""
+从历史会话 (含紧凑存储的会话) 重建 score_distributions 得分分布。
+
+用法 (在 backend 目录下):
+    python -m app.cli.rebuild_score_distributions
+"""
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.services.distribution_service import rebuild_score_distributions
+
+
+async def main() -> None:
+    async with AsyncSessionLocal() as db:
+        rows = await rebuild_score_distributions(db)
+        await db.commit()
+    print(f"score_distributions rebuilt: {rows} buckets")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
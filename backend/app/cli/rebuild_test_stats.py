@@ -0,0 +1,21 @@
+"""
+从 test_sessions 历史数据重建 test_stats 计数表。
+
+用法 (在 backend 目录下):
+    python -m app.cli.rebuild_test_stats
+"""
+import asyncio
+
+from app.db.session import AsyncSessionLocal
+from app.services.stats_service import rebuild_test_stats
+
+
+async def main() -> None:
+    async with AsyncSessionLocal() as db:
+        rows = await rebuild_test_stats(db)
+        await db.commit()
+    print(f"test_stats rebuilt: {rows} tests")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,21 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+from app.core.config import settings
+
+# ---------------------------------------------------------------
+# 运维接口的访问控制
+# 请求头 X-Admin-Token 须与 settings.ADMIN_TOKEN 一致；未配置 ADMIN_TOKEN 时这些接口整体关闭 (404)
+# ---------------------------------------------------------------
+
+
+async def require_admin(x_admin_token: Optional[str] = Header(None)) -> None:
+    if not settings.ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    # 常量时间比较，避免按响应时间逐字节猜测令牌
+    if x_admin_token is None or not hmac.compare_digest(
+        x_admin_token.encode("utf-8"), settings.ADMIN_TOKEN.encode("utf-8")
+    ):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
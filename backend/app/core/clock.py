@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+# ---------------------------------------------------------------
+# 时间约定：数据库中的时间列一律保存 UTC 的 naive datetime，精度为秒。
+# 应用侧写入 (提交路径、批量写入) 与数据库默认值 (CURRENT_TIMESTAMP) 一致：
+# SQLite 的 CURRENT_TIMESTAMP 本来就是 UTC；MySQL 连接的会话时区固定为 UTC (见 app/db/session.py)。
+# ---------------------------------------------------------------
+
+
+def utc_now() -> datetime:
+    """
+    当前 UTC 时间 (naive，精度为秒，与 TIMESTAMP 列保存的值一致)
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None, microsecond=0)
+
+
+def as_utc_naive(value: Optional[datetime]) -> Optional[datetime]:
+    """
+    带时区的时间转为 UTC 的 naive datetime；naive 的时间视为已是 UTC，原样返回
+    """
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
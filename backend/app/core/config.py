@@ -1,10 +1,146 @@
+from pathlib import Path
+from typing import Any, Dict
+
 from pydantic_settings import BaseSettings
 
+# backend 目录：不依赖进程工作目录的运行时数据默认放在其下的 data/ 中
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+
 class Settings(BaseSettings):
     PROJECT_NAME: str = "My Test App Backend"
     API_V1_STR: str = "/api/v1"
     DATABASE_URL: str
 
+    # 运维接口 (/health/sql-profile、GET /sessions/export) 的访问令牌，通过请求头 X-Admin-Token 传入；
+    # 为空时这些接口关闭
+    ADMIN_TOKEN: str = ""
+
+    # 按请求的 SQL 剖析 (可通过 PUT /health/sql-profile 在运行时开关，只对处理该请求的 worker 生效；
+    # 多 worker 部署需要全部开启时使用本配置)
+    SQL_PROFILE_ENABLED: bool = False
+    # 超过该耗时(毫秒)的语句写入慢查询日志 (参数已脱敏)
+    SQL_SLOW_QUERY_MS: float = 200.0
+    # 同一请求内相同语句形状执行次数达到该值时视为疑似 N+1
+    SQL_PROFILE_REPEAT_THRESHOLD: int = 5
+
+    # SQLite 后端 (DATABASE_URL=sqlite+aiosqlite:///路径)：每个连接建立时执行的 pragma
+    SQLITE_PRAGMAS: Dict[str, Any] = {
+        "journal_mode": "WAL",       # 读写互不阻塞
+        "synchronous": "NORMAL",     # WAL 下只在检查点 fsync，崩溃不会损坏数据库
+        "foreign_keys": "ON",
+        "busy_timeout": 5000,        # 毫秒；其它进程持有写锁时的等待时间
+        "cache_size": -65536,        # 负数表示 KB，即 64MB 页缓存
+        "temp_store": "MEMORY",
+        "mmap_size": 268435456,      # 256MB 内存映射读
+    }
+    # 进程内写操作排队 (SQLite 同一时刻只允许一个写事务)
+    SQLITE_SINGLE_WRITER: bool = True
+
+    # 数据库连接池 (内存 SQLite 忽略大小相关参数)
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    # 池满时取连接的最长等待(秒)
+    DB_POOL_TIMEOUT: float = 30.0
+    # 连接最长使用时间(秒)，应小于 MySQL 的 wait_timeout；-1 表示不回收
+    DB_POOL_RECYCLE: int = 3600
+    # 连接存活检查：
+    #   pre_ping  每次取连接都先 ping 一次 (默认，最稳妥)
+    #   idle      只 ping 空闲超过 DB_POOL_IDLE_PING_SECONDS 的连接
+    #   none      不检查，只依赖 DB_POOL_RECYCLE
+    DB_POOL_LIVENESS: str = "pre_ping"
+    DB_POOL_IDLE_PING_SECONDS: float = 30.0
+
+    # 启动预热 (lifespan)：预先建立连接、加载热门测试的定义与计分规则，完成后 /health/ready 才返回 200
+    WARMUP_ENABLED: bool = True
+    # True 时预热完成后才开始接受请求；False 时在后台预热，由 /health/ready 告知负载均衡何时可以导流
+    WARMUP_BLOCKING: bool = False
+    # 预先建立的连接数 (不超过 DB_POOL_SIZE) / 预加载的测试数 (按会话数从多到少)
+    WARMUP_DB_CONNECTIONS: int = 5
+    WARMUP_MAX_TESTS: int = 100
+    # 启动耗时预算 (秒，导入 + 预热)，超出时记录告警
+    BOOT_TIME_BUDGET_SECONDS: float = 5.0
+
+    # 进程内测试定义缓存: 最大条目数 / 过期时间(秒)
+    # 过期时间用于兜底多 worker 部署下其它进程写入后的失效
+    TEST_CACHE_MAX_ENTRIES: int = 256
+    TEST_CACHE_TTL_SECONDS: float = 300.0
+    # GET /tests/{test_type} 的 Cache-Control；配合 ETag，客户端每次都会带 If-None-Match 重新验证
+    TEST_PAYLOAD_CACHE_CONTROL: str = "public, no-cache"
+
+    # GET /sessions/{session_id} 的结果缓存：会话写入后不再变化，缓存序列化后的响应体，
+    # 按字节预算 LRU 淘汰 (0 表示关闭)；提交成功即写入缓存
+    SESSION_RESULT_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    SESSION_RESULT_CACHE_CONTROL: str = "public, max-age=31536000, immutable"
+
+    # 会话相关接口 (提交 / 查询会话 / 用户历史 / 批量提交) 的快速序列化 (默认关闭)：
+    # 由服务层直接构造与 response schema 一致的 dict，用 orjson (未安装时用 json) 编码，
+    # 跳过 pydantic 对象构造和 response_model 的再次校验
+    FAST_JSON_RESPONSES: bool = False
+
+    # 批量提交接口单次最多的条目数
+    BATCH_SUBMIT_MAX_ITEMS: int = 500
+    # 测试定义批量导入单次最多的测试数
+    TEST_IMPORT_MAX_ITEMS: int = 200
+
+    # 提交写入的 write-behind 模式 (默认关闭)：先返回结果，再由后台合并写库
+    SUBMIT_WRITE_BEHIND: bool = False
+    # 每个 worker 进程在该目录下有自己的 spool 文件，已退出进程的 spool 由存活的进程接管；
+    # 同一台机器上的所有 worker 应使用同一个目录 (部署时建议配置绝对路径)
+    WRITE_BEHIND_SPOOL_DIR: str = "write_behind_spool"
+    WRITE_BEHIND_MAX_QUEUE: int = 10000
+    WRITE_BEHIND_MAX_BATCH: int = 500
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 0.5
+    # 同一条记录写库失败 (连接中断等暂时性错误除外) 达到该次数后写入死信文件并跳过
+    WRITE_BEHIND_MAX_ATTEMPTS: int = 5
+    # 扫描并接管已退出进程的 spool 的间隔(秒)
+    WRITE_BEHIND_ADOPT_INTERVAL: float = 30.0
+
+    # 紧凑会话存储：答案和维度打包存放在 test_sessions 上，不再逐行写入
+    SESSION_STORAGE_COMPACT: bool = False
+
+    # 会话导出 (GET /sessions/export、app.cli.export_sessions)：每批读取的会话数
+    EXPORT_BATCH_SIZE: int = 1000
+    # 每个 worker 同时进行的 HTTP 导出数上限，超出时返回 503 (命令行导出不受限)
+    EXPORT_MAX_CONCURRENT: int = 2
+
+    # 冷数据归档 (app.cli.archive_sessions)：早于 ARCHIVE_MIN_AGE_DAYS 天的会话移出 test_sessions / user_answers，
+    # 写入 ARCHIVE_DIR 下按创建月份分文件的 gzip NDJSON (每批会话一个 gzip 成员)；
+    # 归档后仍可通过导出、用户历史和 GET /sessions/{session_id} 读取
+    ARCHIVE_DIR: str = "archive"
+    ARCHIVE_MIN_AGE_DAYS: int = 365
+    ARCHIVE_BATCH_SIZE: int = 500
+
+    # 限流：令牌桶规则 ("令牌数/second|minute|hour|day")，每个客户端 IP 一个桶
+    RATE_LIMIT_DEFAULT: str = "120/minute"
+    # 每次请求按路由消耗的令牌数 ("方法 路由模板" -> 令牌数)，与数据库工作量成正比；
+    # 未列出的路由消耗 RATE_LIMIT_DEFAULT_COST
+    RATE_LIMIT_DEFAULT_COST: float = 1.0
+    RATE_LIMIT_ROUTE_COSTS: Dict[str, float] = {
+        # 由进程内缓存 / 计数表直接返回的读请求几乎不消耗
+        "GET /api/v1/tests/{test_type}": 0.25,
+        "GET /api/v1/tests/popular": 0.25,
+        "GET /api/v1/tests/{test_id}/distribution": 0.25,
+        "GET /api/v1/sessions/{session_id}/percentiles": 0.25,
+        # 计分并写入答案
+        "POST /api/v1/tests/{test_id}/submit": 10.0,
+        "POST /api/v1/tests": 20.0,
+        # 全量导出逐批读库，长时间输出
+        "GET /api/v1/sessions/export": 60.0,
+        # 批量提交 / 批量导入在路由内按条目数一次性扣减
+        "POST /api/v1/sessions/batch": 0.0,
+        "POST /api/v1/tests/import": 0.0,
+    }
+    # 批量提交每个条目消耗的令牌数 (合并写入，比单次提交便宜)
+    RATE_LIMIT_BATCH_ITEM_COST: float = 5.0
+    # 批量导入每个测试消耗的令牌数
+    RATE_LIMIT_IMPORT_ITEM_COST: float = 5.0
+    # 桶状态存储：sqlite:////绝对路径 (本机所有 worker 共享同一组计数；默认 backend/data/ratelimit.sqlite3，
+    # 部署时可改为如 sqlite:////var/lib/xince/ratelimit.sqlite3) 或
+    # memory:// (进程内，每个 worker 独立计数，N 个 worker 时实际额度为 N 倍，启动时会告警)
+    RATE_LIMIT_STORAGE_URI: str = f"sqlite:///{BACKEND_DIR / 'data' / 'ratelimit.sqlite3'}"
+    # 清理空闲桶的间隔(秒)
+    RATE_LIMIT_EVICT_INTERVAL: float = 60.0
+
     class Config:
         env_file = ".env"
 
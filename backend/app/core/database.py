@@ -1,8 +1,12 @@
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker
 from .config import settings
+from app.db.sqlite import install_sqlite_pragmas, is_sqlite_url, sync_database_url
 
-engine = create_engine(settings.DATABASE_URL)
+# 同步引擎 (脚本使用)：DATABASE_URL 中的异步驱动换成对应的同步驱动
+engine = create_engine(sync_database_url(settings.DATABASE_URL))
+if is_sqlite_url(settings.DATABASE_URL):
+    install_sqlite_pragmas(engine, settings.SQLITE_PRAGMAS)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 def get_db():
@@ -10,4 +14,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
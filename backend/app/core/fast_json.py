@@ -0,0 +1,40 @@
+import json
+from datetime import datetime
+from typing import Any
+
+from pydantic import BaseModel
+from starlette.responses import Response
+
+try:
+    import orjson  # (可选依赖) 没有安装时退回标准库 json
+except ImportError:
+    orjson = None
+
+# ---------------------------------------------------------------
+# 快速 JSON 响应 (settings.FAST_JSON_RESPONSES)
+#
+# 内容由服务层用已校验过的数据直接构造 (dict / list)，不再经过 response_model 校验。
+# 输出与 pydantic 的 JSON 序列化一致：UTF-8 不转义、紧凑分隔符、datetime 为 ISO 8601 (UTC 写作 Z)。
+# ---------------------------------------------------------------
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, datetime):
+        text = obj.isoformat()
+        return text[:-6] + "Z" if text.endswith("+00:00") else text
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_UTC_Z)
+    return json.dumps(content, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
@@ -0,0 +1,109 @@
+import gzip
+import hashlib
+from typing import Dict, Optional, Set
+
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import Response
+
+try:
+    import brotli  # (可选依赖) 没有安装时只提供 gzip
+except ImportError:
+    brotli = None
+
+# 编码优先级：br > gzip > identity
+_ENCODING_PREFERENCE = ("br", "gzip")
+
+
+class EncodedPayload:
+    """
+    预先序列化、预先压缩的 JSON 响应体。
+    每个测试版本只构建一次，之后的请求直接按 Accept-Encoding 选取对应的字节。
+    compress=False 时只保留原始字节 (用于数量多、单个较小、构建在请求路径上的响应体)。
+    """
+
+    def __init__(self, body: bytes, compress: bool = True):
+        self.body = body
+        digest = hashlib.sha256(body).hexdigest()[:32]
+
+        # 不同 Content-Encoding 是不同的表示，使用不同的强 ETag
+        self.bodies: Dict[str, bytes] = {"identity": body}
+        self.etags: Dict[str, str] = {"identity": f'"{digest}"'}
+        if not compress:
+            return
+
+        self.bodies["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+        self.etags["gzip"] = f'"{digest}-gzip"'
+
+        if brotli is not None:
+            self.bodies["br"] = brotli.compress(body, quality=11)
+            self.etags["br"] = f'"{digest}-br"'
+
+    @classmethod
+    def from_model(cls, model: BaseModel) -> "EncodedPayload":
+        return cls(model.model_dump_json().encode("utf-8"))
+
+    def select_encoding(self, accept_encoding: Optional[str]) -> str:
+        accepted = _parse_accept_encoding(accept_encoding)
+        for encoding in _ENCODING_PREFERENCE:
+            if encoding in self.bodies and (encoding in accepted or "*" in accepted):
+                return encoding
+        return "identity"
+
+    def matches(self, if_none_match: Optional[str]) -> bool:
+        """
+        If-None-Match 使用弱比较；内容相同的任意编码版本都视为命中
+        """
+        if not if_none_match:
+            return False
+        tags = {tag.strip() for tag in if_none_match.split(",")}
+        if "*" in tags:
+            return True
+        tags = {tag[2:] if tag.startswith("W/") else tag for tag in tags}
+        return not tags.isdisjoint(self.etags.values())
+
+
+def _parse_accept_encoding(header: Optional[str]) -> Set[str]:
+    accepted: Set[str] = set()
+    if not header:
+        return accepted
+
+    for part in header.split(","):
+        coding, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if q > 0:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def encoded_json_response(
+    request: Request,
+    payload: EncodedPayload,
+    cache_control: str = "public, no-cache",
+) -> Response:
+    """
+    根据请求头返回 304 或对应编码的预压缩 JSON
+    """
+    encoding = payload.select_encoding(request.headers.get("accept-encoding"))
+    headers = {
+        "ETag": payload.etags[encoding],
+        "Vary": "Accept-Encoding",
+        "Cache-Control": cache_control,
+    }
+
+    if payload.matches(request.headers.get("if-none-match")):
+        return Response(status_code=304, headers=headers)
+
+    if encoding != "identity":
+        headers["Content-Encoding"] = encoding
+    return Response(
+        content=payload.bodies[encoding],
+        media_type="application/json",
+        headers=headers,
+    )
@@ -0,0 +1,359 @@
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Pattern, Sequence, Tuple, Union
+
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+# ---------------------------------------------------------------
+# 进程内指标 (Prometheus 文本格式)
+#
+# 只在事件循环线程中更新 (或依赖 GIL 下的简单整数累加)，不加锁；
+# 数值允许在多线程极端情况下有轻微误差，换取热路径上几乎为零的开销。
+# 每个 worker 进程各自汇总，由 Prometheus 按实例抓取后聚合。
+# ---------------------------------------------------------------
+
+# 默认的耗时分桶(秒)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+Labels = Tuple[str, ...]
+
+
+class Histogram:
+    """
+    固定分桶的直方图 (Prometheus 语义：value <= le 计入该桶)
+    """
+
+    def __init__(self, buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        # 最后一个位置是 +Inf
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self) -> List[Tuple[str, int]]:
+        result = []
+        running = 0
+        for le, n in zip(self.buckets, self.counts):
+            running += n
+            result.append((_format_value(le), running))
+        result.append(("+Inf", running + self.counts[-1]))
+        return result
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        返回累计分桶 {"buckets": {le: 累计次数}, "sum": ..., "count": ...}
+        """
+        return {"buckets": dict(self.cumulative()), "sum": self.sum, "count": self.count}
+
+
+class _Family:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+
+    def render(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def _labels(self, values: Labels, extra: str = "") -> str:
+        pairs = [f'{k}="{_escape(v)}"' for k, v in zip(self.labelnames, values)]
+        if extra:
+            pairs.append(extra)
+        return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter(_Family):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self.values: Dict[Labels, float] = {}
+
+    def inc(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, value in list(self.values.items()):
+            lines.append(f"{self.name}{self._labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels: str, amount: float = 1.0) -> None:
+        self.values[labels] = self.values.get(labels, 0.0) - amount
+
+    def set(self, *labels: str, value: float) -> None:
+        self.values[labels] = value
+
+
+class CallbackGauge(_Family):
+    """
+    抓取时才计算的 gauge (如连接池状态)；callback 返回数值，或 {标签元组: 数值}
+    """
+    kind = "gauge"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[Labels, float]]],
+        labelnames: Sequence[str] = (),
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.callback = callback
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in values.items():
+            lines.append(f"{self.name}{self._labels(labels)} {_format_value(value)}")
+        return lines
+
+
+class CallbackCounter(CallbackGauge):
+    """
+    抓取时读取的单调计数 (如限流器自身的统计)
+    """
+    kind = "counter"
+
+
+class HistogramFamily(_Family):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = buckets
+        self.histograms: Dict[Labels, Histogram] = {}
+
+    def labels(self, *labels: str) -> Histogram:
+        histogram = self.histograms.get(labels)
+        if histogram is None:
+            histogram = self.histograms[labels] = Histogram(self.buckets)
+        return histogram
+
+    def observe(self, value: float, *labels: str) -> None:
+        self.labels(*labels).observe(value)
+
+    def render(self) -> List[str]:
+        lines = super().render()
+        for labels, histogram in list(self.histograms.items()):
+            for le, count in histogram.cumulative():
+                bucket_labels = self._labels(labels, 'le="%s"' % le)
+                lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            lines.append(f"{self.name}_sum{self._labels(labels)} {_format_value(histogram.sum)}")
+            lines.append(f"{self.name}_count{self._labels(labels)} {histogram.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._families: Dict[str, _Family] = {}
+
+    def register(self, family: _Family) -> _Family:
+        if family.name in self._families:
+            raise ValueError(f"Metric '{family.name}' already registered")
+        self._families[family.name] = family
+        return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def callback_gauge(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[Labels, float]]],
+        labelnames: Sequence[str] = (),
+    ) -> CallbackGauge:
+        return self.register(CallbackGauge(name, documentation, callback, labelnames))
+
+    def callback_counter(
+        self,
+        name: str,
+        documentation: str,
+        callback: Callable[[], Union[float, Dict[Labels, float]]],
+        labelnames: Sequence[str] = (),
+    ) -> CallbackCounter:
+        return self.register(CallbackCounter(name, documentation, callback, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = LATENCY_BUCKETS,
+    ) -> HistogramFamily:
+        return self.register(HistogramFamily(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in list(self._families.values()):
+            lines.extend(family.render())
+        return "\n".join(lines) + "\n"
+
+
+def _format_value(value: float) -> str:
+    if value == int(value):
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+REGISTRY = Registry()
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# --- HTTP ---
+http_requests_total = REGISTRY.counter(
+    "http_requests_total", "HTTP requests by route and status.", ("method", "route", "status")
+)
+http_request_duration_seconds = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP request latency by route.", ("method", "route")
+)
+http_requests_in_flight = REGISTRY.gauge(
+    "http_requests_in_flight", "HTTP requests currently being served.", ("method",)
+)
+http_requests_rate_limited_total = REGISTRY.counter(
+    "http_requests_rate_limited_total", "Requests rejected with 429 by the rate limiter.", ("method", "route")
+)
+
+# --- 计分 ---
+scoring_phase_seconds = REGISTRY.histogram(
+    "scoring_phase_seconds",
+    "Time spent in each phase of a submission (load / score / save) by test type.",
+    ("test_type", "phase"),
+)
+
+# 没有任何路由匹配的请求 (404) 统一归到一个标签，避免路径造成标签爆炸
+UNROUTED = "<unrouted>"
+
+# 方法标签只取标准方法，其它任意方法名归为 OTHER
+_METHODS = frozenset({"GET", "HEAD", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"})
+
+
+def method_label(scope: Scope) -> str:
+    method = scope["method"]
+    return method if method in _METHODS else "OTHER"
+
+
+class RouteTemplates:
+    """
+    请求 -> 路由模板 (如 /api/v1/tests/{test_type})，用作指标的 route 标签。
+    模板表在首次使用时由应用的 OpenAPI 路径 (已包含 include_router 的前缀) 和应用顶层路由编译，
+    按声明顺序匹配，与路由器一致；路径匹配但方法不匹配 (405) 时同样返回该模板。
+    已路由的请求按 scope["route"] 缓存结果，只有在路由之前就返回的请求 (如被限流) 需要逐个匹配。
+    """
+
+    def __init__(self):
+        self._table: Optional[List[Tuple[str, Pattern[str], frozenset]]] = None
+        self._by_route: Dict[int, Optional[str]] = {}
+
+    def resolve(self, scope: Scope) -> Optional[str]:
+        app = scope.get("app")
+        if app is None:
+            return None
+        route = scope.get("route")
+        if route is None:
+            return self._match(app, scope)
+
+        key = id(route)
+        if key not in self._by_route:
+            # 同一路径可能同时匹配多个模板 (如 /tests/popular 与 /tests/{test_type})，取以该路由自身模板结尾的那个
+            suffix = getattr(route, "path", None) or ""
+            self._by_route[key] = self._match(app, scope, suffix) or getattr(route, "path", None)
+        return self._by_route[key]
+
+    def _match(self, app: Any, scope: Scope, suffix: str = "") -> Optional[str]:
+        if self._table is None:
+            self._table = _compile_route_table(app)
+        method, path = scope["method"], scope["path"]
+        partial = None
+        for template, regex, methods in self._table:
+            if not template.endswith(suffix) or not regex.match(path):
+                continue
+            if method in methods:
+                return template
+            if partial is None:
+                partial = template
+        return partial
+
+
+def _compile_route_table(app: Any) -> List[Tuple[str, Pattern[str], frozenset]]:
+    table: List[Tuple[str, Pattern[str], frozenset]] = []
+    paths: Dict[str, Any] = app.openapi().get("paths", {}) if hasattr(app, "openapi") else {}
+    for template, operations in paths.items():
+        methods = {m.upper() for m in operations}
+        if "GET" in methods:
+            methods.add("HEAD")
+        table.append((template, compile_path(template)[0], frozenset(methods)))
+    # 不出现在 OpenAPI 中的顶层路由 (文档页等)
+    for route in getattr(app, "routes", []):
+        template = getattr(route, "path", None)
+        if template and template not in paths:
+            table.append((template, compile_path(template)[0], frozenset(getattr(route, "methods", None) or ())))
+    return table
+
+
+route_templates = RouteTemplates()
+
+
+class MetricsMiddleware:
+    """
+    纯 ASGI 中间件：记录每个路由的请求数、耗时、并发数以及 429 次数。
+    路由标签使用路由模板 (如 /tests/{test_type})，而不是实际路径；在路由之前被限流的请求同样按模板统计。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = method_label(scope)
+        status = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec(method)
+
+            route_label = route_templates.resolve(scope) or UNROUTED
+            http_request_duration_seconds.observe(elapsed, method, route_label)
+            http_requests_total.inc(method, route_label, str(status))
+            if status == 429:
+                http_requests_rate_limited_total.inc(method, route_label)
@@ -0,0 +1,392 @@
+import asyncio
+import json
+import logging
+import math
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, List, Mapping, Optional, Pattern, Tuple, Type
+from urllib.parse import urlsplit
+
+from fastapi import Request
+from starlette.responses import Response
+from starlette.routing import compile_path
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------
+# 令牌桶限流
+#
+# 每个 key (默认是客户端 IP) 一个令牌桶：容量 burst，每秒补充 rate 个令牌，
+# 每个请求按路由消耗 cost 个令牌 (见 RouteCosts)；每次检查都是 O(1)。
+# cost 超过桶容量的请求 (如大批量提交) 在桶满时放行并透支，之后需等待令牌补回。
+# 桶的状态保存在可插拔的存储后端中：
+#   memory://                 进程内 (每个 worker 独立计数)
+#   sqlite:////abs/path       本机共享的 SQLite 文件 (WAL，须为绝对路径)，多个 worker 共用同一组计数
+# 后续可以通过 register_backend() 增加网络存储 (如 redis://)。
+# 会阻塞的后端 (blocking = True) 在线程池中执行，不占用事件循环；
+# 后端出错时放行请求 (fail open)，限流失效好过整个服务不可用。
+# 长时间未访问的桶 (已经补满，与新桶等价) 会被定期清理。
+# ---------------------------------------------------------------
+
+_UNIT_SECONDS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_LIMIT_RE = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$")
+
+
+class RateLimit:
+    """
+    一条限流规则，例如 "3/minute" -> 容量 3，每 20 秒补充 1 个令牌
+    """
+
+    def __init__(self, amount: int, period_seconds: float, text: str):
+        self.burst = float(amount)
+        self.rate = amount / period_seconds
+        self.text = text
+        # 空桶补满所需时间；超过这个时间未访问的桶可以直接丢弃
+        self.idle_ttl = period_seconds
+
+    @classmethod
+    def parse(cls, text: str) -> "RateLimit":
+        match = _LIMIT_RE.match(text)
+        if not match:
+            raise ValueError(f"Invalid rate limit '{text}'")
+        amount, multiple, unit = match.groups()
+        period = _UNIT_SECONDS[unit] * int(multiple or 1)
+        return cls(int(amount), period, text.strip())
+
+
+def _refill(tokens: float, updated_at: float, now: float, limit: RateLimit) -> float:
+    return min(limit.burst, tokens + (now - updated_at) * limit.rate)
+
+
+def _take(tokens: float, limit: RateLimit, cost: float) -> Tuple[bool, float, float]:
+    """
+    返回 (是否放行, 剩余令牌, 需要等待的秒数)
+    """
+    need = min(cost, limit.burst)
+    if tokens >= need:
+        return True, tokens - cost, 0.0
+    return False, tokens, (need - tokens) / limit.rate
+
+
+class RateLimitBackend:
+    """
+    存储后端接口：acquire 原子地检查并扣减令牌
+    """
+
+    # acquire / evict_idle 是否会阻塞 (文件锁、网络 I/O)：为 True 时由限流器放到线程池中执行
+    blocking = False
+    # 桶状态是否在多个 worker 进程之间共享
+    shared = True
+
+    def acquire(self, key: str, limit: RateLimit, cost: float, now: float) -> Tuple[bool, float]:
+        """
+        返回 (是否放行, 需要等待的秒数)；cost 为 0 时只检查是否仍在透支
+        """
+        raise NotImplementedError
+
+    def evict_idle(self, now: float, idle_seconds: float) -> int:
+        """
+        删除超过 idle_seconds 未访问的桶，返回删除的数量
+        """
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class MemoryBackend(RateLimitBackend):
+    shared = False
+
+    def __init__(self, url: str = ""):
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, limit: RateLimit, cost: float, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            state = self._buckets.get(key)
+            tokens = limit.burst if state is None else _refill(state[0], state[1], now, limit)
+            allowed, tokens, retry_after = _take(tokens, limit, cost)
+            self._buckets[key] = (tokens, now)
+            return allowed, retry_after
+
+    def evict_idle(self, now: float, idle_seconds: float) -> int:
+        with self._lock:
+            # 透支的桶 (tokens < 0) 要等补回后才能丢弃
+            stale = [
+                k for k, (tokens, ts) in self._buckets.items()
+                if tokens >= 0 and now - ts > idle_seconds
+            ]
+            for k in stale:
+                del self._buckets[k]
+            return len(stale)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+class SQLiteBackend(RateLimitBackend):
+    """
+    同一台机器上多个 worker 共享的桶状态 (本地 SQLite 文件，WAL 模式)。
+    每次 acquire 是一个 BEGIN IMMEDIATE 短事务：一次主键查询 + 一次 upsert。
+    等待其它进程的写锁时会阻塞 (最多 timeout 秒)，所以在线程池中执行。
+    """
+
+    blocking = True
+
+    def __init__(self, url: str):
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else urlsplit(url).path
+        # 相对路径依赖进程的工作目录，不同方式启动的 worker 可能各用一个文件
+        if not os.path.isabs(path):
+            raise ValueError(f"Rate limit storage '{url}' must use an absolute path (sqlite:////abs/path)")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, isolation_level=None, check_same_thread=False, timeout=1.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # 限流状态丢失的代价很小，不需要每次提交都落盘
+        self._conn.execute("PRAGMA synchronous=OFF")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets ("
+            " key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_buckets_updated_at ON buckets (updated_at)")
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str, limit: RateLimit, cost: float, now: float) -> Tuple[bool, float]:
+        with self._lock:
+            conn = self._conn
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute("SELECT tokens, updated_at FROM buckets WHERE key = ?", (key,)).fetchone()
+                tokens = limit.burst if row is None else _refill(row[0], row[1], now, limit)
+                allowed, tokens, retry_after = _take(tokens, limit, cost)
+                conn.execute(
+                    "INSERT INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?) "
+                    "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+                    (key, tokens, now),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                # BEGIN 本身失败 (如等锁超时) 时没有打开的事务
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK")
+                raise
+        return allowed, retry_after
+
+    def evict_idle(self, now: float, idle_seconds: float) -> int:
+        # 透支的桶 (tokens < 0) 要等补回后才能丢弃
+        with self._lock:
+            cursor = self._conn.execute(
+                "DELETE FROM buckets WHERE tokens >= 0 AND updated_at < ?", (now - idle_seconds,)
+            )
+            return cursor.rowcount
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+_BACKENDS: Dict[str, Type[RateLimitBackend]] = {
+    "memory": MemoryBackend,
+    "sqlite": SQLiteBackend,
+}
+
+
+def register_backend(scheme: str, backend_cls: Type[RateLimitBackend]) -> None:
+    """
+    注册新的存储后端 (例如网络存储)，之后即可通过 RATE_LIMIT_STORAGE_URI 使用
+    """
+    _BACKENDS[scheme] = backend_cls
+
+
+def backend_from_url(url: str) -> RateLimitBackend:
+    scheme = url.split("://", 1)[0]
+    if scheme not in _BACKENDS:
+        raise ValueError(f"Unknown rate limit storage '{url}'")
+    return _BACKENDS[scheme](url)
+
+
+def warn_if_not_shared(backend: RateLimitBackend, workers: int) -> bool:
+    """
+    多个 worker 使用进程内存储时记录告警 (每个 worker 各自计数，客户端实际可用 N 倍的额度)；返回是否告警
+    """
+    if backend.shared or workers <= 1:
+        return False
+    logger.warning(
+        "rate limit storage %s is per-process but %d workers are configured: "
+        "clients get %dx the configured limit; use a shared storage such as sqlite:////abs/path",
+        type(backend).__name__, workers, workers,
+    )
+    return True
+
+
+def get_remote_address(scope: Scope) -> str:
+    client = scope.get("client")
+    return client[0] if client else "127.0.0.1"
+
+
+class RouteCosts:
+    """
+    路由 -> 每次请求消耗的令牌数。
+    配置的 key 形如 "GET /api/v1/tests/{test_type}" (方法 + 路由模板)，未配置的路由使用 default_cost。
+    路由模板在启动时编译成正则，中间件在路由之前即可确定开销。
+    """
+
+    def __init__(self, costs: Mapping[str, float], default_cost: float = 1.0):
+        self.default_cost = default_cost
+        self._routes: List[Tuple[str, Pattern[str], float]] = []
+        for key, cost in costs.items():
+            method, _, path = key.partition(" ")
+            if not path.startswith("/"):
+                raise ValueError(f"Invalid rate limit route '{key}'")
+            path_regex, _, _ = compile_path(path)
+            self._routes.append((method.upper(), path_regex, float(cost)))
+        # 固定路径优先于带参数的模板 (如 /tests/popular 与 /tests/{test_type})
+        self._routes.sort(key=lambda r: "{" in r[1].pattern or "(?P<" in r[1].pattern)
+
+    def resolve(self, scope: Scope) -> float:
+        method, path = scope["method"], scope["path"]
+        for route_method, path_regex, cost in self._routes:
+            if method == route_method and path_regex.match(path):
+                return cost
+        return self.default_cost
+
+
+class TokenBucketLimiter:
+    """
+    限流器：把规则、存储后端、路由开销和空闲清理组合在一起，并统计自身开销
+    """
+
+    def __init__(
+        self,
+        backend: RateLimitBackend,
+        default_limit: str,
+        route_costs: Optional[RouteCosts] = None,
+        evict_interval: float = 60.0,
+        key_func: Callable[[Scope], str] = get_remote_address,
+    ):
+        self.backend = backend
+        self.default_limit = RateLimit.parse(default_limit)
+        self.route_costs = route_costs or RouteCosts({})
+        self.evict_interval = evict_interval
+        self.key_func = key_func
+        self.enabled = True
+        self._next_evict = time.monotonic() + evict_interval
+
+        # 开销统计
+        self.checks = 0
+        self.rejected = 0
+        self.errors = 0
+        self.check_seconds = 0.0
+
+    async def hit(self, key: str, limit: Optional[RateLimit] = None, cost: float = 1.0) -> Tuple[bool, float]:
+        limit = limit or self.default_limit
+        started = time.perf_counter()
+        # 使用墙上时钟，多个进程之间才可比较
+        now = time.time()
+        try:
+            allowed, retry_after = await self._call(self.backend.acquire, key, limit, cost, now)
+            if time.monotonic() >= self._next_evict:
+                self._next_evict = time.monotonic() + self.evict_interval
+                await self._call(self.backend.evict_idle, now, limit.idle_ttl)
+        except Exception as e:
+            # 存储后端故障时放行 (fail open)
+            self.errors += 1
+            logger.warning("rate limit backend failed, allowing request: %r", e)
+            allowed, retry_after = True, 0.0
+
+        self.checks += 1
+        if not allowed:
+            self.rejected += 1
+        self.check_seconds += time.perf_counter() - started
+        return allowed, retry_after
+
+    async def _call(self, fn: Callable, *args):
+        if self.backend.blocking:
+            return await asyncio.to_thread(fn, *args)
+        return fn(*args)
+
+    @property
+    def mean_check_microseconds(self) -> float:
+        return self.check_seconds / self.checks * 1e6 if self.checks else 0.0
+
+
+# ---------------------------------------------------------------
+# 429 响应：中间件与 charge() (经 rate_limit_exceeded_handler) 使用同一格式
+# {"error": "Rate limit exceeded: <规则>"}，并带 Retry-After
+# ---------------------------------------------------------------
+class RateLimitExceeded(Exception):
+    """
+    路由内追加扣减 (charge) 超出限制，由 rate_limit_exceeded_handler 转为 429 响应
+    """
+
+    def __init__(self, limit: RateLimit, retry_after: float):
+        super().__init__(f"Rate limit exceeded: {limit.text}")
+        self.limit = limit
+        self.retry_after = retry_after
+
+
+def rate_limit_exceeded_body(limit: RateLimit) -> bytes:
+    return json.dumps({"error": f"Rate limit exceeded: {limit.text}"}).encode("utf-8")
+
+
+def retry_after_header(retry_after: float) -> str:
+    return str(math.ceil(retry_after))
+
+
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceeded) -> Response:
+    return Response(
+        rate_limit_exceeded_body(exc.limit),
+        status_code=429,
+        media_type="application/json",
+        headers={"Retry-After": retry_after_header(exc.retry_after)},
+    )
+
+
+class RateLimitMiddleware:
+    """
+    纯 ASGI 中间件：对所有 HTTP 请求按客户端 IP 和路由开销扣减令牌，超出时返回 429
+    """
+
+    def __init__(self, app: ASGIApp, limiter: TokenBucketLimiter):
+        self.app = app
+        self.limiter = limiter
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        limiter = self.limiter
+        if scope["type"] != "http" or not limiter.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        limit = limiter.default_limit
+        cost = limiter.route_costs.resolve(scope)
+        allowed, retry_after = await limiter.hit(limiter.key_func(scope), limit, cost)
+        if allowed:
+            await self.app(scope, receive, send)
+            return
+
+        body = rate_limit_exceeded_body(limit)
+        await send({
+            "type": "http.response.start",
+            "status": 429,
+            "headers": [
+                (b"content-type", b"application/json"),
+                (b"content-length", str(len(body)).encode("ascii")),
+                (b"retry-after", retry_after_header(retry_after).encode("ascii")),
+            ],
+        })
+        await send({"type": "http.response.body", "body": body})
+
+
+async def charge(request: Request, cost: float) -> None:
+    """
+    在路由内部按实际工作量追加扣减 (如批量提交按条目数)，超出时抛出 RateLimitExceeded (429)
+    """
+    limiter: Optional[TokenBucketLimiter] = getattr(request.app.state, "limiter", None)
+    if limiter is None or not limiter.enabled or cost <= 0:
+        return
+    allowed, retry_after = await limiter.hit(limiter.key_func(request.scope), cost=cost)
+    if not allowed:
+        raise RateLimitExceeded(limiter.default_limit, retry_after)
@@ -0,0 +1,204 @@
+import heapq
+import logging
+import re
+import time
+from collections import Counter, deque
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.metrics import UNROUTED, method_label, route_templates
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("app.sql.slow")
+
+# ---------------------------------------------------------------
+# 按请求的 SQL 剖析 (默认关闭，可在运行时开关)
+#
+# 通过引擎的 before/after_cursor_execute 事件记录当前请求内的每条语句：
+# 查询次数、数据库总耗时、最慢的几条语句，以及同一请求内重复执行的相同语句形状
+# (通常意味着漏掉了预加载，即 N+1)。
+# 当前请求的剖析对象保存在 ContextVar 中；SQLAlchemy 在 greenlet 中执行同步代码时会沿用它。
+# 超过阈值的慢查询写入 "app.sql.slow" 日志，参数只记录个数，不记录取值。
+# 请求按路由模板 (如 /api/v1/sessions/{session_id}) 记录，不记录实际路径中的用户 ID / 会话 ID。
+# ---------------------------------------------------------------
+
+_PLACEHOLDER = r"(?:\?|%s|:\w+)"
+_IN_LIST_RE = re.compile(rf"\bIN \(\s*{_PLACEHOLDER}(?:\s*,\s*{_PLACEHOLDER})*\s*\)", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def statement_shape(statement: str) -> str:
+    """
+    语句形状：压缩空白，并把 IN (?, ?, ...) 折叠为 IN (...)，使参数个数不同的同类语句归为一类
+    """
+    shape = _WHITESPACE_RE.sub(" ", statement).strip()
+    return _IN_LIST_RE.sub("IN (...)", shape)
+
+
+def _redact(parameters: Any, executemany: bool) -> str:
+    if executemany and parameters and isinstance(parameters[0], (list, tuple, dict)):
+        return f"<{len(parameters)} rows redacted>"
+    if not parameters:
+        return "<none>"
+    return f"<{len(parameters)} redacted>"
+
+
+class RequestProfile:
+    def __init__(self, scope: Scope, top_n: int):
+        self.scope = scope
+        self.method = method_label(scope)
+        self.top_n = top_n
+        self.query_count = 0
+        self.db_seconds = 0.0
+        self.shapes: Counter = Counter()
+        # 最慢的 top_n 条 (小顶堆)
+        self._slowest: List[Tuple[float, int, str]] = []
+
+    def record(self, shape: str, elapsed: float) -> None:
+        self.query_count += 1
+        self.db_seconds += elapsed
+        self.shapes[shape] += 1
+        entry = (elapsed, self.query_count, shape)
+        if len(self._slowest) < self.top_n:
+            heapq.heappush(self._slowest, entry)
+        elif elapsed > self._slowest[0][0]:
+            heapq.heapreplace(self._slowest, entry)
+
+    @property
+    def route(self) -> str:
+        # 路由之后才能确定，使用时再解析 (按路由缓存)
+        return route_templates.resolve(self.scope) or UNROUTED
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        return [(shape, n) for shape, n in self.shapes.most_common() if n >= threshold]
+
+    def to_dict(self, repeat_threshold: int) -> Dict[str, Any]:
+        return {
+            "method": self.method,
+            "route": self.route,
+            "query_count": self.query_count,
+            "db_ms": round(self.db_seconds * 1000, 3),
+            "slowest": [
+                {"ms": round(elapsed * 1000, 3), "statement": shape}
+                for elapsed, _, shape in sorted(self._slowest, reverse=True)
+            ],
+            "repeated": [{"count": n, "statement": shape} for shape, n in self.repeated(repeat_threshold)],
+        }
+
+
+_current_profile: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+
+class SQLProfiler:
+    def __init__(
+        self,
+        enabled: bool = False,
+        slow_query_ms: float = 200.0,
+        repeat_threshold: int = 5,
+        top_n: int = 5,
+        history: int = 50,
+    ):
+        self.enabled = enabled
+        self.slow_query_ms = slow_query_ms
+        self.repeat_threshold = repeat_threshold
+        self.top_n = top_n
+        # 最近若干个请求的剖析结果
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=history)
+
+    def install(self, engine: Engine) -> None:
+        """
+        在 (同步) 引擎上注册事件；关闭时事件只做一次判断
+        """
+        event.listen(engine, "before_cursor_execute", self._before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", self._after_cursor_execute)
+        event.listen(engine, "handle_error", self._handle_error)
+
+    def _before_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        if self.enabled:
+            conn.info.setdefault("sql_profiler_started", []).append(time.perf_counter())
+
+    def _after_cursor_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started_stack = conn.info.get("sql_profiler_started")
+        if not started_stack:
+            return
+        elapsed = time.perf_counter() - started_stack.pop()
+
+        shape = statement_shape(statement)
+        profile = _current_profile.get()
+        if profile is not None:
+            profile.record(shape, elapsed)
+
+        if elapsed * 1000 >= self.slow_query_ms:
+            slow_query_logger.warning(
+                "slow query %.1fms%s: %s params=%s",
+                elapsed * 1000,
+                f" ({profile.method} {profile.route})" if profile is not None else "",
+                shape,
+                _redact(parameters, executemany),
+            )
+
+    def _handle_error(self, exception_context) -> None:
+        # 出错的语句不会触发 after_cursor_execute，弹出对应的开始时间
+        conn = exception_context.connection
+        started_stack = conn.info.get("sql_profiler_started") if conn is not None else None
+        if started_stack:
+            started_stack.pop()
+
+    def begin(self, scope: Scope) -> RequestProfile:
+        profile = RequestProfile(scope, self.top_n)
+        _current_profile.set(profile)
+        return profile
+
+    def finish(self, profile: RequestProfile) -> Dict[str, Any]:
+        _current_profile.set(None)
+        summary = profile.to_dict(self.repeat_threshold)
+        self.recent.append(summary)
+        for item in summary["repeated"]:
+            logger.warning(
+                "possible N+1: %d identical statements in %s %s: %s",
+                item["count"], profile.method, profile.route, item["statement"]
+            )
+        return summary
+
+
+class SQLProfilerMiddleware:
+    """
+    开启剖析时为每个请求建立剖析上下文，并在响应头中带上查询次数与数据库耗时
+    """
+
+    def __init__(self, app: ASGIApp, profiler: SQLProfiler):
+        self.app = app
+        self.profiler = profiler
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not self.profiler.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        profile = self.profiler.begin(scope)
+
+        async def send_wrapper(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                # 响应头只包含发出响应之前的查询；之后执行的语句仍计入剖析记录
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(profile.query_count).encode("ascii")))
+                headers.append((b"x-db-time-ms", f"{profile.db_seconds * 1000:.3f}".encode("ascii")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            self.profiler.finish(profile)
+
+
+sql_profiler = SQLProfiler(
+    enabled=settings.SQL_PROFILE_ENABLED,
+    slow_query_ms=settings.SQL_SLOW_QUERY_MS,
+    repeat_threshold=settings.SQL_PROFILE_REPEAT_THRESHOLD,
+)
@@ -1,19 +1,130 @@
+import time
+from typing import Any, Dict
+
+from sqlalchemy import event, exc
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 from app.core.config import settings
+from app.core.metrics import REGISTRY
+from app.core.sql_profiler import sql_profiler
+from app.db.sqlite import SQLiteAsyncSession, install_sqlite_pragmas, is_memory_sqlite_url, is_sqlite_url
+
+# 取连接的等待时间(秒)；池满时的排队会体现在这里
+pool_wait_histogram = REGISTRY.histogram(
+    "db_pool_checkout_wait_seconds", "Time spent waiting for a pooled DB connection."
+).labels()
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """
+    记录每次取连接耗时的连接池 (包含需要新建连接时的建连时间)
+    """
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            pool_wait_histogram.observe(time.perf_counter() - started)
+
+
+def _engine_options() -> Dict[str, Any]:
+    options: Dict[str, Any] = {
+        "pool_pre_ping": settings.DB_POOL_LIVENESS == "pre_ping",
+    }
+    # 内存 SQLite 使用驱动默认的 StaticPool (所有会话共享同一个连接)，不接受池大小参数；
+    # 文件 SQLite 在 WAL 模式下多个连接可以并行读，与 MySQL 一样使用连接池
+    if not is_memory_sqlite_url(settings.DATABASE_URL):
+        options.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT,
+            pool_recycle=settings.DB_POOL_RECYCLE,
+        )
+    return options
+
 
 # 创建异步引擎
-engine = create_async_engine(
-    settings.DATABASE_URL,
-    pool_pre_ping=True
-)
+engine = create_async_engine(settings.DATABASE_URL, **_engine_options())
+sql_profiler.install(engine.sync_engine)
+
+# SQLite：连接建立时设置 WAL 等 pragma；写操作在进程内排队
+IS_SQLITE = is_sqlite_url(settings.DATABASE_URL)
+if IS_SQLITE:
+    install_sqlite_pragmas(engine.sync_engine, settings.SQLITE_PRAGMAS)
+
+# MySQL：连接的会话时区固定为 UTC，TIMESTAMP 列的读写和 CURRENT_TIMESTAMP 默认值都按 UTC，
+# 与应用侧写入的 created_at (app.core.clock.utc_now) 一致，不受服务器 time_zone 配置影响
+if engine.dialect.name == "mysql":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _set_utc_time_zone(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            cursor.execute("SET time_zone = '+00:00'")
+        finally:
+            cursor.close()
+
+
+# ---------------------------------------------------------------
+# 连接存活检查 (DB_POOL_LIVENESS="idle")
+# 只对空闲超过 DB_POOL_IDLE_PING_SECONDS 的连接 ping 一次，而不是每次取连接都 ping；
+# ping 失败时抛出 DisconnectionError，连接池会丢弃该连接并重新建连。
+# ---------------------------------------------------------------
+if settings.DB_POOL_LIVENESS == "idle":
+    @event.listens_for(engine.sync_engine, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(engine.sync_engine, "checkin")
+    def _on_checkin(dbapi_connection, connection_record):
+        connection_record.info["last_checkin"] = time.monotonic()
+
+    @event.listens_for(engine.sync_engine, "checkout")
+    def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+        idle = time.monotonic() - connection_record.info.get("last_checkin", 0.0)
+        if idle < settings.DB_POOL_IDLE_PING_SECONDS:
+            return
+        try:
+            engine.dialect.do_ping(dbapi_connection)
+        except Exception as e:
+            raise exc.DisconnectionError() from e
+
+
+def pool_status() -> Dict[str, Any]:
+    """
+    连接池的实时状态：已借出 / 溢出 / 空闲连接数，以及取连接等待时间分布
+    """
+    pool = engine.sync_engine.pool
+    status: Dict[str, Any] = {"pool": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+            max_overflow=settings.DB_MAX_OVERFLOW,
+        )
+    status["wait_seconds"] = pool_wait_histogram.snapshot()
+    return status
+
+
+def _pool_gauge(key: str):
+    return lambda: pool_status().get(key, 0)
+
+
+REGISTRY.callback_gauge("db_pool_checked_out", "Connections currently checked out.", _pool_gauge("checked_out"))
+REGISTRY.callback_gauge("db_pool_checked_in", "Idle connections in the pool.", _pool_gauge("checked_in"))
+REGISTRY.callback_gauge("db_pool_overflow", "Connections open beyond pool_size.", _pool_gauge("overflow"))
+
 
 # 创建异步 Session
 AsyncSessionLocal = sessionmaker(
     autocommit=False,
     autoflush=False,
     bind=engine,
-    class_=AsyncSession,
+    class_=SQLiteAsyncSession if IS_SQLITE and settings.SQLITE_SINGLE_WRITER else AsyncSession,
     expire_on_commit=False,
 )
 
@@ -27,4 +138,4 @@ async def get_db() -> AsyncSession:
             await session.rollback()
             raise
         finally:
-            await session.close()
\ No newline at end of file
+            await session.close()
@@ -0,0 +1,140 @@
+import asyncio
+from typing import Any, Mapping
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql.elements import TextClause
+
+# ---------------------------------------------------------------
+# SQLite (aiosqlite) 后端
+#
+# 单机部署不需要单独的数据库进程：WAL 模式下读不阻塞写、写不阻塞读，
+# 连接建立时统一设置 pragma (见 Settings.SQLITE_PRAGMAS)。
+# SQLite 同一时刻只允许一个写事务；进程内的写操作通过 SQLiteAsyncSession
+# 排队获取写锁，避免多个协程同时写入时互相等待 busy_timeout 甚至报 "database is locked"。
+# 多个 worker 进程之间仍由 SQLite 自身的文件锁 + busy_timeout 协调。
+# ---------------------------------------------------------------
+
+# 异步驱动 -> 同步驱动 (alembic / 同步脚本使用)
+_SYNC_DRIVERS = {
+    "aiosqlite": "pysqlite",
+    "asyncmy": "pymysql",
+    "aiomysql": "pymysql",
+    "asyncpg": "psycopg2",
+}
+
+
+def is_sqlite_url(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def is_memory_sqlite_url(url: str) -> bool:
+    parsed = make_url(url)
+    return parsed.get_backend_name() == "sqlite" and parsed.database in (None, "", ":memory:")
+
+
+def sync_database_url(url: str) -> str:
+    """
+    把异步驱动的连接串换成对应的同步驱动 (如 sqlite+aiosqlite -> sqlite+pysqlite)
+    """
+    parsed = make_url(url)
+    driver = _SYNC_DRIVERS.get(parsed.get_driver_name())
+    if driver is None:
+        return url
+    return parsed.set(drivername=f"{parsed.get_backend_name()}+{driver}").render_as_string(hide_password=False)
+
+
+def install_sqlite_pragmas(engine: Engine, pragmas: Mapping[str, Any]) -> None:
+    """
+    每个新连接建立时执行 PRAGMA (同步引擎；异步引擎传入 engine.sync_engine)
+    """
+    @event.listens_for(engine, "connect")
+    def _set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for name, value in pragmas.items():
+                cursor.execute(f"PRAGMA {name}={value}")
+        finally:
+            cursor.close()
+
+
+# 进程内的 SQLite 写锁 (单写者队列)
+_write_lock = asyncio.Lock()
+
+
+def is_write_statement(statement) -> bool:
+    """
+    除 SELECT 以外的语句都按写操作处理：ORM / Core 的 DML、text() 写的 INSERT / UPDATE / DELETE、DDL 等
+    """
+    if getattr(statement, "is_select", False):
+        return False
+    if isinstance(statement, TextClause):
+        return not statement.text.lstrip().lower().startswith("select")
+    return True
+
+
+class SQLiteAsyncSession(AsyncSession):
+    """
+    写操作 (SELECT 以外的语句 / flush / 带有改动的 commit) 之前先获取进程内写锁，
+    提交、回滚或关闭会话时释放；只读请求不受影响。
+    """
+
+    _holds_write_lock = False
+
+    async def _acquire_write_lock(self) -> None:
+        if not self._holds_write_lock:
+            # 先取得连接再排队：持锁者必须已经有连接，否则当连接全部被排队者占用时会互相等待
+            await self.connection()
+            await _write_lock.acquire()
+            self._holds_write_lock = True
+
+    def _release_write_lock(self) -> None:
+        if self._holds_write_lock:
+            self._holds_write_lock = False
+            _write_lock.release()
+
+    def _has_pending_changes(self) -> bool:
+        sync_session = self.sync_session
+        return bool(sync_session.new or sync_session.dirty or sync_session.deleted)
+
+    async def execute(self, statement, *args, **kwargs):
+        if is_write_statement(statement):
+            await self._acquire_write_lock()
+        return await super().execute(statement, *args, **kwargs)
+
+    # scalar / stream 不经过 execute (scalars / stream_scalars 分别经过 execute / stream)
+    async def scalar(self, statement, *args, **kwargs):
+        if is_write_statement(statement):
+            await self._acquire_write_lock()
+        return await super().scalar(statement, *args, **kwargs)
+
+    async def stream(self, statement, *args, **kwargs):
+        if is_write_statement(statement):
+            await self._acquire_write_lock()
+        return await super().stream(statement, *args, **kwargs)
+
+    async def flush(self, objects=None) -> None:
+        if self._has_pending_changes():
+            await self._acquire_write_lock()
+        await super().flush(objects)
+
+    async def commit(self) -> None:
+        if self._has_pending_changes():
+            await self._acquire_write_lock()
+        try:
+            await super().commit()
+        finally:
+            self._release_write_lock()
+
+    async def rollback(self) -> None:
+        try:
+            await super().rollback()
+        finally:
+            self._release_write_lock()
+
+    async def close(self) -> None:
+        try:
+            await super().close()
+        finally:
+            self._release_write_lock()
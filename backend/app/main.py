@@ -1,34 +1,95 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from starlette.requests import Request  # 1. 导入 Request
+import time
+
+# 启动耗时从导入本模块开始计算 (包含下面所有模块的导入)
+_IMPORT_STARTED = time.perf_counter()
 
-# 2. 导入 slowapi 相关模块
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
-from slowapi.middleware import SlowAPIMiddleware # <--- 导入中间件
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from fastapi import Depends, FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response
 
 from app.api.api import api_router
+from app.core.admin import require_admin
 from app.core.config import settings
+from app.core.metrics import CONTENT_TYPE, REGISTRY, MetricsMiddleware
+from app.core.rate_limit import (
+    RateLimitExceeded, RateLimitMiddleware, RouteCosts, TokenBucketLimiter, backend_from_url,
+    rate_limit_exceeded_handler, warn_if_not_shared
+)
+from app.core.sql_profiler import SQLProfilerMiddleware, sql_profiler
+from app.db.session import pool_status
+from app.services.warmup import warm_up, warmup_state
+from app.services.write_behind import write_behind_buffer
+
+# 1. 初始化令牌桶限流器
+# 桶状态保存在 RATE_LIMIT_STORAGE_URI 指定的存储中 (默认本机 SQLite 文件，多个 uvicorn worker
+# 共享同一组计数)；每个请求按路由开销 (RATE_LIMIT_ROUTE_COSTS) 扣减令牌
+limiter = TokenBucketLimiter(
+    backend=backend_from_url(settings.RATE_LIMIT_STORAGE_URI),
+    default_limit=settings.RATE_LIMIT_DEFAULT,
+    route_costs=RouteCosts(settings.RATE_LIMIT_ROUTE_COSTS, settings.RATE_LIMIT_DEFAULT_COST),
+    evict_interval=settings.RATE_LIMIT_EVICT_INTERVAL,
+)
+# 多 worker (uvicorn / gunicorn 的 WEB_CONCURRENCY) 却配置了进程内存储时告警
+warn_if_not_shared(limiter.backend, int(os.environ.get("WEB_CONCURRENCY") or 1))
+# 限流器自身的统计 (次数 / 拒绝次数 / 累计开销)，由 /metrics 暴露
+REGISTRY.callback_counter("rate_limit_checks_total", "Rate limit checks in this process.", lambda: limiter.checks)
+REGISTRY.callback_counter("rate_limit_rejected_total", "Rate limit checks rejected.", lambda: limiter.rejected)
+REGISTRY.callback_counter(
+    "rate_limit_errors_total", "Rate limit backend errors (requests allowed).", lambda: limiter.errors
+)
+REGISTRY.callback_counter(
+    "rate_limit_check_seconds_total", "Time spent in rate limit checks.", lambda: limiter.check_seconds
+)
 
-# 3. [关键] 初始化 Limiter 并设置 default_limits
-# default_limits=["3/minute"] 会自动应用到所有 API
-limiter = Limiter(key_func=get_remote_address, default_limits=["3/minute"])
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动预热：建立连接、加载热门测试 (见 services/warmup.py)；完成前 /health/ready 返回 503
+    warmup_task = None
+    if settings.WARMUP_ENABLED:
+        warmup = warm_up(import_seconds=IMPORT_SECONDS)
+        if settings.WARMUP_BLOCKING:
+            await warmup
+        else:
+            warmup_task = asyncio.create_task(warmup)
+    else:
+        warmup_state.ready = True
+
+    # write-behind 模式：启动时接管已退出进程的 spool 并写入其中未写入的会话，关闭时尽量写完队列
+    if settings.SUBMIT_WRITE_BEHIND:
+        await write_behind_buffer.start()
+    try:
+        yield
+    finally:
+        if warmup_task is not None and not warmup_task.done():
+            warmup_task.cancel()
+        if write_behind_buffer.running:
+            await write_behind_buffer.stop()
+        limiter.backend.close()
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
 )
 
-# 4. 将 limiter 注册到 app.state
+# 2. 将 limiter 注册到 app.state
 app.state.limiter = limiter
+# 路由内按工作量追加扣减 (charge) 超出时的 429，与中间件返回的格式一致
+app.add_exception_handler(RateLimitExceeded, rate_limit_exceeded_handler)
+
+# 3. 添加限流中间件
+# 这个中间件会拦截 *所有* 进入的请求，超出限制时直接返回 429 (带 Retry-After)
+app.add_middleware(RateLimitMiddleware, limiter=limiter)
 
-# 5. 添加自定义的异常处理 (返回 429 错误)
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+# 4. SQL 剖析中间件 (默认关闭时只做一次判断)
+app.add_middleware(SQLProfilerMiddleware, profiler=sql_profiler)
 
-# 6. [关键] 添加 SlowAPIMiddleware
-# 这个中间件会拦截 *所有* 进入的请求，并检查它们是否超出了 default_limits
-app.add_middleware(SlowAPIMiddleware)
+# 5. 指标中间件 (在限流之外，429 也会被统计)
+app.add_middleware(MetricsMiddleware)
 
 
 # 你的 CORS 中间件 (这部分你原来就有)
@@ -43,11 +104,60 @@ app.add_middleware(
 # 包含你的 API 路由
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
-# 7. (可选但推荐) 为根路径也显式加上限制
+# 根路径同样经过上面的限流中间件
 @app.get("/")
-@limiter.limit("3/minute") 
-async def read_root(request: Request): # 必须添加 request 参数
+async def read_root():
     """
     根路径健康检查
     """
-    return {"status": "OK", "project": settings.PROJECT_NAME}
\ No newline at end of file
+    return {"status": "OK", "project": settings.PROJECT_NAME}
+
+
+@app.get("/health/ready")
+async def read_readiness():
+    """
+    就绪检查：启动预热完成前返回 503，之后返回 200 (附各阶段耗时与启动预算)
+    """
+    return JSONResponse(warmup_state.to_dict(), status_code=200 if warmup_state.ready else 503)
+
+
+@app.get("/health/db-pool")
+async def read_db_pool():
+    """
+    数据库连接池状态：已借出 / 溢出连接数与取连接等待时间分布
+    """
+    return pool_status()
+
+
+@app.get("/metrics")
+async def read_metrics():
+    """
+    Prometheus 文本格式的进程内指标
+    """
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
+
+
+# SQL 剖析的查看与开关需要管理令牌 (ADMIN_TOKEN)。
+# 剖析状态和记录都在进程内：多 worker 部署时每次请求只会落到其中一个 worker，
+# 响应中的 pid 标明是哪一个；需要所有 worker 同时开启时使用 SQL_PROFILE_ENABLED 配置。
+@app.get("/health/sql-profile", dependencies=[Depends(require_admin)])
+async def read_sql_profile():
+    """
+    本 worker 的 SQL 剖析状态与最近请求的剖析结果 (按路由模板记录：查询次数 / 数据库耗时 / 最慢语句 / 疑似 N+1)
+    """
+    return {"pid": os.getpid(), "enabled": sql_profiler.enabled, "recent": list(sql_profiler.recent)}
+
+
+@app.put("/health/sql-profile", dependencies=[Depends(require_admin)])
+async def toggle_sql_profile(enabled: bool):
+    """
+    运行时开关本 worker 的 SQL 剖析，无需重启 (只对处理该请求的 worker 生效)
+    """
+    sql_profiler.enabled = enabled
+    if not enabled:
+        sql_profiler.recent.clear()
+    return {"pid": os.getpid(), "enabled": sql_profiler.enabled}
+
+
+# 导入阶段耗时 (计入启动耗时预算)
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
@@ -1,6 +1,6 @@
 from sqlalchemy import (
-    Column, Integer, String, Text, ForeignKey, TIMESTAMP,
-    UniqueConstraint, Index 
+    Column, Integer, String, Text, ForeignKey, TIMESTAMP, JSON, LargeBinary,
+    UniqueConstraint, Index, BigInteger
 )
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
@@ -17,6 +17,9 @@ class Test(Base):
     description = Column(Text)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    # [新增] 声明式计分规格 (见 services/scoring_specs.py)，为空时使用内置规格或默认加总
+    scoring_spec = Column(JSON, nullable=True)
+
     questions = relationship("Question", back_populates="test", cascade="all, delete-orphan")
     results = relationship("TestResult", back_populates="test", cascade="all, delete-orphan")
     sessions = relationship("TestSession", back_populates="test")
@@ -27,7 +30,7 @@ class Test(Base):
 class Question(Base):
     __tablename__ = "questions"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), nullable=False)
+    test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), nullable=False, index=True)
     text = Column(Text, nullable=False)
     order_index = Column(Integer, nullable=False)
 
@@ -41,7 +44,7 @@ class Question(Base):
 class QuestionOption(Base):
     __tablename__ = "question_options"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), nullable=False)
+    question_id = Column(Integer, ForeignKey("questions.id", ondelete="CASCADE"), nullable=False, index=True)
     text = Column(String(255), nullable=False)
     score = Column(Integer, nullable=False)
 
@@ -54,7 +57,7 @@ class QuestionOption(Base):
 class TestResult(Base):
     __tablename__ = "test_results"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), nullable=False)
+    test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), nullable=False, index=True)
     min_score = Column(Integer, nullable=False)
     max_score = Column(Integer)
     result_range = Column(String(255), nullable=False)
@@ -71,29 +74,70 @@ class TestResult(Base):
 class TestSession(Base):
     __tablename__ = "test_sessions"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(String(255), nullable=False, index=True)
+    user_id = Column(String(255), nullable=False)
     test_id = Column(Integer, ForeignKey("tests.id"), nullable=False)
     result = Column(String(255), nullable=False)
     total_score = Column(Integer, nullable=False)
     created_at = Column(TIMESTAMP, server_default=func.now())
 
+    # [新增] 紧凑存储 (见 services/session_codec.py)：不为空时答案 / 维度不再逐行写入
+    # user_answers / test_session_dimensions
+    answers_packed = Column(LargeBinary, nullable=True)
+    dimensions_packed = Column(Text, nullable=True)
+
     test = relationship("Test", back_populates="sessions")
-    answers = relationship("UserAnswer", back_populates="session", cascade="all, delete-orphan")
+    answers = relationship(
+        "UserAnswer", back_populates="session", cascade="all, delete-orphan",
+        order_by="UserAnswer.id"
+    )
     
-    # [新增] 关联维度结果表
+    # [新增] 关联维度结果表 (按写入顺序返回，与紧凑存储解码的顺序一致)
     dimensions = relationship(
         "TestSessionDimension", 
         back_populates="session", 
-        cascade="all, delete-orphan"
+        cascade="all, delete-orphan",
+        order_by="TestSessionDimension.id"
     )
 
+    # [新增] 用户历史的 keyset 分页 (user_id, created_at, id)，同时覆盖按 user_id 的查询
+    __table_args__ = (
+        Index('idx_sessions_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+# ---------------------------------------------------------------
+# [新增] Table: test_stats
+# 每个测试的会话计数，由提交路径增量维护 (可用 app.cli.rebuild_test_stats 从历史重建)
+# ---------------------------------------------------------------
+class TestStats(Base):
+    __tablename__ = "test_stats"
+    test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), primary_key=True)
+    session_count = Column(Integer, nullable=False, default=0, server_default="0")
+    updated_at = Column(TIMESTAMP, server_default=func.now(), onupdate=func.now())
+
+    __table_args__ = (
+        Index('idx_test_stats_session_count', 'session_count'),
+    )
+
+# ---------------------------------------------------------------
+# [新增] Table: score_distributions
+# 每个测试 / 维度的得分直方图：一个整数分值一行，由提交路径增量维护
+# (可用 app.cli.rebuild_score_distributions 从历史重建)。
+# dimension_code 为空串表示总分 (total_score)。
+# ---------------------------------------------------------------
+class ScoreDistribution(Base):
+    __tablename__ = "score_distributions"
+    test_id = Column(Integer, ForeignKey("tests.id", ondelete="CASCADE"), primary_key=True)
+    dimension_code = Column(String(10), primary_key=True, default="", server_default="")
+    score = Column(Integer, primary_key=True, autoincrement=False)
+    session_count = Column(Integer, nullable=False, default=0, server_default="0")
+
 # ---------------------------------------------------------------
 # Table: user_answers
 # ---------------------------------------------------------------
 class UserAnswer(Base):
     __tablename__ = "user_answers"
     id = Column(Integer, primary_key=True, autoincrement=True)
-    session_id = Column(Integer, ForeignKey("test_sessions.id", ondelete="CASCADE"), nullable=False)
+    session_id = Column(Integer, ForeignKey("test_sessions.id", ondelete="CASCADE"), nullable=False, index=True)
     question_id = Column(Integer, ForeignKey("questions.id"), nullable=False)
     selected_option_id = Column(Integer, ForeignKey("question_options.id"), nullable=False)
 
@@ -117,4 +161,34 @@ class TestSessionDimension(Base):
     
     __table_args__ = (
         Index('idx_session_dimension', 'session_id', 'dimension_code'),
-    )
\ No newline at end of file
+    )
+# ---------------------------------------------------------------
+# [新增] Table: archived_sessions
+# 已归档到本地压缩文件的会话索引 (见 services/archive_service.py)：
+# 会话内容 (答案 / 维度) 在 archive 文件中 [member_offset, member_offset + member_length) 的 gzip 成员里，
+# 这里只保留用户历史 / 导出过滤所需的列。id 即原 test_sessions.id。
+# ---------------------------------------------------------------
+class ArchivedSession(Base):
+    __tablename__ = "archived_sessions"
+    id = Column(Integer, primary_key=True, autoincrement=False)
+    user_id = Column(String(255), nullable=False)
+    test_id = Column(Integer, ForeignKey("tests.id"), nullable=False, index=True)
+    created_at = Column(TIMESTAMP, nullable=True)
+    archive = Column(String(255), nullable=False)
+    member_offset = Column(BigInteger, nullable=False)
+    member_length = Column(Integer, nullable=False)
+
+    # 与 test_sessions 相同的用户历史 keyset 索引
+    __table_args__ = (
+        Index('idx_archived_sessions_user_created', 'user_id', 'created_at', 'id'),
+    )
+
+# ---------------------------------------------------------------
+# [新增] Table: write_behind_checkpoints
+# write-behind spool 的写库进度 (见 services/write_behind.py)：每个 spool 文件一行，
+# seq 为已写入数据库的最大记录序号，与会话在同一事务中更新；spool 写完并删除后删除该行。
+# ---------------------------------------------------------------
+class WriteBehindCheckpoint(Base):
+    __tablename__ = "write_behind_checkpoints"
+    spool_id = Column(String(64), primary_key=True)
+    seq = Column(BigInteger, nullable=False)
@@ -1,5 +1,5 @@
-from pydantic import BaseModel
-from typing import List, Optional
+from pydantic import BaseModel, Field
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 # ----------------------------------------
@@ -45,6 +45,7 @@ class TestResultBase(BaseModel):
     max_score: Optional[int] = None
     result_range: str
     description: Optional[str] = None
+    dimension_code: Optional[str] = None # 维度代码；为空表示总分规则
 
 class TestResultCreate(TestResultBase):
     pass
@@ -67,6 +68,7 @@ class TestCreate(TestBase):
     test_type: str
     questions: List[QuestionCreate]
     results: List[TestResultCreate]
+    scoring_spec: Optional[Dict[str, Any]] = None # 可选的声明式计分规格
 
 # 用于 API 响应：返回一个 Test 及其所有的问题和结果范围
 class Test(TestBase):
@@ -75,6 +77,7 @@ class Test(TestBase):
     created_at: datetime
     questions: List[Question] = []
     results: List[TestResult] = []
+    scoring_spec: Optional[Dict[str, Any]] = None
 
     class Config:
         orm_mode = True
@@ -107,7 +110,7 @@ class UserAnswerInput(BaseModel):
     selected_option_id: int
 
 class TestSubmission(BaseModel):
-    user_id: str # 假设是一个唯一的字符串ID
+    user_id: str = Field(..., max_length=255) # 假设是一个唯一的字符串ID (与 test_sessions.user_id 列长度一致)
     answers: List[UserAnswerInput]
 
 
@@ -115,25 +118,71 @@ class TestSubmission(BaseModel):
 # Test Session (Result) Schemas
 # ----------------------------------------
 class UserAnswer(UserAnswerInput):
-    id: int
-    session_id: int
+    id: Optional[int] = None # 紧凑存储与 write-behind 模式下没有答案行 ID
+    session_id: Optional[int] = None
+
+    class Config:
+        orm_mode = True
+
+class TestSessionDimension(BaseModel):
+    dimension_code: str
+    score: int
+    result_range: str
 
     class Config:
         orm_mode = True
 
 class TestSession(BaseModel):
-    id: int
+    id: Optional[int] = None # write-behind 模式下提交返回时尚未写库
     user_id: str
     test_id: int
     result: str
     total_score: int
     created_at: datetime
     answers: List[UserAnswer] = []
+    dimensions: List[TestSessionDimension] = []
 
     class Config:
         orm_mode = True
 
 
+# 用户历史分页：next_cursor 为空表示没有更多数据
+class TestSessionPage(BaseModel):
+    items: List[TestSession] = []
+    next_cursor: Optional[str] = None
+
+
+# ----------------------------------------
+# Batch Submission Schemas
+# ----------------------------------------
+class BatchSubmissionItem(TestSubmission):
+    test_id: int
+
+class BatchSubmission(BaseModel):
+    items: List[BatchSubmissionItem]
+
+class BatchSubmissionResult(BaseModel):
+    index: int                              # 对应请求中 items 的下标
+    status_code: int
+    session: Optional[TestSession] = None   # 成功时返回的结果
+    error: Optional[str] = None             # 失败原因
+
+
+# ----------------------------------------
+# Test Import Schemas
+# ----------------------------------------
+class TestImport(BaseModel):
+    tests: List[TestCreate]
+
+class TestImportResult(BaseModel):
+    index: int                              # 对应请求中 tests 的下标
+    test_type: str
+    status: str                             # created / updated / unchanged / error
+    test_id: Optional[int] = None
+    changes: int = 0                        # updated 时写入的改动数
+    error: Optional[str] = None
+
+
 # ----------------------------------------
 # Popular Test Schemas
 # ----------------------------------------
@@ -145,4 +194,32 @@ class PopularTest(BaseModel):
     session_count: int    # 该测试被完成的次数
 
     class Config:
-        orm_mode = True
\ No newline at end of file
+        orm_mode = True
+
+# ----------------------------------------
+# Score Distribution Schemas
+# ----------------------------------------
+class ScoreBucket(BaseModel):
+    score: int
+    count: int
+
+class ScoreDistribution(BaseModel):
+    test_id: int
+    dimension_code: Optional[str] = None    # 为空表示总分
+    total: int                              # 样本数 (会话数)
+    mean: Optional[float] = None
+    buckets: List[ScoreBucket] = []
+    score: Optional[int] = None             # 请求中给出的分值
+    percentile_rank: Optional[float] = None # 该分值的百分位等级 (0-100)
+
+class PercentileRank(BaseModel):
+    dimension_code: Optional[str] = None    # 为空表示总分
+    score: int
+    percentile_rank: Optional[float] = None
+    sample_size: int
+
+class SessionPercentiles(BaseModel):
+    session_id: int
+    test_id: int
+    total: PercentileRank
+    dimensions: List[PercentileRank] = []
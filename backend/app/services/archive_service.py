@@ -0,0 +1,74 @@
+import asyncio
+import gzip
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ArchivedSession, TestSession, TestSessionDimension, UserAnswer
+from app.services.export_service import build_records, encode_ndjson, session_query
+from app.services.session_archive import append_member, archive_name
+
+# ---------------------------------------------------------------
+# 冷数据归档：把早于 cutoff 的会话移出热表
+#
+# 每批按会话 ID 升序：
+#   1. 读出会话头，答案 / 维度用两条 IN 查询取回 (紧凑存储直接解码)，组成与导出相同的记录；
+#   2. 按创建月份分组，每组压缩成一个 gzip 成员追加到归档文件并 fsync；
+#   3. 在同一个事务中写入 archived_sessions 索引，删除 user_answers / test_session_dimensions / test_sessions 的行。
+# 第 2 步之后中断时文件中会多出未被索引引用的成员，重新运行会再次归档这些会话，不会丢数据。
+# test_stats 与 score_distributions 是聚合结果，归档不改变它们。
+# ---------------------------------------------------------------
+
+
+async def count_archivable(db: AsyncSession, cutoff: datetime) -> int:
+    return await db.scalar(select(func.count()).select_from(TestSession).where(TestSession.created_at < cutoff))
+
+
+async def archive_session_batch(
+    db: AsyncSession,
+    cutoff: datetime,
+    after_id: int = 0,
+    batch_size: int = 500
+) -> Tuple[int, int]:
+    """
+    归档一批 (created_at < cutoff 且 id > after_id) 的会话，返回 (归档数量, 最后一个会话 ID)；由调用方提交
+    """
+    stmt = session_query(None, None, cutoff).where(TestSession.id > after_id).limit(batch_size)
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return 0, after_id
+
+    # 1. 组成导出格式的记录
+    records = await build_records(await db.connection(), rows)
+
+    # 2. 按月份写入归档文件 (先落盘，再删除热表中的行)
+    groups: Dict[str, List[int]] = {}
+    for position, row in enumerate(rows):
+        groups.setdefault(archive_name(row.created_at), []).append(position)
+
+    index_rows = []
+    for name, positions in groups.items():
+        data = gzip.compress(encode_ndjson([records[p] for p in positions]), compresslevel=9, mtime=0)
+        offset, length = await asyncio.to_thread(append_member, name, data)
+        index_rows += [
+            {
+                "id": rows[p].id,
+                "user_id": rows[p].user_id,
+                "test_id": rows[p].test_id,
+                "created_at": rows[p].created_at,
+                "archive": name,
+                "member_offset": offset,
+                "member_length": length,
+            }
+            for p in positions
+        ]
+
+    # 3. 写索引并删除热表中的行
+    session_ids = [row.id for row in rows]
+    await db.execute(insert(ArchivedSession), index_rows)
+    await db.execute(delete(UserAnswer).where(UserAnswer.session_id.in_(session_ids)))
+    await db.execute(delete(TestSessionDimension).where(TestSessionDimension.session_id.in_(session_ids)))
+    await db.execute(delete(TestSession).where(TestSession.id.in_(session_ids)))
+    return len(rows), rows[-1].id
@@ -0,0 +1,103 @@
+from typing import List, Tuple
+
+from sqlalchemy import delete, insert, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.models.models import TestSession, UserAnswer, TestSessionDimension
+from app.services.session_codec import (
+    pack_answers, pack_dimensions, unpack_answers, unpack_dimensions
+)
+
+# ---------------------------------------------------------------
+# 紧凑存储的回填 / 还原 (按 id 分批，供 app.cli.pack_sessions 调用)
+# ---------------------------------------------------------------
+
+
+async def pack_session_batch(
+    db: AsyncSession,
+    after_id: int,
+    batch_size: int,
+    keep_rows: bool = False
+) -> Tuple[int, int]:
+    """
+    把 id > after_id 的一批逐行存储会话打包到 test_sessions 上。
+    keep_rows=False 时删除已打包的 user_answers / test_session_dimensions 行。
+    返回 (处理的会话数, 本批最后一个 id)
+    """
+    stmt = (
+        select(TestSession)
+        .where(TestSession.id > after_id, TestSession.answers_packed.is_(None))
+        .order_by(TestSession.id)
+        .limit(batch_size)
+        .options(
+            selectinload(TestSession.answers),
+            selectinload(TestSession.dimensions)
+        )
+    )
+    result = await db.execute(stmt)
+    sessions = result.scalars().all()
+    if not sessions:
+        return 0, after_id
+
+    packed_rows = []
+    for session in sessions:
+        answers = sorted(session.answers, key=lambda a: a.id)
+        dimensions = sorted(session.dimensions, key=lambda d: d.id)
+        packed_rows.append({
+            "id": session.id,
+            "answers_packed": pack_answers([(a.question_id, a.selected_option_id) for a in answers]),
+            "dimensions_packed": pack_dimensions([(d.dimension_code, d.score, d.result_range) for d in dimensions]),
+        })
+    # 按主键批量 UPDATE (executemany)
+    await db.execute(update(TestSession), packed_rows)
+
+    session_ids = [s.id for s in sessions]
+    if not keep_rows:
+        await db.execute(delete(UserAnswer).where(UserAnswer.session_id.in_(session_ids)))
+        await db.execute(delete(TestSessionDimension).where(TestSessionDimension.session_id.in_(session_ids)))
+
+    return len(sessions), session_ids[-1]
+
+
+async def unpack_session_batch(db: AsyncSession, after_id: int, batch_size: int) -> Tuple[int, int]:
+    """
+    把紧凑存储的会话还原为逐行存储 (降级迁移前使用)
+    """
+    stmt = (
+        select(TestSession.id, TestSession.answers_packed, TestSession.dimensions_packed)
+        .where(TestSession.id > after_id, TestSession.answers_packed.isnot(None))
+        .order_by(TestSession.id)
+        .limit(batch_size)
+    )
+    rows = (await db.execute(stmt)).all()
+    if not rows:
+        return 0, after_id
+
+    answer_rows: List[dict] = []
+    dimension_rows: List[dict] = []
+    for session_id, answers_packed, dimensions_packed in rows:
+        answer_rows += [
+            {"session_id": session_id, "question_id": q_id, "selected_option_id": opt_id}
+            for q_id, opt_id in unpack_answers(answers_packed)
+        ]
+        dimension_rows += [
+            {"session_id": session_id, "dimension_code": code, "score": score, "result_range": text}
+            for code, score, text in unpack_dimensions(dimensions_packed)
+        ]
+
+    session_ids = [row[0] for row in rows]
+    # 删除可能以 keep_rows 方式保留下来的旧行，避免重复
+    await db.execute(delete(UserAnswer).where(UserAnswer.session_id.in_(session_ids)))
+    await db.execute(delete(TestSessionDimension).where(TestSessionDimension.session_id.in_(session_ids)))
+    if answer_rows:
+        await db.execute(insert(UserAnswer), answer_rows)
+    if dimension_rows:
+        await db.execute(insert(TestSessionDimension), dimension_rows)
+    await db.execute(
+        update(TestSession)
+        .where(TestSession.id.in_(session_ids))
+        .values(answers_packed=None, dimensions_packed=None)
+    )
+    return len(rows), session_ids[-1]
@@ -0,0 +1,203 @@
+from bisect import bisect_left
+from collections import Counter
+from itertools import accumulate
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import ScoreDistribution, TestSession, TestSessionDimension
+from app.schemas import schemas
+from app.services.session_archive import iter_archived_batches
+from app.services.session_codec import unpack_dimensions
+from app.services.stats_service import upsert_counts
+
+# ---------------------------------------------------------------
+# 得分分布 (score_distributions)
+#
+# 每个 (测试, 维度) 一个直方图，每个出现过的整数分值一行 (分值范围有界，行数很少)。
+# 提交时与 test_stats 在同一事务内累加；查询时按主键前缀读出一个直方图，
+# 百分位由累计计数二分得到，不扫描 test_sessions / test_session_dimensions。
+# ---------------------------------------------------------------
+
+# 总分直方图使用的 dimension_code
+TOTAL_DIMENSION = ""
+
+
+class ScoreHistogram:
+    """
+    一个 (测试, 维度) 的得分直方图：buckets 为按分值升序的 (score, count)
+    """
+
+    def __init__(self, buckets: Sequence[Tuple[int, int]]):
+        self.buckets = list(buckets)
+        self._scores = [score for score, _ in self.buckets]
+        # _below[i]：分值低于 _scores[i] 的会话数
+        self._below = [0, *accumulate(count for _, count in self.buckets)]
+        self.total = self._below[-1]
+
+    @property
+    def mean(self) -> Optional[float]:
+        if not self.total:
+            return None
+        return sum(score * count for score, count in self.buckets) / self.total
+
+    def percentile_rank(self, score: int) -> Optional[float]:
+        """
+        百分位等级 (0-100)：低于该分值的比例加上同分者的一半
+        """
+        if not self.total:
+            return None
+        i = bisect_left(self._scores, score)
+        below = self._below[i]
+        equal = self.buckets[i][1] if i < len(self._scores) and self._scores[i] == score else 0
+        return round((below + equal / 2) / self.total * 100, 2)
+
+
+_KEY_COLUMNS = ["test_id", "dimension_code", "score"]
+
+
+def _count_rows(counts: Counter) -> List[dict]:
+    """
+    (test_id, dimension_code, score) -> 次数  转为按主键排序的累加行
+    """
+    return [
+        {"test_id": test_id, "dimension_code": code, "score": score, "session_count": n}
+        for (test_id, code, score), n in sorted(counts.items())
+    ]
+
+
+async def increment_score_distributions(
+    db: AsyncSession,
+    sessions: Iterable[Tuple[int, int, Sequence[Tuple[str, int, str]]]]
+) -> None:
+    """
+    提交路径调用：sessions 为本次写入的 (test_id, total_score, dimensions)
+    """
+    counts: Counter = Counter()
+    for test_id, total_score, dimensions in sessions:
+        counts[(test_id, TOTAL_DIMENSION, total_score)] += 1
+        for code, score, _ in dimensions:
+            counts[(test_id, code, score)] += 1
+    await upsert_counts(db, ScoreDistribution, _KEY_COLUMNS, _count_rows(counts))
+
+
+async def get_histograms(
+    db: AsyncSession,
+    test_id: int,
+    dimension_codes: Optional[Sequence[str]] = None
+) -> Dict[str, ScoreHistogram]:
+    """
+    读取一个测试的直方图 (dimension_code -> ScoreHistogram)，只读主键前缀范围内的行
+    """
+    stmt = (
+        select(ScoreDistribution.dimension_code, ScoreDistribution.score, ScoreDistribution.session_count)
+        .where(ScoreDistribution.test_id == test_id)
+        .order_by(ScoreDistribution.dimension_code, ScoreDistribution.score)
+    )
+    if dimension_codes is not None:
+        stmt = stmt.where(ScoreDistribution.dimension_code.in_(dimension_codes))
+
+    buckets: Dict[str, List[Tuple[int, int]]] = {}
+    for code, score, count in (await db.execute(stmt)).all():
+        buckets.setdefault(code, []).append((score, count))
+    return {code: ScoreHistogram(rows) for code, rows in buckets.items()}
+
+
+async def get_score_distribution(
+    db: AsyncSession,
+    test_id: int,
+    dimension_code: Optional[str] = None,
+    score: Optional[int] = None
+) -> schemas.ScoreDistribution:
+    """
+    一个测试 (或其某个维度) 的得分分布；给出 score 时附带该分值的百分位等级
+    """
+    code = dimension_code or TOTAL_DIMENSION
+    histogram = (await get_histograms(db, test_id, [code])).get(code) or ScoreHistogram([])
+    return schemas.ScoreDistribution(
+        test_id=test_id,
+        dimension_code=dimension_code or None,
+        total=histogram.total,
+        mean=round(histogram.mean, 3) if histogram.mean is not None else None,
+        buckets=[schemas.ScoreBucket(score=s, count=n) for s, n in histogram.buckets],
+        score=score,
+        percentile_rank=histogram.percentile_rank(score) if score is not None else None,
+    )
+
+
+def session_percentiles(
+    session: schemas.TestSession,
+    histograms: Dict[str, ScoreHistogram]
+) -> schemas.SessionPercentiles:
+    """
+    一次会话的总分与各维度分在同一测试所有会话中的百分位等级
+    """
+    def rank(code: str, score: int) -> schemas.PercentileRank:
+        histogram = histograms.get(code) or ScoreHistogram([])
+        return schemas.PercentileRank(
+            dimension_code=code or None,
+            score=score,
+            percentile_rank=histogram.percentile_rank(score),
+            sample_size=histogram.total,
+        )
+
+    return schemas.SessionPercentiles(
+        session_id=session.id,
+        test_id=session.test_id,
+        total=rank(TOTAL_DIMENSION, session.total_score),
+        dimensions=[rank(d.dimension_code, d.score) for d in session.dimensions],
+    )
+
+
+async def rebuild_score_distributions(db: AsyncSession, batch_size: int = 5000) -> int:
+    """
+    根据历史会话重建 score_distributions，返回写入的行数。
+    逐行存储的维度用 GROUP BY 在数据库内聚合；紧凑存储的维度流式读出后在内存中解码聚合
+    (以 --keep-rows 打包的会话同时保留了维度行，只按打包数据计一次)；
+    已归档的会话从归档文件中读出聚合。
+    """
+    await db.execute(delete(ScoreDistribution))
+    columns = [*_KEY_COLUMNS, "session_count"]
+
+    # 1. 总分
+    totals = (
+        select(TestSession.test_id, literal(TOTAL_DIMENSION), TestSession.total_score, func.count())
+        .group_by(TestSession.test_id, TestSession.total_score)
+    )
+    await db.execute(insert(ScoreDistribution).from_select(columns, totals))
+
+    # 2. 逐行存储的维度 (已打包的会话在第 3 步统计，跳过其保留下来的维度行)
+    dimensions = (
+        select(
+            TestSession.test_id, TestSessionDimension.dimension_code,
+            TestSessionDimension.score, func.count()
+        )
+        .join(TestSessionDimension, TestSessionDimension.session_id == TestSession.id)
+        .where(TestSession.dimensions_packed.is_(None))
+        .group_by(TestSession.test_id, TestSessionDimension.dimension_code, TestSessionDimension.score)
+    )
+    await db.execute(insert(ScoreDistribution).from_select(columns, dimensions))
+
+    # 3. 紧凑存储的维度 (分值可能与第 2 步重叠，用累加写入)
+    packed = (
+        select(TestSession.test_id, TestSession.dimensions_packed)
+        .where(TestSession.dimensions_packed.is_not(None))
+        .execution_options(yield_per=batch_size)
+    )
+    counts: Counter = Counter()
+    async for test_id, data in await db.stream(packed):
+        for code, score, _ in unpack_dimensions(data):
+            counts[(test_id, code, score)] += 1
+
+    # 4. 已归档的会话 (总分与维度都在归档记录中)
+    async for records in iter_archived_batches(await db.connection(), batch_size=batch_size):
+        for record in records:
+            counts[(record["test_id"], TOTAL_DIMENSION, record["total_score"])] += 1
+            for code, score, _ in record["dimensions"]:
+                counts[(record["test_id"], code, score)] += 1
+    rows = _count_rows(counts)
+    for start in range(0, len(rows), batch_size):
+        await upsert_counts(db, ScoreDistribution, _KEY_COLUMNS, rows[start:start + batch_size])
+
+    return await db.scalar(select(func.count()).select_from(ScoreDistribution))
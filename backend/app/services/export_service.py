@@ -0,0 +1,205 @@
+import asyncio
+import csv
+import io
+import json
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.clock import as_utc_naive
+from app.core.config import settings
+from app.db.session import engine
+from app.models.models import ArchivedSession, TestSession, TestSessionDimension, UserAnswer
+from app.services.session_archive import archived_query, read_archived_records
+from app.services.session_codec import unpack_answers, unpack_dimensions
+
+# ---------------------------------------------------------------
+# 会话全量导出 (NDJSON / CSV，可选 gzip)
+#
+# 会话头按会话 ID keyset 分页逐批读出 (WHERE id > 上一批最后的 ID ORDER BY id LIMIT n)，
+# 每批会话的答案 / 维度各用一条 IN 查询取回，紧凑存储的会话直接解码。
+# 每批只从连接池借用一个连接，读完即归还：客户端接收 (可能很慢) 期间不占用任何数据库连接。
+# 每批编码 (压缩) 后立即交给调用方，内存占用只与批大小有关。
+# 已归档的会话 (见 services/session_archive.py) 先于热表中的会话输出。
+#
+# HTTP 接口 (GET /sessions/export) 每个 worker 同时最多 EXPORT_MAX_CONCURRENT 个导出 (export_slots)。
+# ---------------------------------------------------------------
+
+EXPORT_FORMATS = ("ndjson", "csv")
+CSV_COLUMNS = ["id", "user_id", "test_id", "result", "total_score", "created_at", "answers", "dimensions"]
+MEDIA_TYPES = {"ndjson": "application/x-ndjson", "csv": "text/csv; charset=utf-8"}
+
+# 进程内的并发导出名额 (HTTP 接口使用；命令行导出不受限)
+export_slots = asyncio.Semaphore(max(settings.EXPORT_MAX_CONCURRENT, 1))
+
+
+def session_query(
+    test_id: Optional[int],
+    created_from: Optional[datetime],
+    created_to: Optional[datetime]
+):
+    stmt = select(
+        TestSession.id, TestSession.user_id, TestSession.test_id, TestSession.result,
+        TestSession.total_score, TestSession.created_at,
+        TestSession.answers_packed, TestSession.dimensions_packed,
+    ).order_by(TestSession.id)
+    if test_id is not None:
+        stmt = stmt.where(TestSession.test_id == test_id)
+    # 时间范围为左闭右开 [created_from, created_to)
+    if created_from is not None:
+        stmt = stmt.where(TestSession.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(TestSession.created_at < created_to)
+    return stmt
+
+
+async def build_records(lookup: AsyncConnection, rows: Sequence[Any]) -> List[Dict[str, Any]]:
+    # 只为逐行存储的会话查询答案和维度
+    row_ids = [row.id for row in rows if row.answers_packed is None or row.dimensions_packed is None]
+    answers: Dict[int, List[List[int]]] = {}
+    dimensions: Dict[int, List[List[Any]]] = {}
+    if row_ids:
+        answer_rows = await lookup.execute(
+            select(UserAnswer.session_id, UserAnswer.question_id, UserAnswer.selected_option_id)
+            .where(UserAnswer.session_id.in_(row_ids))
+            .order_by(UserAnswer.session_id, UserAnswer.id)
+        )
+        for session_id, q_id, opt_id in answer_rows:
+            answers.setdefault(session_id, []).append([q_id, opt_id])
+        dimension_rows = await lookup.execute(
+            select(
+                TestSessionDimension.session_id, TestSessionDimension.dimension_code,
+                TestSessionDimension.score, TestSessionDimension.result_range
+            )
+            .where(TestSessionDimension.session_id.in_(row_ids))
+            .order_by(TestSessionDimension.session_id, TestSessionDimension.id)
+        )
+        for session_id, code, score, text in dimension_rows:
+            dimensions.setdefault(session_id, []).append([code, score, text])
+
+    return [
+        {
+            "id": row.id,
+            "user_id": row.user_id,
+            "test_id": row.test_id,
+            "result": row.result,
+            "total_score": row.total_score,
+            "created_at": row.created_at.isoformat() if row.created_at else None,
+            "answers": (
+                [list(a) for a in unpack_answers(row.answers_packed)]
+                if row.answers_packed is not None else answers.get(row.id, [])
+            ),
+            "dimensions": (
+                [list(d) for d in unpack_dimensions(row.dimensions_packed)]
+                if row.dimensions_packed is not None else dimensions.get(row.id, [])
+            ),
+        }
+        for row in rows
+    ]
+
+
+async def _iter_pages(
+    stmt,
+    id_column,
+    batch_size: int,
+    build: Callable[[AsyncConnection, Sequence[Any]], Awaitable[List[Dict[str, Any]]]]
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    # stmt 须按 id_column 升序；每批在一个短时借用的连接上完成读取和组装
+    last_id = None
+    while True:
+        page = stmt.limit(batch_size)
+        if last_id is not None:
+            page = page.where(id_column > last_id)
+        async with engine.connect() as conn:
+            rows = (await conn.execute(page)).all()
+            records = await build(conn, rows) if rows else []
+        if records:
+            yield records
+        if len(rows) < batch_size:
+            return
+        last_id = rows[-1].id
+
+
+async def _build_archived(conn: AsyncConnection, rows: Sequence[Any]) -> List[Dict[str, Any]]:
+    return await read_archived_records(rows)
+
+
+async def iter_session_batches(
+    test_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: Optional[int] = None,
+    include_archived: bool = True
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    逐批产出导出记录 (answers: [[question_id, option_id]], dimensions: [[code, score, text]])：
+    先是已归档的会话，再是热表中的会话，各自按会话 ID 升序。
+    created_at 按 UTC 保存，带时区的时间范围先换算为 UTC
+    """
+    batch_size = batch_size or settings.EXPORT_BATCH_SIZE
+    created_from, created_to = as_utc_naive(created_from), as_utc_naive(created_to)
+    if include_archived:
+        stmt = archived_query(test_id, created_from, created_to)
+        async for records in _iter_pages(stmt, ArchivedSession.id, batch_size, _build_archived):
+            yield records
+
+    stmt = session_query(test_id, created_from, created_to)
+    async for records in _iter_pages(stmt, TestSession.id, batch_size, build_records):
+        yield records
+
+
+def encode_ndjson(records: List[Dict[str, Any]]) -> bytes:
+    return "".join(
+        json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n" for record in records
+    ).encode("utf-8")
+
+
+def _encode_csv(records: List[Dict[str, Any]], header: bool) -> bytes:
+    # answers / dimensions 列为 JSON 数组
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(CSV_COLUMNS)
+    for record in records:
+        writer.writerow([
+            record["id"], record["user_id"], record["test_id"], record["result"],
+            record["total_score"], record["created_at"],
+            json.dumps(record["answers"], separators=(",", ":")),
+            json.dumps(record["dimensions"], ensure_ascii=False, separators=(",", ":")),
+        ])
+    return buffer.getvalue().encode("utf-8")
+
+
+async def export_chunks(
+    fmt: str = "ndjson",
+    test_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    compress: bool = False,
+    batch_size: Optional[int] = None,
+    include_archived: bool = True
+) -> AsyncIterator[bytes]:
+    """
+    逐批产出编码后的字节块；compress 时为一个连续的 gzip 流，每批做一次 sync flush 以便客户端即时收到
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Unsupported export format '{fmt}'")
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    # CSV 表头先行输出 (没有数据时也有表头)
+    if fmt == "csv":
+        header = _encode_csv([], header=True)
+        yield compressor.compress(header) if compressor else header
+
+    async for records in iter_session_batches(test_id, created_from, created_to, batch_size, include_archived):
+        chunk = encode_ndjson(records) if fmt == "ndjson" else _encode_csv(records, header=False)
+        if compressor is not None:
+            chunk = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if chunk:
+            yield chunk
+
+    if compressor is not None:
+        yield compressor.flush()
@@ -0,0 +1,269 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import delete, exists, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.models.models import (
+    ArchivedSession, Question, QuestionOption, Test, TestResult, TestSession, UserAnswer
+)
+from app.schemas import schemas
+from app.services.test_cache import mark_tests_changed
+from app.services.test_service import get_test_ids_by_type, validate_test_definition
+
+# ---------------------------------------------------------------
+# 测试定义批量导入 (按 test_type upsert)
+#
+# 1. 逐条校验，一条查询取回已存在的 test_type；
+# 2. 新测试按层级 (tests -> questions -> options / results) 各用多行 INSERT 写入；
+# 3. 已存在的测试与库中定义比较，只写入有变化的部分：
+#    题目按 order_index 对应，选项按题内顺序对应，结果规则有任何变化时整体替换。
+#    已有会话的测试不允许删除题目或选项 (历史答案仍引用它们；热表、逐行答案和归档中任一处有会话即算)。
+# 所有写入在调用方的同一个事务中完成。
+# ---------------------------------------------------------------
+
+_TEST_FIELDS = ("title", "description", "scoring_spec")
+
+
+class ImportConflict(Exception):
+    pass
+
+
+@dataclass
+class _Diff:
+    """
+    一个已存在测试的改动 (各列表为待执行的行)
+    """
+    test_values: Dict[str, Any] = field(default_factory=dict)
+    question_updates: List[dict] = field(default_factory=list)
+    option_updates: List[dict] = field(default_factory=list)
+    new_options: List[dict] = field(default_factory=list)
+    new_questions: List[schemas.QuestionCreate] = field(default_factory=list)
+    removed_question_ids: List[int] = field(default_factory=list)
+    removed_option_ids: List[int] = field(default_factory=list)
+    replace_results: bool = False
+
+    @property
+    def changes(self) -> int:
+        return (
+            bool(self.test_values) + len(self.question_updates) + len(self.option_updates)
+            + len(self.new_options) + len(self.new_questions)
+            + len(self.removed_question_ids) + len(self.removed_option_ids) + self.replace_results
+        )
+
+
+def _result_key(r) -> Tuple:
+    return (r.dimension_code or "", r.min_score, r.max_score, r.result_range, r.description)
+
+
+def _validate_item(test: schemas.TestCreate) -> None:
+    validate_test_definition(test)
+    order = [q.order_index for q in test.questions]
+    if len(order) != len(set(order)):
+        raise HTTPException(status_code=400, detail="Duplicate question order_index")
+
+
+async def _insert_questions(db: AsyncSession, items: Sequence[Tuple[int, schemas.QuestionCreate]]) -> None:
+    """
+    items: (test_id, 题目)。题目多行 INSERT 后按 (test_id, order_index) 取回 ID
+    (同一测试内 order_index 唯一)，再一次写入所有选项。
+    """
+    if not items:
+        return
+    await db.execute(insert(Question.__table__), [
+        {"test_id": test_id, "text": q.text, "order_index": q.order_index} for test_id, q in items
+    ])
+    keys = [(test_id, q.order_index) for test_id, q in items]
+    question_ids = dict(
+        ((row.test_id, row.order_index), row.id)
+        for row in (await db.execute(
+            select(Question.id, Question.test_id, Question.order_index)
+            .where(tuple_(Question.test_id, Question.order_index).in_(keys))
+        )).all()
+    )
+    option_rows = [
+        {"question_id": question_ids[(test_id, q.order_index)], "text": opt.text, "score": opt.score}
+        for test_id, q in items
+        for opt in q.options
+    ]
+    if option_rows:
+        await db.execute(insert(QuestionOption.__table__), option_rows)
+
+
+def _result_rows(test_id: int, results: Sequence[schemas.TestResultCreate]) -> List[dict]:
+    return [
+        {
+            "test_id": test_id, "min_score": r.min_score, "max_score": r.max_score,
+            "result_range": r.result_range, "description": r.description, "dimension_code": r.dimension_code,
+        }
+        for r in results
+    ]
+
+
+async def _create_tests(db: AsyncSession, tests: List[schemas.TestCreate]) -> List[int]:
+    # 按层级各一条多行 INSERT；新行的 ID 通过唯一键 (test_type / test_id + order_index) 取回，
+    # 不依赖 RETURNING 的返回顺序 (MySQL 不支持 RETURNING，SQLite 无法保证多行返回顺序)
+    if not tests:
+        return []
+    await db.execute(insert(Test.__table__), [
+        {"test_type": t.test_type, "title": t.title, "description": t.description, "scoring_spec": t.scoring_spec}
+        for t in tests
+    ])
+    ids_by_type = await get_test_ids_by_type(db, [t.test_type for t in tests])
+    test_ids = [ids_by_type[t.test_type] for t in tests]
+    await _insert_questions(db, [
+        (test_id, q) for test_id, t in zip(test_ids, tests) for q in sorted(t.questions, key=lambda q: q.order_index)
+    ])
+    result_rows = [row for test_id, t in zip(test_ids, tests) for row in _result_rows(test_id, t.results)]
+    if result_rows:
+        await db.execute(insert(TestResult.__table__), result_rows)
+    return test_ids
+
+
+async def _load_existing(db: AsyncSession, test_ids: List[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    已存在测试的当前定义 (Core 查询，不构建 ORM 对象图)
+    """
+    existing: Dict[int, Dict[str, Any]] = {
+        row.id: {"row": row, "questions": {}, "results": [], "has_sessions": False}
+        for row in (await db.execute(
+            select(Test.id, Test.title, Test.description, Test.scoring_spec).where(Test.id.in_(test_ids))
+        )).all()
+    }
+    questions: Dict[int, Dict[str, Any]] = {}
+    for q in (await db.execute(
+        select(Question.id, Question.test_id, Question.text, Question.order_index)
+        .where(Question.test_id.in_(test_ids)).order_by(Question.id)
+    )).all():
+        questions[q.id] = {"row": q, "options": []}
+        existing[q.test_id]["questions"].setdefault(q.order_index, questions[q.id])
+    for opt in (await db.execute(
+        select(QuestionOption.id, QuestionOption.question_id, QuestionOption.text, QuestionOption.score)
+        .join(Question, Question.id == QuestionOption.question_id)
+        .where(Question.test_id.in_(test_ids)).order_by(QuestionOption.id)
+    )).all():
+        questions[opt.question_id]["options"].append(opt)
+    for r in (await db.execute(select(TestResult).where(TestResult.test_id.in_(test_ids)))).scalars():
+        existing[r.test_id]["results"].append(r)
+    # 直接用 EXISTS 判断是否已有会话，不依赖可能滞后的 test_stats 计数
+    referenced = or_(
+        exists().where(TestSession.test_id == Test.id),
+        exists().where(UserAnswer.question_id == Question.id, Question.test_id == Test.id),
+        exists().where(ArchivedSession.test_id == Test.id),
+    )
+    for test_id in (await db.scalars(select(Test.id).where(Test.id.in_(test_ids), referenced))):
+        existing[test_id]["has_sessions"] = True
+    return existing
+
+
+def _diff_test(current: Dict[str, Any], test_in: schemas.TestCreate) -> _Diff:
+    diff = _Diff()
+    row = current["row"]
+    for name in _TEST_FIELDS:
+        if getattr(row, name) != getattr(test_in, name):
+            diff.test_values[name] = getattr(test_in, name)
+
+    current_questions = current["questions"]
+    for q_in in test_in.questions:
+        q = current_questions.get(q_in.order_index)
+        if q is None:
+            diff.new_questions.append(q_in)
+            continue
+        if q["row"].text != q_in.text:
+            diff.question_updates.append({"id": q["row"].id, "text": q_in.text})
+        options = q["options"]
+        for position, opt_in in enumerate(q_in.options):
+            if position >= len(options):
+                diff.new_options.append({"question_id": q["row"].id, "text": opt_in.text, "score": opt_in.score})
+            elif (options[position].text, options[position].score) != (opt_in.text, opt_in.score):
+                diff.option_updates.append({"id": options[position].id, "text": opt_in.text, "score": opt_in.score})
+        diff.removed_option_ids += [opt.id for opt in options[len(q_in.options):]]
+
+    incoming_order = {q.order_index for q in test_in.questions}
+    diff.removed_question_ids = [
+        q["row"].id for order_index, q in current_questions.items() if order_index not in incoming_order
+    ]
+    diff.replace_results = (
+        sorted(map(_result_key, current["results"])) != sorted(map(_result_key, test_in.results))
+    )
+
+    if current["has_sessions"] and (diff.removed_question_ids or diff.removed_option_ids):
+        raise ImportConflict("Cannot remove questions or options from a test that already has sessions")
+    return diff
+
+
+async def _apply_diff(db: AsyncSession, test_id: int, test_in: schemas.TestCreate, diff: _Diff) -> None:
+    if diff.test_values:
+        await db.execute(update(Test).where(Test.id == test_id).values(**diff.test_values))
+    # 按主键批量 UPDATE (executemany)
+    if diff.question_updates:
+        await db.execute(update(Question), diff.question_updates)
+    if diff.option_updates:
+        await db.execute(update(QuestionOption), diff.option_updates)
+    if diff.new_options:
+        await db.execute(insert(QuestionOption.__table__), diff.new_options)
+    if diff.removed_option_ids or diff.removed_question_ids:
+        await db.execute(delete(QuestionOption).where(
+            QuestionOption.id.in_(diff.removed_option_ids)
+            | QuestionOption.question_id.in_(diff.removed_question_ids)
+        ))
+    if diff.removed_question_ids:
+        await db.execute(delete(Question).where(Question.id.in_(diff.removed_question_ids)))
+    if diff.new_questions:
+        await _insert_questions(db, [(test_id, q) for q in diff.new_questions])
+    if diff.replace_results:
+        await db.execute(delete(TestResult).where(TestResult.test_id == test_id))
+        if test_in.results:
+            await db.execute(insert(TestResult.__table__), _result_rows(test_id, test_in.results))
+
+
+async def import_tests(db: AsyncSession, tests: List[schemas.TestCreate]) -> List[schemas.TestImportResult]:
+    """
+    批量导入测试定义；出错的条目只记录错误，不影响其它条目
+    """
+    results: List[schemas.TestImportResult] = [
+        schemas.TestImportResult(index=index, test_type=t.test_type, status="pending")
+        for index, t in enumerate(tests)
+    ]
+
+    # 1. 逐条校验 (同一文件中 test_type 不能重复)
+    valid: Dict[str, int] = {}
+    for index, test_in in enumerate(tests):
+        try:
+            _validate_item(test_in)
+            if test_in.test_type in valid:
+                raise HTTPException(status_code=400, detail="Duplicate test_type in import")
+            valid[test_in.test_type] = index
+        except HTTPException as e:
+            results[index].status, results[index].error = "error", e.detail
+
+    # 2. 一条查询判断哪些 test_type 已存在
+    existing_ids = await get_test_ids_by_type(db, valid)
+
+    # 3. 已存在的测试：只写入差异
+    current = await _load_existing(db, list(existing_ids.values())) if existing_ids else {}
+    for test_type, test_id in existing_ids.items():
+        index = valid[test_type]
+        result = results[index]
+        result.test_id = test_id
+        try:
+            diff = _diff_test(current[test_id], tests[index])
+        except ImportConflict as e:
+            result.status, result.error = "error", str(e)
+            continue
+        result.changes = diff.changes
+        result.status = "updated" if diff.changes else "unchanged"
+        if diff.changes:
+            await _apply_diff(db, test_id, tests[index], diff)
+
+    # 4. 新测试：按层级多行 INSERT
+    new_indexes = [index for test_type, index in valid.items() if test_type not in existing_ids]
+    new_ids = await _create_tests(db, [tests[index] for index in new_indexes])
+    for index, test_id in zip(new_indexes, new_ids):
+        results[index].status, results[index].test_id = "created", test_id
+
+    if new_ids or any(r.status == "updated" for r in results):
+        await db.flush()
+        mark_tests_changed(db)
+    return results
@@ -0,0 +1,186 @@
+from dataclasses import dataclass, field
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import bindparam, func, select, text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+from app.core.clock import utc_now
+from app.models.models import TestSession
+
+# ---------------------------------------------------------------
+# test_sessions / user_answers 按创建月份的范围分区 (仅 MySQL，由 app.cli.partition_sessions 维护)
+#
+# MySQL 要求分区列出现在每个唯一键 (含主键) 中，而 user_answers 没有 created_at，
+# 所以两张表都按会话 ID 分区 (test_sessions.id / user_answers.session_id)，分界取自 created_at：
+# 会话 ID 与创建时间同序递增，每个月的上界是下个月创建的第一个会话 ID，
+# 两张表使用相同的分界，一个分区正好是一个月的会话及其答案：
+#   p202510   VALUES LESS THAN (2025-11 的第一个会话 ID)
+#   ...
+#   pfuture   VALUES LESS THAN MAXVALUE   (当前月及以后，每月维护时拆出已结束的月份)
+# 分区表不支持外键：启用分区时删除这两张表以及 test_session_dimensions 上的外键 (索引保留)，
+# 引用完整性由应用保证 (提交路径校验选项，归档显式删除答案和维度)。
+# 旧月份被归档 (app.cli.archive_sessions) 清空后，可以 DROP PARTITION 直接回收空间。
+# ---------------------------------------------------------------
+
+# 分区表 -> 分区列
+PARTITIONED_TABLES = {"test_sessions": "id", "user_answers": "session_id"}
+# 需要删除外键的表 (test_session_dimensions 引用 test_sessions)
+FOREIGN_KEY_TABLES = ("test_sessions", "user_answers", "test_session_dimensions")
+FUTURE_PARTITION = "pfuture"
+
+
+@dataclass
+class PartitionState:
+    # 表 -> [(分区名, 上界)]，MAXVALUE 的上界为 None；未分区的表为空列表
+    partitions: Dict[str, List[Tuple[str, Optional[int]]]]
+    # 已结束月份的 (分区名, 上界)，上界严格递增
+    month_bounds: List[Tuple[str, int]]
+    # (表, 外键名)
+    foreign_keys: List[Tuple[str, str]] = field(default_factory=list)
+    user_answers_primary_key: List[str] = field(default_factory=list)
+    # 表 -> 已确认为空、可以删除的分区
+    empty_partitions: Dict[str, List[str]] = field(default_factory=dict)
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return date(day.year + day.month // 12, day.month % 12 + 1, 1)
+
+
+async def _first_session_id_at(conn: AsyncConnection, when: datetime, lo: int, hi: int) -> int:
+    """
+    created_at >= when 的第一个会话 ID (在 [lo, hi] 上按主键二分，每次一条主键范围查询)；没有时返回 hi + 1
+    """
+    hi += 1
+    while lo < hi:
+        mid = (lo + hi) // 2
+        row = (await conn.execute(
+            select(TestSession.created_at).where(TestSession.id >= mid).order_by(TestSession.id).limit(1)
+        )).first()
+        if row is None or (row.created_at is not None and row.created_at >= when):
+            hi = mid
+        else:
+            lo = mid + 1
+    return lo
+
+
+async def month_bounds(conn: AsyncConnection, today: Optional[date] = None) -> List[Tuple[str, int]]:
+    """
+    从最早的会话所在月份到上个月，每个月的 (分区名, 上界)；没有会话的月份与前一个月的上界相同，被跳过
+    """
+    today = today or utc_now().date()  # created_at 按 UTC 保存
+    min_id, max_id = (await conn.execute(select(func.min(TestSession.id), func.max(TestSession.id)))).one()
+    if min_id is None:
+        return []
+    oldest = await conn.scalar(
+        select(TestSession.created_at).where(TestSession.id == min_id)
+    )
+    if oldest is None:
+        return []
+
+    bounds: List[Tuple[str, int]] = []
+    month = _month_start(oldest.date())
+    lo = min_id
+    while _next_month(month) <= _month_start(today):
+        end = _next_month(month)
+        bound = await _first_session_id_at(conn, datetime(end.year, end.month, 1), lo, max_id)
+        if not bounds or bound > bounds[-1][1]:
+            bounds.append((f"p{month:%Y%m}", bound))
+        lo = bound
+        month = end
+    return bounds
+
+
+async def load_state(conn: AsyncConnection, today: Optional[date] = None) -> PartitionState:
+    """
+    从 information_schema 读取当前分区 / 外键 / 主键，并计算各月份的分界
+    """
+    partitions: Dict[str, List[Tuple[str, Optional[int]]]] = {}
+    for table in PARTITIONED_TABLES:
+        rows = (await conn.execute(text(
+            "SELECT PARTITION_NAME, PARTITION_DESCRIPTION FROM information_schema.PARTITIONS "
+            "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table AND PARTITION_NAME IS NOT NULL "
+            "ORDER BY PARTITION_ORDINAL_POSITION"
+        ), {"table": table})).all()
+        partitions[table] = [
+            (name, None if description == "MAXVALUE" else int(description)) for name, description in rows
+        ]
+
+    foreign_keys = [
+        (table, name)
+        for table, name in (await conn.execute(
+            text(
+                "SELECT TABLE_NAME, CONSTRAINT_NAME FROM information_schema.REFERENTIAL_CONSTRAINTS "
+                "WHERE CONSTRAINT_SCHEMA = DATABASE() AND TABLE_NAME IN :tables "
+                "ORDER BY TABLE_NAME, CONSTRAINT_NAME"
+            ).bindparams(bindparam("tables", expanding=True)),
+            {"tables": list(FOREIGN_KEY_TABLES)},
+        )).all()
+    ]
+
+    primary_key = list((await conn.execute(text(
+        "SELECT COLUMN_NAME FROM information_schema.KEY_COLUMN_USAGE "
+        "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'user_answers' AND CONSTRAINT_NAME = 'PRIMARY' "
+        "ORDER BY ORDINAL_POSITION"
+    ))).scalars())
+
+    # 上界不超过热表中最小会话 ID 的分区只可能包含已归档 / 不存在的会话；逐个确认确实为空
+    min_session_id = await conn.scalar(select(func.min(TestSession.id)))
+    empty_partitions: Dict[str, List[str]] = {}
+    for table, existing in partitions.items():
+        for name, bound in existing:
+            if bound is None or (min_session_id is not None and bound > min_session_id):
+                continue
+            if (await conn.execute(text(f"SELECT 1 FROM {table} PARTITION ({name}) LIMIT 1"))).first() is None:
+                empty_partitions.setdefault(table, []).append(name)
+
+    return PartitionState(
+        partitions=partitions,
+        month_bounds=await month_bounds(conn, today),
+        foreign_keys=foreign_keys,
+        user_answers_primary_key=primary_key,
+        empty_partitions=empty_partitions,
+    )
+
+
+def _partition_list(bounds: List[Tuple[str, int]]) -> str:
+    parts = [f"PARTITION {name} VALUES LESS THAN ({bound})" for name, bound in bounds]
+    parts.append(f"PARTITION {FUTURE_PARTITION} VALUES LESS THAN MAXVALUE")
+    return "(" + ", ".join(parts) + ")"
+
+
+def plan_statements(state: PartitionState, drop_archived: bool = False) -> List[str]:
+    """
+    由当前状态生成需要执行的 DDL：
+    首次分区 (删除外键、调整 user_answers 主键、PARTITION BY RANGE)，
+    之后每次把 pfuture 中已经结束的月份拆成独立分区；drop_archived 时删除已清空的旧分区
+    """
+    statements: List[str] = []
+    if any(not state.partitions[table] for table in PARTITIONED_TABLES):
+        statements += [f"ALTER TABLE {table} DROP FOREIGN KEY {name}" for table, name in state.foreign_keys]
+        # 分区列必须包含在主键中
+        if not state.partitions["user_answers"] and state.user_answers_primary_key == ["id"]:
+            statements.append("ALTER TABLE user_answers DROP PRIMARY KEY, ADD PRIMARY KEY (id, session_id)")
+
+    for table, column in PARTITIONED_TABLES.items():
+        existing = state.partitions[table]
+        if not existing:
+            statements.append(
+                f"ALTER TABLE {table} PARTITION BY RANGE ({column}) {_partition_list(state.month_bounds)}"
+            )
+            continue
+
+        last_bound = max((bound for _, bound in existing if bound is not None), default=0)
+        new_bounds = [(name, bound) for name, bound in state.month_bounds if bound > last_bound]
+        if new_bounds:
+            # 只重写 pfuture (当前月的数据)，已有分区不动
+            statements.append(
+                f"ALTER TABLE {table} REORGANIZE PARTITION {FUTURE_PARTITION} INTO {_partition_list(new_bounds)}"
+            )
+        if drop_archived and state.empty_partitions.get(table):
+            statements.append(f"ALTER TABLE {table} DROP PARTITION {', '.join(state.empty_partitions[table])}")
+    return statements
@@ -0,0 +1,118 @@
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# ---------------------------------------------------------------
+# TestResult 规则的区间索引
+#
+# 每个 dimension_code (总分规则为 None) 的规则在加载时被切分成互不重叠、按起点排序的
+# 区间段，匹配时用 bisect 查找，O(log n) 且不访问数据库。
+# 规则之间若有重叠 (历史数据)，每个区间段保留按原顺序第一个命中的规则，与逐条扫描的结果一致。
+# ---------------------------------------------------------------
+
+
+def format_rule(rule: Any) -> str:
+    # 使用 <SEP> 分隔标题和描述
+    if rule.description:
+        return f"{rule.result_range}<SEP>{rule.description}"
+    return rule.result_range
+
+
+class _DimensionIntervals:
+    def __init__(self, rules: Sequence[Any]):
+        # 所有区间边界：min_score 以及 max_score + 1
+        bounds = set()
+        for rule in rules:
+            bounds.add(rule.min_score)
+            if rule.max_score is not None:
+                bounds.add(rule.max_score + 1)
+
+        self.starts: List[int] = []
+        self.texts: List[Optional[str]] = []
+        for start in sorted(bounds):
+            winner = next(
+                (r for r in rules
+                 if r.min_score <= start and (r.max_score is None or r.max_score >= start)),
+                None
+            )
+            text = format_rule(winner) if winner is not None else None
+            # 合并相邻且结果相同的区间段
+            if self.texts and self.texts[-1] == text:
+                continue
+            self.starts.append(start)
+            self.texts.append(text)
+
+    def match(self, score: int) -> Optional[str]:
+        pos = bisect_right(self.starts, score) - 1
+        if pos < 0:
+            return None
+        return self.texts[pos]
+
+
+class RuleIndex:
+    """
+    一个测试的全部结果规则 (只读，可在请求之间共享)
+    """
+
+    def __init__(self, rules: Iterable[Any]):
+        grouped: Dict[Optional[str], List[Any]] = {}
+        for rule in rules:
+            grouped.setdefault(rule.dimension_code, []).append(rule)
+
+        self._intervals: Dict[Optional[str], _DimensionIntervals] = {
+            code: _DimensionIntervals(group) for code, group in grouped.items()
+        }
+
+        # 精确匹配 (如 MBTI 以编码后的总分匹配 min_score)：保留第一个
+        self._exact: Dict[Tuple[Optional[str], int], str] = {}
+        for code, group in grouped.items():
+            for rule in group:
+                self._exact.setdefault((code, rule.min_score), format_rule(rule))
+
+    def match(self, dimension_code: Optional[str], score: int, exact: bool = False) -> Optional[str]:
+        """
+        返回命中规则的文本 (result_range<SEP>description)，未命中时返回 None
+        """
+        if exact:
+            return self._exact.get((dimension_code, score))
+        intervals = self._intervals.get(dimension_code)
+        if intervals is None:
+            return None
+        return intervals.match(score)
+
+
+def validate_rules(rules: Iterable[Any], exact: bool = False) -> List[str]:
+    """
+    检查规则中的重叠与空隙，返回问题描述列表 (为空表示合法)。
+    exact=True 时 (按 min_score 精确匹配) 只检查重复的 min_score。
+    """
+    grouped: Dict[Optional[str], List[Any]] = {}
+    for rule in rules:
+        grouped.setdefault(rule.dimension_code, []).append(rule)
+
+    problems: List[str] = []
+    for code, group in grouped.items():
+        label = code or "total"
+
+        if exact:
+            seen = set()
+            for rule in group:
+                if rule.min_score in seen:
+                    problems.append(f"[{label}] duplicate rule for score {rule.min_score}")
+                seen.add(rule.min_score)
+            continue
+
+        ordered = sorted(group, key=lambda r: r.min_score)
+        for rule in ordered:
+            if rule.max_score is not None and rule.max_score < rule.min_score:
+                problems.append(f"[{label}] empty range {rule.min_score}-{rule.max_score}")
+
+        for prev, cur in zip(ordered, ordered[1:]):
+            if prev.max_score is None or cur.min_score <= prev.max_score:
+                problems.append(
+                    f"[{label}] '{prev.result_range}' overlaps '{cur.result_range}' at {cur.min_score}"
+                )
+            elif cur.min_score > prev.max_score + 1:
+                problems.append(
+                    f"[{label}] gap between {prev.max_score} and {cur.min_score}"
+                )
+    return problems
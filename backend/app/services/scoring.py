@@ -0,0 +1,207 @@
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from app.services.scoring_specs import BUILTIN_SCORING_SPECS, DEFAULT_SCORING_SPEC
+
+# ---------------------------------------------------------------
+# 声明式计分引擎
+#
+# 计分规格 (见 scoring_specs.py) 只在加载测试时编译一次，编译结果是按题号
+# (order_index) 索引的稠密数组：
+#   item_weights[i]  第 i 题对每个维度的 (维度下标, 权重)，汇总维度已展开
+#   item_reverse[i]  第 i 题是否反向计分
+#   item_axis[i]     第 i 题所属的类型轴 (MBTI)，-1 表示不属于任何轴
+# 每次提交只需要对答案做一次遍历，即可得到总分、所有维度分和类型代码。
+# ---------------------------------------------------------------
+
+RESULT_SOURCES = ("total", "dimension", "type_code")
+RESULT_MATCHES = ("range", "exact")
+
+
+class ScoringSpecError(ValueError):
+    """
+    计分规格不合法
+    """
+
+
+@dataclass
+class ScoreResult:
+    total_score: int
+    dimension_scores: Dict[str, int]
+    type_code: Optional[str] = None
+
+
+class CompiledScoring:
+    """
+    编译后的计分规格 (只读，可在请求之间共享)
+    """
+
+    def __init__(self, spec: Mapping[str, Any]):
+        self.spec = spec
+
+        dimensions: Mapping[str, Sequence[Any]] = spec.get("dimensions") or {}
+        composites: Mapping[str, Sequence[str]] = spec.get("composites") or {}
+
+        # 维度顺序 = 基础维度在前，汇总维度在后 (与保存顺序一致)
+        self.dimension_codes: Tuple[str, ...] = tuple(dimensions) + tuple(composites)
+        if len(set(self.dimension_codes)) != len(self.dimension_codes):
+            raise ScoringSpecError("Duplicate dimension code in scoring spec.")
+        dim_index = {code: i for i, code in enumerate(self.dimension_codes)}
+
+        # 1. 基础维度: 题号 -> {维度下标: 权重}
+        item_weight_maps: Dict[int, Dict[int, int]] = {}
+        for code, items in dimensions.items():
+            for item in items:
+                order_index, weight = _parse_item(item)
+                row = item_weight_maps.setdefault(order_index, {})
+                row[dim_index[code]] = row.get(dim_index[code], 0) + weight
+
+        # 2. 汇总维度: 在编译期展开到题目上，计分时无需二次累加
+        for code, parts in composites.items():
+            for part in parts:
+                if part not in dimensions:
+                    raise ScoringSpecError(f"Composite '{code}' references unknown dimension '{part}'.")
+                for item in dimensions[part]:
+                    order_index, weight = _parse_item(item)
+                    row = item_weight_maps.setdefault(order_index, {})
+                    row[dim_index[code]] = row.get(dim_index[code], 0) + weight
+
+        # 3. 反向计分
+        reverse_keyed = [int(i) for i in spec.get("reverse_keyed") or []]
+        if reverse_keyed and "reverse_base" not in spec:
+            raise ScoringSpecError("'reverse_keyed' requires 'reverse_base'.")
+        self.reverse_base = int(spec.get("reverse_base", 0))
+
+        # 4. 类型字母 (MBTI)
+        type_letters = spec.get("type_letters")
+        self.axes_letters: Tuple[Tuple[str, str], ...] = ()
+        self.score_letters: Dict[int, str] = {}
+        self.letter_encoding: Dict[str, int] = {}
+        item_axis_map: Dict[int, int] = {}
+        if type_letters:
+            self.score_letters = {int(k): v for k, v in type_letters["score_letters"].items()}
+            self.letter_encoding = dict(type_letters.get("encoding") or {})
+            axes = []
+            for axis_idx, axis in enumerate(type_letters["axes"]):
+                letters = tuple(axis["letters"])
+                if len(letters) != 2:
+                    raise ScoringSpecError("Each type axis must have exactly two letters.")
+                axes.append(letters)
+                for item in axis["items"]:
+                    item_axis_map[int(item)] = axis_idx
+            self.axes_letters = tuple(axes)
+
+        # 5. 压平成按题号索引的稠密数组
+        max_index = max([0, *item_weight_maps, *reverse_keyed, *item_axis_map])
+        self.size = max_index + 1
+        self.item_weights: List[Tuple[Tuple[int, int], ...]] = [()] * self.size
+        for order_index, row in item_weight_maps.items():
+            self.item_weights[order_index] = tuple(row.items())
+        self.item_reverse: List[bool] = [False] * self.size
+        for order_index in reverse_keyed:
+            self.item_reverse[order_index] = True
+        self.item_axis: List[int] = [-1] * self.size
+        for order_index, axis_idx in item_axis_map.items():
+            self.item_axis[order_index] = axis_idx
+
+        # 6. 结果匹配方式
+        result = spec.get("result") or {}
+        self.result_source: str = result.get("source", "total")
+        self.result_match: str = result.get("match", "range")
+        self.result_dimension: Optional[str] = result.get("dimension")
+        if self.result_source not in RESULT_SOURCES:
+            raise ScoringSpecError(f"Unknown result source '{self.result_source}'.")
+        if self.result_match not in RESULT_MATCHES:
+            raise ScoringSpecError(f"Unknown result match '{self.result_match}'.")
+        if self.result_source == "dimension" and self.result_dimension not in dim_index:
+            raise ScoringSpecError("Result dimension must be one of the spec's dimensions.")
+        if self.result_source == "type_code" and not self.axes_letters:
+            raise ScoringSpecError("Result source 'type_code' requires 'type_letters'.")
+
+        self.dimension_fallback: str = spec.get("dimension_fallback", "分数: {score}")
+        self.result_fallback: str = spec.get("result_fallback", "未定义的结果")
+
+    def score(self, answers: Iterable[Tuple[int, int]]) -> ScoreResult:
+        """
+        answers: (题号 order_index, 选项分数) 序列；一次遍历完成所有计分
+        """
+        size = self.size
+        item_weights = self.item_weights
+        item_reverse = self.item_reverse
+        item_axis = self.item_axis
+        reverse_base = self.reverse_base
+        score_letters = self.score_letters
+
+        dim_totals = [0] * len(self.dimension_codes)
+        axis_counts = [[0, 0] for _ in self.axes_letters]
+        total_score = 0
+
+        for order_index, score in answers:
+            if 0 <= order_index < size:
+                axis_idx = item_axis[order_index]
+                if axis_idx >= 0:
+                    letter = score_letters.get(score)
+                    letters = self.axes_letters[axis_idx]
+                    if letter == letters[0]:
+                        axis_counts[axis_idx][0] += 1
+                    elif letter == letters[1]:
+                        axis_counts[axis_idx][1] += 1
+                if item_reverse[order_index]:
+                    score = reverse_base - score
+                for dim_idx, weight in item_weights[order_index]:
+                    dim_totals[dim_idx] += weight * score
+            total_score += score
+
+        type_code = None
+        if self.axes_letters:
+            # 第二个字母严格多于第一个时才取第二个
+            type_code = "".join(
+                letters[1] if counts[1] > counts[0] else letters[0]
+                for letters, counts in zip(self.axes_letters, axis_counts)
+            )
+            total_score = sum(self.letter_encoding.get(letter, 0) for letter in type_code)
+
+        return ScoreResult(
+            total_score=total_score,
+            dimension_scores=dict(zip(self.dimension_codes, dim_totals)),
+            type_code=type_code,
+        )
+
+    def result_key(self, result: ScoreResult) -> Tuple[Optional[str], int]:
+        """
+        返回用于匹配总结果规则的 (dimension_code, 分数)
+        """
+        if self.result_source == "dimension":
+            return self.result_dimension, result.dimension_scores[self.result_dimension]
+        return None, result.total_score
+
+    def format_dimension_fallback(self, code: str, score: int) -> str:
+        return self.dimension_fallback.format(code=code, score=score)
+
+
+def _parse_item(item: Any) -> Tuple[int, int]:
+    if isinstance(item, (list, tuple)):
+        order_index, weight = int(item[0]), int(item[1])
+    else:
+        order_index, weight = int(item), 1
+    if order_index < 0:
+        raise ScoringSpecError(f"Invalid item index {order_index}.")
+    return order_index, weight
+
+
+def resolve_scoring_spec(test_type: str, stored_spec: Optional[Mapping[str, Any]] = None) -> Mapping[str, Any]:
+    """
+    选择测试的计分规格：测试自带 > 内置 > 默认加总
+    """
+    if stored_spec:
+        return stored_spec
+    return BUILTIN_SCORING_SPECS.get(test_type, DEFAULT_SCORING_SPEC)
+
+
+def compile_scoring_spec(spec: Mapping[str, Any]) -> CompiledScoring:
+    try:
+        return CompiledScoring(spec)
+    except ScoringSpecError:
+        raise
+    except (KeyError, TypeError, ValueError, IndexError) as e:
+        raise ScoringSpecError(f"Invalid scoring spec: {e!r}") from e
@@ -0,0 +1,105 @@
+from typing import Any, Dict
+
+# ---------------------------------------------------------------
+# 内置量表的计分规格 (声明式数据)
+#
+# 结构说明:
+#   dimensions        维度代码 -> 题号 (order_index) 列表；
+#                     元素也可以写成 [题号, 权重]，默认权重为 1
+#   composites        汇总维度 -> 由哪些维度相加而成 (如 MPS 的 HST / ADT)
+#   reverse_keyed     反向计分的题号，计分时 score = reverse_base - score
+#   type_letters      MBTI 式类型字母：选项分数 -> 字母，以及每个轴包含的题号
+#   result            总结果的匹配方式：
+#                       source = "total" | "dimension" | "type_code"
+#                       match  = "range" (min_score <= x <= max_score) | "exact" (min_score == x)
+#   dimension_fallback  没有匹配到维度规则时的文本，可用 {code} / {score}
+#   result_fallback     没有匹配到总结果规则时的文本
+#
+# 测试也可以在 tests.scoring_spec 中保存自己的规格，优先级高于这里的内置规格。
+# ---------------------------------------------------------------
+
+# 默认：所有选项分数加总，按总分区间匹配结果
+DEFAULT_SCORING_SPEC: Dict[str, Any] = {
+    "result": {"source": "total", "match": "range"},
+    "result_fallback": "未定义的结果范围",
+}
+
+# ---------------------------------------------------------------
+# MBTI: 选项分数编码了字母 (1:E 2:I 3:N 4:S 5:F 6:T 7:J 8:P)
+# 每 7 题一个轴，平局时取 letters 中的第一个字母
+# ---------------------------------------------------------------
+MBTI_SCORING_SPEC: Dict[str, Any] = {
+    "type_letters": {
+        "score_letters": {1: "E", 2: "I", 3: "N", 4: "S", 5: "F", 6: "T", 7: "J", 8: "P"},
+        "axes": [
+            {"letters": ["E", "I"], "items": list(range(1, 8))},
+            {"letters": ["S", "N"], "items": list(range(8, 15))},
+            {"letters": ["F", "T"], "items": list(range(15, 22))},
+            {"letters": ["P", "J"], "items": list(range(22, 29))},
+        ],
+        # 总分 = 各字母编码之和，用于精确匹配 TestResult.min_score
+        "encoding": {"E": 1000, "I": 2000, "S": 100, "N": 200, "T": 10, "F": 20, "J": 1, "P": 2},
+    },
+    "result": {"source": "type_code", "match": "exact"},
+    "result_fallback": "未定义的结果",
+}
+
+# ---------------------------------------------------------------
+# HPLP 健康促进生活方式量表
+# ---------------------------------------------------------------
+HPLP_SCORING_SPEC: Dict[str, Any] = {
+    "dimensions": {
+        "HR": [1, 6, 12, 14, 19, 24, 28, 32, 35, 38, 40],  # 健康责任
+        "PA": [2, 8, 15, 21, 26, 31, 37, 39],              # 体育活动
+        "N": [3, 9, 16, 22, 27, 34],                       # 营养
+        "IR": [4, 10, 17, 23, 30],                         # 人际关系
+        "SM": [5, 11, 18, 25, 33],                         # 压力管理
+        "SG": [7, 13, 20, 29, 36],                         # 精神成长
+    },
+    "result": {"source": "total", "match": "range"},
+    "dimension_fallback": "未找到 {code} 的规则",
+    "result_fallback": "未定义的结果",
+}
+
+# ---------------------------------------------------------------
+# MPS 多维完美主义问卷
+# 5 个基础维度 + 2 个汇总分量表 (HST, ADT)；MPS 没有总分结果，以 HST 作为主结果
+# ---------------------------------------------------------------
+MPS_SCORING_SPEC: Dict[str, Any] = {
+    "dimensions": {
+        "SOP": [2, 4, 14, 15, 26],                     # 自我完美主义
+        "OOP": [10, 11, 12, 19, 24],                   # 他人完美主义
+        "SPP": [1, 6, 21, 25, 29],                     # 社会完美主义
+        "EMO": [3, 5, 7, 9, 13, 17, 22, 23, 28],       # 情绪
+        "CB": [8, 16, 18, 20, 27],                     # 认知行为
+    },
+    "composites": {
+        "HST": ["SOP", "OOP", "SPP"],                  # 高标准
+        "ADT": ["EMO", "CB"],                          # 适应不良
+    },
+    "result": {"source": "dimension", "dimension": "HST", "match": "range"},
+    "dimension_fallback": "分数: {score}",
+    "result_fallback": "未定义的结果",
+}
+
+# ---------------------------------------------------------------
+# IPVS 亲密关系PUA受害问卷
+# ---------------------------------------------------------------
+IPVS_SCORING_SPEC: Dict[str, Any] = {
+    "dimensions": {
+        "power": [1, 2, 3, 4],
+        "emotional": [5, 6, 7, 8, 9, 10, 11],
+        "value": [12, 13, 14, 15],
+    },
+    "result": {"source": "total", "match": "range"},
+    "dimension_fallback": "分数: {score}",
+    "result_fallback": "未定义的结果",
+}
+
+# 键: test_type
+BUILTIN_SCORING_SPECS: Dict[str, Dict[str, Any]] = {
+    "mbti": MBTI_SCORING_SPEC,
+    "hpls": HPLP_SCORING_SPEC,
+    "mps": MPS_SCORING_SPEC,
+    "ipvs": IPVS_SCORING_SPEC,
+}
@@ -0,0 +1,137 @@
+import asyncio
+import gzip
+import json
+import os
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession
+
+from app.core.config import settings
+from app.models.models import ArchivedSession
+
+# ---------------------------------------------------------------
+# 会话归档文件 (由 services/archive_service.py 写入)
+#
+# ARCHIVE_DIR 下每个创建月份一个文件 sessions-YYYY-MM.ndjson.gz，文件由多个 gzip 成员拼接而成
+# (可以直接用 zcat 查看)，每个成员是一批会话的 NDJSON，记录格式与会话导出相同。
+# archived_sessions 表记录每个会话所在的文件和成员位置，读取时只解压对应的成员；
+# 文件中没有被索引引用的成员 (归档中断后重新运行留下的) 不会被读到。
+# ---------------------------------------------------------------
+
+
+def archive_name(created_at: Optional[datetime]) -> str:
+    return f"sessions-{created_at:%Y-%m}.ndjson.gz" if created_at else "sessions-undated.ndjson.gz"
+
+
+def archive_path(name: str) -> str:
+    return os.path.join(settings.ARCHIVE_DIR, name)
+
+
+def append_member(name: str, data: bytes) -> Tuple[int, int]:
+    """
+    把一个 gzip 成员追加到归档文件末尾并落盘，返回 (偏移, 长度)
+    """
+    os.makedirs(settings.ARCHIVE_DIR, exist_ok=True)
+    with open(archive_path(name), "ab") as f:
+        offset = f.seek(0, os.SEEK_END)
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return offset, len(data)
+
+
+def read_member(name: str, offset: int, length: int) -> List[Dict[str, Any]]:
+    with open(archive_path(name), "rb") as f:
+        f.seek(offset)
+        data = f.read(length)
+    return [json.loads(line) for line in gzip.decompress(data).splitlines() if line]
+
+
+async def read_archived_records(rows: Sequence[Any]) -> List[Dict[str, Any]]:
+    """
+    rows: archived_sessions 行 (id, archive, member_offset, member_length)；
+    每个成员只解压一次，按 rows 的顺序返回记录
+    """
+    members: Dict[Tuple[str, int, int], List[int]] = {}
+    for row in rows:
+        members.setdefault((row.archive, row.member_offset, row.member_length), []).append(row.id)
+
+    by_id: Dict[int, Dict[str, Any]] = {}
+    for (name, offset, length), ids in members.items():
+        wanted = set(ids)
+        # 冷数据通常不在页缓存中，读文件和解压放到线程里，不阻塞事件循环
+        for record in await asyncio.to_thread(read_member, name, offset, length):
+            if record["id"] in wanted:
+                by_id[record["id"]] = record
+    return [by_id[row.id] for row in rows]
+
+
+_MEMBER_COLUMNS = (
+    ArchivedSession.id, ArchivedSession.archive, ArchivedSession.member_offset, ArchivedSession.member_length
+)
+
+
+async def load_archived_records(db: AsyncSession, session_ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+    """
+    session_id -> 归档记录 (不在归档中的 ID 不出现在结果中)
+    """
+    if not session_ids:
+        return {}
+    rows = (await db.execute(select(*_MEMBER_COLUMNS).where(ArchivedSession.id.in_(session_ids)))).all()
+    return {record["id"]: record for record in await read_archived_records(rows)}
+
+
+async def archived_user_sessions(
+    db: AsyncSession,
+    user_id: str,
+    limit: int,
+    before: Optional[Tuple[datetime, int]] = None
+) -> List[Any]:
+    """
+    用户历史中已归档的部分：按 (created_at, id) 倒序的 (id, created_at)，before 为 keyset 游标
+    """
+    stmt = (
+        select(ArchivedSession.id, ArchivedSession.created_at)
+        .where(ArchivedSession.user_id == user_id)
+        .order_by(ArchivedSession.created_at.desc(), ArchivedSession.id.desc())
+        .limit(limit)
+    )
+    if before is not None:
+        stmt = stmt.where(tuple_(ArchivedSession.created_at, ArchivedSession.id) < tuple_(*before))
+    return (await db.execute(stmt)).all()
+
+
+def archived_query(
+    test_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None
+):
+    """
+    按会话 ID 升序的归档成员位置 (过滤条件与会话导出相同)，用 read_archived_records 读出记录
+    """
+    stmt = select(*_MEMBER_COLUMNS).order_by(ArchivedSession.id)
+    if test_id is not None:
+        stmt = stmt.where(ArchivedSession.test_id == test_id)
+    if created_from is not None:
+        stmt = stmt.where(ArchivedSession.created_at >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(ArchivedSession.created_at < created_to)
+    return stmt
+
+
+async def iter_archived_batches(
+    conn: AsyncConnection,
+    test_id: Optional[int] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    batch_size: int = 1000
+) -> AsyncIterator[List[Dict[str, Any]]]:
+    """
+    按会话 ID 升序逐批产出归档记录 (过滤条件与会话导出相同)
+    """
+    stmt = archived_query(test_id, created_from, created_to).execution_options(yield_per=batch_size)
+    result = await conn.stream(stmt)
+    async for rows in result.partitions():
+        yield await read_archived_records(rows)
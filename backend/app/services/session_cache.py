@@ -0,0 +1,122 @@
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.fast_json import dumps
+from app.core.http_cache import EncodedPayload
+from app.core.metrics import REGISTRY
+
+# ---------------------------------------------------------------
+# 会话结果缓存 (GET /sessions/{session_id})
+#
+# 会话写入后不再修改，缓存的响应体不需要失效，只按字节预算做 LRU 淘汰。
+# 响应体与 schemas.TestSession 的 JSON 逐字节一致 (见 session_service.session_to_dict)。
+# 提交路径在事务提交后直接写入缓存 (逐行存储时答案行 ID 在写入时一并取回)；
+# 其它会话在第一次 GET 时从数据库读出后写入。
+# 注意：pack_sessions 把逐行存储的会话改为紧凑存储后答案行 ID 变为空，
+# 其它 worker 中已缓存的旧表示会保留到被淘汰 (内容相同，只差答案行 ID)。
+# ---------------------------------------------------------------
+
+# session.info 中的键：本事务写入的 (session_id, 响应内容)，提交后写入缓存
+_PENDING_KEY = "session_results_pending"
+
+# 每个条目除响应体以外的大致开销 (键、ETag、OrderedDict 节点等)
+_ENTRY_OVERHEAD = 256
+
+
+class ByteBudgetLRUCache:
+    """
+    按字节预算淘汰的进程内 LRU 缓存，值为 EncodedPayload (按各编码版本的总字节数计)
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[Hashable, Tuple[int, EncodedPayload]]" = OrderedDict()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def get(self, key: Hashable) -> Optional[EncodedPayload]:
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry[1]
+
+    def put(self, key: Hashable, payload: EncodedPayload) -> None:
+        size = sum(len(body) for body in payload.bodies.values()) + _ENTRY_OVERHEAD
+        # 单个条目超过预算时不缓存
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self.bytes -= old[0]
+        self._entries[key] = (size, payload)
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, (evicted_size, _) = self._entries.popitem(last=False)
+            self.bytes -= evicted_size
+            self.evictions += 1
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.bytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# 键: session_id，值: 未压缩的 EncodedPayload (会话数量多、单个较小，不预先压缩)
+session_result_cache = ByteBudgetLRUCache(max_bytes=settings.SESSION_RESULT_CACHE_MAX_BYTES)
+
+REGISTRY.callback_gauge(
+    "session_result_cache_bytes", "Bytes held by the session result cache.", lambda: session_result_cache.bytes
+)
+REGISTRY.callback_gauge(
+    "session_result_cache_entries", "Sessions held by the session result cache.", lambda: len(session_result_cache)
+)
+REGISTRY.callback_counter(
+    "session_result_cache_hits_total", "Session result cache hits.", lambda: session_result_cache.hits
+)
+REGISTRY.callback_counter(
+    "session_result_cache_misses_total", "Session result cache misses.", lambda: session_result_cache.misses
+)
+REGISTRY.callback_counter(
+    "session_result_cache_evictions_total", "Session results evicted to stay within the byte budget.",
+    lambda: session_result_cache.evictions
+)
+
+
+def session_result_payload(content: Dict[str, Any]) -> EncodedPayload:
+    return EncodedPayload(dumps(content), compress=False)
+
+
+def cache_after_commit(db: AsyncSession, results: Iterable[Tuple[int, Dict[str, Any]]]) -> None:
+    """
+    提交路径调用：results 为本事务写入的 (session_id, 响应内容)，事务提交后才写入缓存
+    (回滚的会话不会被缓存，其 ID 之后可能被重新分配)
+    """
+    db.info.setdefault(_PENDING_KEY, []).extend(results)
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_results(session: Session) -> None:
+    for session_id, content in session.info.pop(_PENDING_KEY, ()):
+        session_result_cache.put(session_id, session_result_payload(content))
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_pending_results(session: Session) -> None:
+    session.info.pop(_PENDING_KEY, None)
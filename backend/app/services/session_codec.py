@@ -0,0 +1,38 @@
+import json
+import struct
+from typing import List, Optional, Sequence, Tuple
+
+# ---------------------------------------------------------------
+# 紧凑会话存储的编解码
+#
+# answers_packed:    1 字节版本号 + 每个答案两个小端 uint32 (question_id, selected_option_id)
+# dimensions_packed: JSON 数组 [[dimension_code, score, result_range], ...]
+# ---------------------------------------------------------------
+
+_ANSWERS_VERSION = 1
+_PAIR = struct.Struct("<II")
+
+
+def pack_answers(answers: Sequence[Tuple[int, int]]) -> bytes:
+    buf = bytearray([_ANSWERS_VERSION])
+    for question_id, option_id in answers:
+        buf += _PAIR.pack(question_id, option_id)
+    return bytes(buf)
+
+
+def unpack_answers(data: Optional[bytes]) -> List[Tuple[int, int]]:
+    if not data:
+        return []
+    if data[0] != _ANSWERS_VERSION:
+        raise ValueError(f"Unknown packed answers version {data[0]}")
+    return list(_PAIR.iter_unpack(memoryview(data)[1:]))
+
+
+def pack_dimensions(dimensions: Sequence[Tuple[str, int, str]]) -> str:
+    return json.dumps([list(d) for d in dimensions], ensure_ascii=False, separators=(",", ":"))
+
+
+def unpack_dimensions(data: Optional[str]) -> List[Tuple[str, int, str]]:
+    if not data:
+        return []
+    return [tuple(d) for d in json.loads(data)]
@@ -1,362 +1,579 @@
+import base64
+import time
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from sqlalchemy import insert, text, tuple_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import noload, selectinload
 from fastapi import HTTPException
-from typing import Dict, List, Tuple, Any
 
 # 导入数据库模型
-from app.models.models import (
-    Test, TestSession, UserAnswer, QuestionOption, 
-    TestResult, TestSessionDimension
-)
+from app.models.models import TestSession, UserAnswer, TestSessionDimension
 # 导入 Pydantic schemas
 from app.schemas import schemas
+from app.core.clock import utc_now
+from app.core.config import settings
+from app.core.http_cache import EncodedPayload
+from app.core.metrics import scoring_phase_seconds
+from app.services.session_codec import (
+    pack_answers, pack_dimensions, unpack_answers, unpack_dimensions
+)
+from app.services.distribution_service import increment_score_distributions
+from app.services.session_archive import archived_user_sessions, load_archived_records
+from app.services.session_cache import cache_after_commit, session_result_cache, session_result_payload
+from app.services.stats_service import increment_session_counts
+from app.services.test_runtime import TestRuntime, get_test_runtime
+
+
+@dataclass
+class ScoredSession:
+    """
+    计分完成、尚未写库的一次提交
+    """
+    user_id: str
+    test_id: int
+    result: str
+    total_score: int
+    created_at: datetime
+    answers: List[Tuple[int, int]]              # (question_id, selected_option_id)
+    dimensions: List[Tuple[str, int, str]]      # (dimension_code, score, result_range)
+
 
 # ---------------------------------------------------------------
-# [新增] HPLP 量表的计分“地图”
-# 键: 题号 (order_index), 值: 维度代码 (dimension_code)
+# 计分：校验选项并由编译好的计分规格一次完成，全程不访问数据库
 # ---------------------------------------------------------------
-HPLP_DIMENSION_MAP: Dict[int, str] = {
-    1: "HR", 6: "HR", 12: "HR", 14: "HR", 19: "HR", 24: "HR", 28: "HR", 32: "HR", 35: "HR", 38: "HR", 40: "HR", # 健康责任
-    2: "PA", 8: "PA", 15: "PA", 21: "PA", 26: "PA", 31: "PA", 37: "PA", 39: "PA", # 体育活动
-    3: "N", 9: "N", 16: "N", 22: "N", 27: "N", 34: "N", # 营养
-    4: "IR", 10: "IR", 17: "IR", 23: "IR", 30: "IR", # 人际关系
-    5: "SM", 11: "SM", 18: "SM", 25: "SM", 33: "SM", # 压力管理
-    7: "SG", 13: "SG", 20: "SG", 29: "SG", 36: "SG"  # 精神成长
-}
+def score_submission(runtime: TestRuntime, submission: schemas.TestSubmission) -> ScoredSession:
+    if not submission.answers:
+        raise HTTPException(status_code=400, detail="No answers submitted")
+
+    # 1. 用缓存的 选项 -> (题目, 分数) 映射校验：选项必须属于本测试，且与所答题目一致
+    option_map = runtime.options
+    for ans in submission.answers:
+        info = option_map.get(ans.selected_option_id)
+        if info is None or info.question_id != ans.question_id:
+            raise HTTPException(status_code=400, detail="One or more selected options are invalid.")
+
+    # 2. 计分 (一次遍历得到总分 / 维度分 / 类型代码)；重复提交的同一选项只计一次
+    scoring = runtime.scoring
+    unique_option_ids = dict.fromkeys(ans.selected_option_id for ans in submission.answers)
+    score_result = scoring.score(
+        (option_map[opt_id].order_index, option_map[opt_id].score) for opt_id in unique_option_ids
+    )
+
+    # 3. 匹配维度规则与总结果 (内存中的区间索引)
+    dimensions = [
+        (dim_code, score, runtime.rules.match(dim_code, score) or scoring.format_dimension_fallback(dim_code, score))
+        for dim_code, score in score_result.dimension_scores.items()
+    ]
+    result_dimension, result_score = scoring.result_key(score_result)
+    result_text = (
+        runtime.rules.match(result_dimension, result_score, exact=(scoring.result_match == "exact"))
+        or score_result.type_code
+        or scoring.result_fallback
+    )
+
+    return ScoredSession(
+        user_id=submission.user_id,
+        test_id=runtime.test_id,
+        result=result_text,
+        total_score=score_result.total_score,
+        # UTC，精度为秒，与数据库中保存的值保持一致 (见 app/core/clock.py)
+        created_at=utc_now(),
+        answers=[(ans.question_id, ans.selected_option_id) for ans in submission.answers],
+        dimensions=dimensions,
+    )
+
 
 # ---------------------------------------------------------------
-# [计分地图] MPS 多维完美主义问卷
+# 写库：会话头、答案、维度各用多行 INSERT 批量写入，不做 refresh
 # ---------------------------------------------------------------
-MPS_DIMENSION_MAP: Dict[int, List[str]] = {
-    # SOP: 自我完美主义 (也属于 HST)
-    2: ["SOP", "HST"], 4: ["SOP", "HST"], 14: ["SOP", "HST"], 15: ["SOP", "HST"], 26: ["SOP", "HST"],
-    # OOP: 他人完美主义 (也属于 HST)
-    10: ["OOP", "HST"], 11: ["OOP", "HST"], 12: ["OOP", "HST"], 19: ["OOP", "HST"], 24: ["OOP", "HST"],
-    # SPP: 社会完美主义 (也属于 HST)
-    1: ["SPP", "HST"], 6: ["SPP", "HST"], 21: ["SPP", "HST"], 25: ["SPP", "HST"], 29: ["SPP", "HST"],
-    # EMO: 情绪 (也属于 ADT)
-    3: ["EMO", "ADT"], 5: ["EMO", "ADT"], 7: ["EMO", "ADT"], 9: ["EMO", "ADT"], 13: ["EMO", "ADT"], 
-    17: ["EMO", "ADT"], 22: ["EMO", "ADT"], 23: ["EMO", "ADT"], 28: ["EMO", "ADT"],
-    # CB: 认知行为 (也属于 ADT)
-    8: ["CB", "ADT"], 16: ["CB", "ADT"], 18: ["CB", "ADT"], 20: ["CB", "ADT"], 27: ["CB", "ADT"]
-}
+async def save_scored_sessions(
+    db: AsyncSession,
+    scored_list: List[ScoredSession],
+    as_dict: bool = False
+) -> List[Union[schemas.TestSession, Dict[str, Any]]]:
+    if not scored_list:
+        return []
+
+    compact = settings.SESSION_STORAGE_COMPACT
+    session_ids = await _insert_session_headers(db, scored_list, compact)
+
+    answer_rows = [] if compact else [
+        {"session_id": session_id, "question_id": q_id, "selected_option_id": opt_id}
+        for session_id, scored in zip(session_ids, scored_list)
+        for q_id, opt_id in scored.answers
+    ]
+    dimension_rows = [] if compact else [
+        {"session_id": session_id, "dimension_code": code, "score": score, "result_range": text}
+        for session_id, scored in zip(session_ids, scored_list)
+        for code, score, text in scored.dimensions
+    ]
+    # 答案行 ID 一并取回，提交响应与 GET /sessions/{session_id} 的内容一致
+    answer_ids = iter(await _insert_returning_ids(db, UserAnswer, answer_rows))
+    session_answer_ids = [
+        None if compact else [next(answer_ids) for _ in scored.answers]
+        for scored in scored_list
+    ]
+    if dimension_rows:
+        await db.execute(insert(TestSessionDimension), dimension_rows)
+
+    # 增量维护 test_stats 计数与得分分布 (放在最后，缩短计数行的加锁时间)
+    counts: Dict[int, int] = {}
+    for scored in scored_list:
+        counts[scored.test_id] = counts.get(scored.test_id, 0) + 1
+    await increment_session_counts(db, counts)
+    await increment_score_distributions(
+        db, ((scored.test_id, scored.total_score, scored.dimensions) for scored in scored_list)
+    )
+
+    # 手头的数据就是 GET /sessions/{session_id} 的完整内容，提交后直接写入结果缓存
+    saved = list(zip(session_ids, scored_list, session_answer_ids))
+    if session_result_cache.enabled:
+        cache_after_commit(db, [
+            (session_id, scored_session_dict(session_id, scored, answer_ids))
+            for session_id, scored, answer_ids in saved
+        ])
+
+    build = scored_session_dict if as_dict else build_session_schema
+    return [build(session_id, scored, answer_ids) for session_id, scored, answer_ids in saved]
+
+
+async def save_scored_session(
+    db: AsyncSession,
+    scored: ScoredSession,
+    as_dict: bool = False
+) -> Union[schemas.TestSession, Dict[str, Any]]:
+    return (await save_scored_sessions(db, [scored], as_dict=as_dict))[0]
+
+
+async def _insert_session_headers(
+    db: AsyncSession,
+    scored_list: List[ScoredSession],
+    compact: bool = False
+) -> List[int]:
+    rows = [
+        {
+            "user_id": scored.user_id,
+            "test_id": scored.test_id,
+            "result": scored.result,
+            "total_score": scored.total_score,
+            "created_at": scored.created_at,
+        }
+        for scored in scored_list
+    ]
+    if compact:
+        # 紧凑存储：答案和维度随会话头一起写入
+        for row, scored in zip(rows, scored_list):
+            row["answers_packed"] = pack_answers(scored.answers)
+            row["dimensions_packed"] = pack_dimensions(scored.dimensions)
+
+    return await _insert_returning_ids(db, TestSession, rows)
+
+
+# 多行 INSERT 每条语句的最大行数 (避免超过 MySQL 的 max_allowed_packet / SQLite 的参数个数上限)
+_INSERT_CHUNK_ROWS = 1000
+
+
+async def _insert_returning_ids(db: AsyncSession, model: Any, rows: List[Dict[str, Any]]) -> List[int]:
+    """
+    多行 INSERT，按 rows 的顺序返回新行的自增 ID
+    """
+    if not rows:
+        return []
+
+    dialect = db.get_bind().dialect
+    ids: List[int] = []
+
+    # MySQL 没有 RETURNING：每批一条多行 INSERT ... VALUES，ID 由 LAST_INSERT_ID() (本批第一行的 ID) 推算。
+    # 行数已知的 "simple insert" 在 InnoDB 的各种 innodb_autoinc_lock_mode 下都一次性分配一段
+    # 连续的自增值 (步长为 auto_increment_increment)，不会与并发的插入交错
+    if dialect.name == "mysql":
+        step = await _auto_increment_step(db)
+        for start in range(0, len(rows), _INSERT_CHUNK_ROWS):
+            chunk = rows[start:start + _INSERT_CHUNK_ROWS]
+            result = await db.execute(insert(model).values(chunk))
+            ids.extend(result.lastrowid + i * step for i in range(len(chunk)))
+        return ids
+
+    # SQLite：写事务独占数据库，一条多行 INSERT 的 rowid 连续分配，lastrowid 为本批最后一行的 ID
+    # (insertmanyvalues 在要求 RETURNING 保序时会退化为逐条插入)
+    if dialect.name == "sqlite":
+        for start in range(0, len(rows), _INSERT_CHUNK_ROWS):
+            chunk = rows[start:start + _INSERT_CHUNK_ROWS]
+            result = await db.execute(insert(model).values(chunk))
+            ids.extend(range(result.lastrowid - len(chunk) + 1, result.lastrowid + 1))
+        return ids
+
+    # 支持 RETURNING 并能保证返回顺序的数据库 (PostgreSQL / MariaDB)：insertmanyvalues 合并为多行 INSERT
+    if dialect.insert_executemany_returning_sort_by_parameter_order:
+        result = await db.execute(insert(model).returning(model.id, sort_by_parameter_order=True), rows)
+        return list(result.scalars().all())
+
+    # 其它数据库：逐条插入
+    for row in rows:
+        result = await db.execute(insert(model).values(**row))
+        ids.append(result.inserted_primary_key[0])
+    return ids
+
+
+async def _auto_increment_step(db: AsyncSession) -> int:
+    # 每个连接只查询一次 (缓存在连接池记录上，连接重建后重新查询)
+    conn = await db.connection()
+    step = conn.info.get("auto_increment_increment")
+    if step is None:
+        step = conn.info["auto_increment_increment"] = int(
+            await conn.scalar(text("SELECT @@auto_increment_increment"))
+        )
+    return step
+
+
+def _scored_fields(session_id: Optional[int], scored: ScoredSession, answer_ids: Optional[List[int]]) -> Tuple:
+    # 直接由手头的数据构造响应，无需回读数据库；
+    # 紧凑存储没有答案行 ID，write-behind 模式下 session_id 也尚未分配
+    ids = answer_ids if answer_ids is not None else [None] * len(scored.answers)
+    return (
+        session_id, scored.user_id, scored.test_id, scored.result, scored.total_score, scored.created_at,
+        [(answer_id, q_id, opt_id) for answer_id, (q_id, opt_id) in zip(ids, scored.answers)],
+        scored.dimensions,
+    )
+
+
+def build_session_schema(
+    session_id: Optional[int],
+    scored: ScoredSession,
+    answer_ids: Optional[List[int]] = None
+) -> schemas.TestSession:
+    return _session_schema(*_scored_fields(session_id, scored, answer_ids))
+
 
 # ---------------------------------------------------------------
-# [计分地图] IPVS 亲密关系PUA受害问卷
+# 可信序列化 (as_dict=True，用于 settings.FAST_JSON_RESPONSES)
+# 数据都来自计分结果或数据库，构造与 schemas.TestSession 字段、顺序一致的 dict，
+# 交给 FastJSONResponse 直接编码，跳过 pydantic 对象构造和 response_model 的再次校验。
+# 修改 schemas.TestSession / UserAnswer / TestSessionDimension 时需同步修改这里。
 # ---------------------------------------------------------------
-IPVS_DIMENSION_MAP: Dict[int, str] = {
-    1: "power", 2: "power", 3: "power", 4: "power",
-    5: "emotional", 6: "emotional", 7: "emotional", 8: "emotional", 9: "emotional", 10: "emotional", 11: "emotional",
-    12: "value", 13: "value", 14: "value", 15: "value"
-}
-
-# 2. IPVS计分函数
-async def _calculate_ipvs_results(db: AsyncSession, test_id: int, options_from_db: List[QuestionOption]):
-    dim_scores = {"power": 0, "emotional": 0, "value": 0}
-    total_score = 0
-    for opt in options_from_db:
-        total_score += opt.score
-        d_code = IPVS_DIMENSION_MAP.get(opt.question.order_index)
-        if d_code: dim_scores[d_code] += opt.score
-    
-    # 加载规则
-    stmt_rules = select(TestResult).where(TestResult.test_id == test_id, TestResult.dimension_code.isnot(None))
-    result_rules = await db.execute(stmt_rules)
-    dimension_rules = result_rules.scalars().all()
-
-    dims_to_create = []
-    for d_code, score in dim_scores.items():
-        found_text = f"分数: {score}"
-        for rule in dimension_rules:
-            if rule.dimension_code == d_code:
-                if rule.min_score <= score and (rule.max_score is None or rule.max_score >= score):
-                    found_text = f"{rule.result_range}<SEP>{rule.description}" if rule.description else rule.result_range
-                    break
-        dims_to_create.append(TestSessionDimension(dimension_code=d_code, score=score, result_range=found_text))
-
-    return total_score, "Processing...", dims_to_create
+def _session_dict(
+    session_id: Optional[int],
+    user_id: str,
+    test_id: int,
+    result: str,
+    total_score: int,
+    created_at: datetime,
+    answers: List[Tuple[Optional[int], int, int]],
+    dimensions: List[Tuple[str, int, str]]
+) -> Dict[str, Any]:
+    return {
+        "id": session_id,
+        "user_id": user_id,
+        "test_id": test_id,
+        "result": result,
+        "total_score": total_score,
+        "created_at": created_at,
+        "answers": [
+            {"question_id": q_id, "selected_option_id": opt_id, "id": answer_id, "session_id": session_id}
+            for answer_id, q_id, opt_id in answers
+        ],
+        "dimensions": [
+            {"dimension_code": code, "score": score, "result_range": text}
+            for code, score, text in dimensions
+        ],
+    }
+
+
+def scored_session_dict(
+    session_id: Optional[int],
+    scored: ScoredSession,
+    answer_ids: Optional[List[int]] = None
+) -> Dict[str, Any]:
+    return _session_dict(*_scored_fields(session_id, scored, answer_ids))
+
 
 # ---------------------------------------------------------------
-# [新增] MPS 专属计分函数
+# [核心] calculate_and_save_session
 # ---------------------------------------------------------------
-async def _calculate_mps_results(
-    db: AsyncSession, 
+async def _load_runtime(db: AsyncSession, test_id: int) -> TestRuntime:
+    started = time.perf_counter()
+    runtime = await get_test_runtime(db, test_id)
+    if not runtime:
+        raise HTTPException(status_code=404, detail="Test not found")
+    scoring_phase_seconds.observe(time.perf_counter() - started, runtime.test_type, "load")
+    return runtime
+
+
+def _score(runtime: TestRuntime, submission: schemas.TestSubmission) -> ScoredSession:
+    started = time.perf_counter()
+    scored = score_submission(runtime, submission)
+    scoring_phase_seconds.observe(time.perf_counter() - started, runtime.test_type, "score")
+    return scored
+
+
+async def calculate_session(
+    db: AsyncSession,
     test_id: int,
-    options_from_db: List[QuestionOption]
-) -> Tuple[int, str, List[TestSessionDimension]]:
+    submission: schemas.TestSubmission
+) -> ScoredSession:
+
+    # --- 1. 获取 Test 信息 (已编译的计分规格 / 规则索引 / 选项映射，通常命中缓存) ---
+    runtime = await _load_runtime(db, test_id)
+
+    # --- 2. 校验并计分 (纯内存) ---
+    return _score(runtime, submission)
+
+
+async def calculate_and_save_session(
+    db: AsyncSession,
+    test_id: int,
+    submission: schemas.TestSubmission,
+    as_dict: bool = False
+) -> Union[schemas.TestSession, Dict[str, Any]]:
+    # 各阶段耗时按 test_type 记录到 scoring_phase_seconds (load / score / save)
+    runtime = await _load_runtime(db, test_id)
+    scored = _score(runtime, submission)
+
+    # --- 3. 保存并返回结果 ---
+    started = time.perf_counter()
+    session = await save_scored_session(db, scored, as_dict=as_dict)
+    scoring_phase_seconds.observe(time.perf_counter() - started, runtime.test_type, "save")
+    return session
+
+
+# ---------------------------------------------------------------
+# 批量提交 (离线 / 自助终端上传)：一次计分，一个事务内批量写入
+# ---------------------------------------------------------------
+async def calculate_and_save_sessions(
+    db: AsyncSession,
+    items: List[schemas.BatchSubmissionItem],
+    as_dict: bool = False
+) -> List[Union[schemas.BatchSubmissionResult, Dict[str, Any]]]:
     """
-    专门为“多维完美主义问卷”(MPS) 计分。
-    包含 5 个基础维度和 2 个汇总分量表（HST, ADT）。
+    逐条校验计分，出错的条目只记录错误，不影响其它条目；
+    成功的条目在同一个事务中用多行 INSERT 写入。
     """
-    # 1. 初始化分数 (7个维度代码)
-    dim_scores: Dict[str, int] = {
-        "SOP": 0, "OOP": 0, "SPP": 0, "EMO": 0, "CB": 0, "HST": 0, "ADT": 0
-    }
-    total_score = 0
-    
-    # 2. 累加计分
-    for opt in options_from_db:
-        q_index = opt.question.order_index
-        score = opt.score
-        total_score += score
-        
-        # 一个题目可能对应多个维度代码（如 2号题既是 SOP 也是 HST）
-        target_codes = MPS_DIMENSION_MAP.get(q_index, [])
-        for code in target_codes:
-            dim_scores[code] += score
-            
-    # 3. 加载规则并匹配 (逻辑与 HPLP 一致)
-    stmt_rules = select(TestResult).where(
-        TestResult.test_id == test_id,
-        TestResult.dimension_code.isnot(None)
-    )
-    result_rules = await db.execute(stmt_rules)
-    dimension_rules = result_rules.scalars().all()
-
-    dimensions_to_create: List[TestSessionDimension] = []
-    
-    for dim_code, score in dim_scores.items():
-        found_rule_text = f"分数: {score}"
-        for rule in dimension_rules:
-            if rule.dimension_code == dim_code:
-                if (rule.min_score <= score and (rule.max_score is None or rule.max_score >= score)):
-                    found_rule_text = f"{rule.result_range}<SEP>{rule.description}" if rule.description else rule.result_range
-                    break
-        
-        dimensions_to_create.append(
-            TestSessionDimension(dimension_code=dim_code, score=score, result_range=found_rule_text)
-        )
+    runtimes: Dict[int, TestRuntime] = {}
+    results: List[schemas.BatchSubmissionResult] = []
+    scored_list: List[ScoredSession] = []
+    scored_positions: List[int] = []
+
+    for index, item in enumerate(items):
+        try:
+            runtime = runtimes.get(item.test_id)
+            if runtime is None:
+                runtime = await get_test_runtime(db, item.test_id)
+                if not runtime:
+                    raise HTTPException(status_code=404, detail="Test not found")
+                runtimes[item.test_id] = runtime
+            scored_list.append(score_submission(runtime, item))
+            scored_positions.append(index)
+            results.append(schemas.BatchSubmissionResult(index=index, status_code=201))
+        except HTTPException as e:
+            results.append(schemas.BatchSubmissionResult(index=index, status_code=e.status_code, error=e.detail))
+
+    sessions = await save_scored_sessions(db, scored_list, as_dict=as_dict)
+    if as_dict:
+        by_position = dict(zip(scored_positions, sessions))
+        return [
+            {"index": r.index, "status_code": r.status_code, "session": by_position.get(position), "error": r.error}
+            for position, r in enumerate(results)
+        ]
+    for position, session in zip(scored_positions, sessions):
+        results[position].session = session
+
+    return results
 
-    return total_score, "Processing...", dimensions_to_create
 
 # ---------------------------------------------------------------
-# [新增] HPLP 专属计分函数
+# 用户历史：按 (created_at, id) 倒序的 keyset 分页
 # ---------------------------------------------------------------
-async def _calculate_hplp_results(
-    db: AsyncSession, 
-    test_id: int,
-    options_from_db: List[QuestionOption]
-) -> Tuple[int, str, List[TestSessionDimension]]:
+def encode_session_cursor(created_at: datetime, session_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{session_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_session_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("utf-8")
+        created_at, session_id = raw.rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(session_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+async def get_user_sessions(
+    db: AsyncSession,
+    user_id: str,
+    limit: int,
+    cursor: Optional[str] = None,
+    include_answers: bool = False,
+    as_dict: bool = False
+) -> Union[schemas.TestSessionPage, Dict[str, Any]]:
     """
-    专门为“健康促进生活方式量表”(HPLP) 计分。
+    获取用户的一页历史会话 (走 idx_sessions_user_created 索引)，已归档的会话按同一顺序合并在内。
+    默认只返回会话头和维度，include_answers=True 时才加载答案。
     """
-    
-    # 1. 初始化分数
-    dim_scores: Dict[str, int] = {
-        "HR": 0, "PA": 0, "N": 0, "IR": 0, "SM": 0, "SG": 0
-    }
-    total_score = 0
-    
-    # 2. 遍历用户选择的选项进行计分
-    for opt in options_from_db:
-        q_index = opt.question.order_index
-        score = opt.score
-        
-        # 累加总分
-        total_score += score 
-        
-        # 查找维度并累加
-        dim_code = HPLP_DIMENSION_MAP.get(q_index)
-        if dim_code in dim_scores:
-            dim_scores[dim_code] += score
-            
-    # 3. 从数据库加载此测试的 *所有* 维度规则
-    stmt_rules = select(TestResult).where(
-        TestResult.test_id == test_id,
-        TestResult.dimension_code.isnot(None) 
+    before = decode_session_cursor(cursor) if cursor else None
+    stmt = (
+        select(TestSession)
+        .where(TestSession.user_id == user_id)
+        .order_by(TestSession.created_at.desc(), TestSession.id.desc())
+        .limit(limit + 1) # 多取一条，用于判断是否还有下一页
+        .options(
+            selectinload(TestSession.dimensions),
+            selectinload(TestSession.answers) if include_answers else noload(TestSession.answers),
+        )
     )
-    result_rules = await db.execute(stmt_rules)
-    dimension_rules = result_rules.scalars().all()
-
-    dimensions_to_create: List[TestSessionDimension] = []
-    
-    # 4. 匹配得分和规则
-    for dim_code, score in dim_scores.items():
-        found_rule_text = f"未找到 {dim_code} 的规则"
-        
-        for rule in dimension_rules:
-            if rule.dimension_code == dim_code:
-                if (rule.min_score <= score and 
-                   (rule.max_score is None or rule.max_score >= score)):
-                    if rule.description:
-                        # 使用 <SEP> 分隔标题和描述
-                        found_rule_text = f"{rule.result_range}<SEP>{rule.description}"
-                    else:
-                        found_rule_text = rule.result_range
-                    break 
-        
-        dimensions_to_create.append(
-            TestSessionDimension(
-                dimension_code=dim_code,
-                score=score,
-                result_range=found_rule_text
-            )
+    if before:
+        stmt = stmt.where(tuple_(TestSession.created_at, TestSession.id) < tuple_(*before))
+
+    result = await db.execute(stmt)
+    # (created_at, id, ORM 会话；已归档的为 None)
+    page: List[Tuple[datetime, int, Optional[TestSession]]] = [(s.created_at, s.id, s) for s in result.scalars()]
+
+    # archived_sessions 上有同样的 keyset 索引，按同一游标取一页后与热表结果合并
+    archived = await archived_user_sessions(db, user_id, limit + 1, before)
+    if archived:
+        page = sorted(page + [(row.created_at, row.id, None) for row in archived], key=lambda e: e[:2], reverse=True)
+
+    next_cursor = None
+    if len(page) > limit:
+        page = page[:limit]
+        next_cursor = encode_session_cursor(*page[-1][:2])
+
+    # 只为本页中已归档的会话读取归档文件
+    records = await load_archived_records(db, [session_id for _, session_id, s in page if s is None])
+    build = _session_dict if as_dict else _session_schema
+    items = [
+        build(*(
+            _orm_fields(s, include_answers) if s is not None
+            else _archived_fields(records[session_id], include_answers)
+        ))
+        for _, session_id, s in page
+    ]
+    if as_dict:
+        return {"items": items, "next_cursor": next_cursor}
+    return schemas.TestSessionPage(items=items, next_cursor=next_cursor)
+
+
+async def get_session(
+    db: AsyncSession,
+    session_id: int,
+    include_answers: bool = True,
+    as_dict: bool = False
+) -> Optional[Union[schemas.TestSession, Dict[str, Any]]]:
+    stmt = (
+        select(TestSession)
+        .where(TestSession.id == session_id)
+        .options(
+            selectinload(TestSession.answers) if include_answers else noload(TestSession.answers),
+            selectinload(TestSession.dimensions)
         )
+    )
+    result = await db.execute(stmt)
+    session = result.scalars().first()
+    if session is not None:
+        fields = _orm_fields(session, include_answers)
+    else:
+        # 热表中没有时再查归档
+        record = (await load_archived_records(db, [session_id])).get(session_id)
+        if record is None:
+            return None
+        fields = _archived_fields(record, include_answers)
+    return _session_dict(*fields) if as_dict else _session_schema(*fields)
 
-    return total_score, "Processing...", dimensions_to_create
 
+async def get_session_payload(db: AsyncSession, session_id: int) -> Optional[EncodedPayload]:
+    """
+    GET /sessions/{session_id} 的预序列化响应体：先查结果缓存，未命中时读库并写入缓存
+    """
+    payload = session_result_cache.get(session_id)
+    if payload is not None:
+        return payload
 
-# ---------------------------------------------------------------
-# 辅助函数 (MBTI / Sum)
-# ---------------------------------------------------------------
-async def _calculate_mbti_score(options_from_db: List[QuestionOption]) -> Tuple[int, str]:
-    trait_map = {1: 'E', 2: 'I', 3: 'N', 4: 'S', 5: 'F', 6: 'T', 7: 'J', 8: 'P'}
-    counts = {'EI': {'E': 0, 'I': 0}, 'SN': {'S': 0, 'N': 0}, 'TF': {'T': 0, 'F': 0}, 'JP': {'J': 0, 'P': 0}}
-
-    for opt in options_from_db:
-        if not opt.question: continue
-        order_idx = opt.question.order_index
-        trait_letter = trait_map.get(opt.score)
-        if not trait_letter: continue
-        if 1 <= order_idx <= 7 and trait_letter in counts['EI']: counts['EI'][trait_letter] += 1
-        elif 8 <= order_idx <= 14 and trait_letter in counts['SN']: counts['SN'][trait_letter] += 1
-        elif 15 <= order_idx <= 21 and trait_letter in counts['TF']: counts['TF'][trait_letter] += 1
-        elif 22 <= order_idx <= 28 and trait_letter in counts['JP']: counts['JP'][trait_letter] += 1
-    type_code = ""
-    type_code += "I" if counts['EI']['I'] > counts['EI']['E'] else "E"
-    type_code += "N" if counts['SN']['N'] > counts['SN']['S'] else "S"
-    type_code += "T" if counts['TF']['T'] > counts['TF']['F'] else "F"
-    type_code += "J" if counts['JP']['J'] > counts['JP']['P'] else "P"
-    score_encoding = {'E': 1000, 'I': 2000, 'S': 100, 'N': 200, 'T': 10, 'F': 20, 'J': 1, 'P': 2}
-    total_score = sum(score_encoding[letter] for letter in type_code)
-    return total_score, type_code
-
-async def _calculate_sum_score(options_from_db: List[QuestionOption]) -> int:
-    return sum(opt.score for opt in options_from_db)
+    session = await get_session(db, session_id, as_dict=True)
+    if session is None:
+        return None
+    payload = session_result_payload(session)
+    session_result_cache.put(session_id, payload)
+    return payload
 
 
 # ---------------------------------------------------------------
-# [核心] calculate_and_save_session
+# 会话 -> 响应：ORM 会话与归档记录先统一成
+# (id, user_id, test_id, result, total_score, created_at, answers, dimensions)，
+# answers 为 (answer_id, question_id, selected_option_id)，dimensions 为 (dimension_code, score, result_range)
 # ---------------------------------------------------------------
-async def calculate_and_save_session(
-    db: AsyncSession, 
-    test_id: int, 
-    submission: schemas.TestSubmission
-) -> TestSession:
-    
-    # --- 1. 获取 Test 信息 ---
-    test_stmt = select(Test).where(Test.id == test_id)
-    test_result = await db.execute(test_stmt)
-    db_test = test_result.scalars().first()
-    
-    if not db_test:
-        raise HTTPException(status_code=404, detail="Test not found")
+def _orm_fields(session: TestSession, include_answers: bool) -> Tuple:
+    """
+    紧凑存储的会话在这里透明解码 (此时没有答案行 ID)
+    (调用方需已预加载 answers / dimensions 关系，或对 answers 使用 noload)
+    """
+    if session.dimensions_packed is not None:
+        dimensions = unpack_dimensions(session.dimensions_packed)
+    else:
+        dimensions = [(d.dimension_code, d.score, d.result_range) for d in session.dimensions]
 
-    # --- 2. 准备数据 ---
-    selected_option_ids = [ans.selected_option_id for ans in submission.answers]
-    if not selected_option_ids:
-        raise HTTPException(status_code=400, detail="No answers submitted")
+    answers: List[Tuple[Optional[int], int, int]] = []
+    if include_answers and session.answers_packed is not None:
+        answers = [(None, q_id, opt_id) for q_id, opt_id in unpack_answers(session.answers_packed)]
+    elif include_answers:
+        answers = [(a.id, a.question_id, a.selected_option_id) for a in session.answers]
+    return (
+        session.id, session.user_id, session.test_id, session.result, session.total_score, session.created_at,
+        answers, dimensions,
+    )
 
-    db_answers_to_create = [
-        UserAnswer(
-            question_id=ans.question_id,
-            selected_option_id=ans.selected_option_id
-        ) for ans in submission.answers
-    ]
-    
-    stmt_scores = (
-        select(QuestionOption)
-        .where(QuestionOption.id.in_(selected_option_ids))
-        .options(selectinload(QuestionOption.question)) 
+
+def _archived_fields(record: Dict[str, Any], include_answers: bool) -> Tuple:
+    """
+    归档记录 (与导出格式相同) 中没有答案行 ID
+    """
+    return (
+        record["id"], record["user_id"], record["test_id"], record["result"], record["total_score"],
+        datetime.fromisoformat(record["created_at"]) if record["created_at"] else None,
+        [(None, q_id, opt_id) for q_id, opt_id in record["answers"]] if include_answers else [],
+        [tuple(d) for d in record["dimensions"]],
     )
-    result_scores = await db.execute(stmt_scores)
-    options_from_db = result_scores.scalars().all()
-
-    if len(options_from_db) != len(set(selected_option_ids)):
-        raise HTTPException(status_code=400, detail="One or more selected options are invalid.")
-
-    # --- 3. 计分逻辑分发 ---
-    total_score = 0
-    result_text = "未定义的结果"
-    stmt_result: Any = None 
-    dimensions_to_add: List[TestSessionDimension] = [] 
-
-    # [策略 A] MBTI
-    if db_test.test_type == "mbti":
-        total_score, type_code = await _calculate_mbti_score(options_from_db)
-        stmt_result = select(TestResult).where(
-            TestResult.test_id == test_id,
-            TestResult.min_score == total_score,
-            TestResult.dimension_code.is_(None) 
-        )
-        result_text = type_code
-        
-    # [策略 B] HPLP (你缺失的逻辑就在这里！)
-    elif db_test.test_type == "hpls": 
-        total_score, _, dimensions_to_add = \
-            await _calculate_hplp_results(db, test_id, options_from_db)
-        
-        # 查询总分规则
-        stmt_result = select(TestResult).where(
-            TestResult.test_id == test_id,
-            TestResult.min_score <= total_score,
-            (TestResult.max_score >= total_score) | (TestResult.max_score.is_(None)),
-            TestResult.dimension_code.is_(None) 
-        )
 
-    # --- [新增] MPS 分发逻辑 ---
-    elif db_test.test_type == "mps":
-        total_score, _, dimensions_to_add = await _calculate_mps_results(db, test_id, options_from_db)
-        # MPS 没有总分结果，我们取高标准总分 (HST) 作为展示主结果
-        hst_score = next((d.score for d in dimensions_to_add if d.dimension_code == "HST"), 0)
-        stmt_result = select(TestResult).where(
-            TestResult.test_id == test_id,
-            TestResult.dimension_code == "HST", # 以高标准倾向作为主标题
-            TestResult.min_score <= hst_score,
-            (TestResult.max_score >= hst_score) | (TestResult.max_score.is_(None))
-        )
 
-    # --- IPVS 分发逻辑 ---
-    elif db_test.test_type == "ipvs":
-        total_score, _, dimensions_to_add = await _calculate_ipvs_results(db, test_id, options_from_db)
-        stmt_result = select(TestResult).where(
-            TestResult.test_id == test_id,
-            TestResult.min_score <= total_score,
-            (TestResult.max_score >= total_score) | (TestResult.max_score.is_(None)),
-            TestResult.dimension_code.is_(None)
-        )
-        
-    # [策略 C] 默认加总
-    else: 
-        total_score = await _calculate_sum_score(options_from_db)
-        stmt_result = select(TestResult).where(
-            TestResult.test_id == test_id,
-            TestResult.min_score <= total_score,
-            (TestResult.max_score >= total_score) | (TestResult.max_score.is_(None)),
-            TestResult.dimension_code.is_(None)
-        )
-        result_text = "未定义的结果范围"
-
-    # --- 4. 匹配总结果 ---
-    if stmt_result is not None:
-        result_obj = await db.execute(stmt_result)
-        final_result_model = result_obj.scalars().first()
-        if final_result_model:
-            if final_result_model.description:
-                result_text = f"{final_result_model.result_range}<SEP>{final_result_model.description}"
-            else:
-                result_text = final_result_model.result_range
-        
-    # --- 5. 保存到数据库 ---
-    db_session = TestSession(
-        user_id=submission.user_id,
+def _session_schema(
+    session_id: Optional[int],
+    user_id: str,
+    test_id: int,
+    result: str,
+    total_score: int,
+    created_at: datetime,
+    answers: List[Tuple[Optional[int], int, int]],
+    dimensions: List[Tuple[str, int, str]]
+) -> schemas.TestSession:
+    return schemas.TestSession(
+        id=session_id,
+        user_id=user_id,
         test_id=test_id,
-        result=result_text,       
-        total_score=total_score   
+        result=result,
+        total_score=total_score,
+        created_at=created_at,
+        answers=[
+            schemas.UserAnswer(id=answer_id, session_id=session_id, question_id=q_id, selected_option_id=opt_id)
+            for answer_id, q_id, opt_id in answers
+        ],
+        dimensions=[
+            schemas.TestSessionDimension(dimension_code=code, score=score, result_range=text)
+            for code, score, text in dimensions
+        ],
     )
-    
-    db_session.answers = db_answers_to_create
-    
-    # [关键] 将计算出的维度添加到会话中
-    if dimensions_to_add:
-        db_session.dimensions = dimensions_to_add
-
-    db.add(db_session)
-    
-    # --- 6. 返回结果 ---
-    await db.flush()
-    await db.refresh(db_session)
-    await db.refresh(db_session, attribute_names=["answers", "dimensions"])
-
-    return db_session
\ No newline at end of file
+
+
+def session_to_schema(session: TestSession, include_answers: bool = True) -> schemas.TestSession:
+    """
+    ORM 会话 -> 响应 schema
+    """
+    return _session_schema(*_orm_fields(session, include_answers))
+
+
+def session_to_dict(session: TestSession, include_answers: bool = True) -> Dict[str, Any]:
+    """
+    ORM 会话 -> 与 schemas.TestSession 一致的 dict (可信序列化)
+    """
+    return _session_dict(*_orm_fields(session, include_answers))
@@ -0,0 +1,85 @@
+from typing import Any, Dict, List, Sequence, Type
+
+from sqlalchemy import delete, func, insert, select, union_all, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.db.base_class import Base
+from app.models.models import ArchivedSession, Test, TestSession, TestStats
+
+
+async def increment_session_counts(db: AsyncSession, counts: Dict[int, int]) -> None:
+    """
+    累加 test_stats 中的会话计数 (counts: test_id -> 新增会话数)。
+    在提交路径的同一事务中调用，尽量放在最后执行以缩短计数行的加锁时间。
+    """
+    rows = [{"test_id": test_id, "session_count": n} for test_id, n in sorted(counts.items())]
+    await upsert_counts(db, TestStats, ["test_id"], rows)
+
+
+async def upsert_counts(
+    db: AsyncSession,
+    model: Type[Base],
+    key_columns: Sequence[str],
+    rows: List[Dict[str, Any]],
+    count_column: str = "session_count",
+) -> None:
+    """
+    计数表的累加：rows 中每一行按 key_columns 定位，不存在时插入，存在时把 count_column 加上新值。
+    rows 应按主键排序，多个事务并发累加时以相同顺序加锁。
+    """
+    if not rows:
+        return
+
+    counter = getattr(model, count_column)
+    dialect = db.get_bind().dialect.name
+
+    # 一条 upsert 语句完成所有计数
+    # (方言模块按需导入：运行时只会用到当前数据库的那一个，启动时不必全部加载)
+    if dialect == "mysql":
+        from sqlalchemy.dialects import mysql
+        stmt = mysql.insert(model).values(rows)
+        stmt = stmt.on_duplicate_key_update({count_column: counter + stmt.inserted[count_column]})
+        await db.execute(stmt)
+        return
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(model).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[getattr(model, c) for c in key_columns],
+            set_={count_column: counter + stmt.excluded[count_column]},
+        )
+        await db.execute(stmt)
+        return
+
+    # 其它数据库：先 UPDATE，不存在时再 INSERT
+    for row in rows:
+        result = await db.execute(
+            update(model)
+            .where(*(getattr(model, c) == row[c] for c in key_columns))
+            .values({count_column: counter + row[count_column]})
+        )
+        if result.rowcount == 0:
+            await db.execute(insert(model).values(**row))
+
+
+async def rebuild_test_stats(db: AsyncSession) -> int:
+    """
+    根据 test_sessions 与 archived_sessions (已归档的会话) 重建 test_stats，返回写入的行数
+    """
+    await db.execute(delete(TestStats))
+    sessions = union_all(
+        select(TestSession.test_id), select(ArchivedSession.test_id)
+    ).subquery()
+    counts = (
+        select(Test.id, func.count(sessions.c.test_id))
+        .select_from(Test)
+        .outerjoin(sessions, sessions.c.test_id == Test.id)
+        .group_by(Test.id)
+    )
+    result = await db.execute(
+        insert(TestStats).from_select(["test_id", "session_count"], counts)
+    )
+    return result.rowcount
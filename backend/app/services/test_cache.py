@@ -0,0 +1,105 @@
+import time
+from collections import OrderedDict
+from typing import Any, Hashable, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+
+# session.info 中的标记：本事务修改了测试定义，提交后需要再次失效
+_TESTS_DIRTY_KEY = "tests_dirty"
+
+
+class VersionedLRUCache:
+    """
+    带容量上限和版本号的进程内 LRU 缓存。
+    invalidate() 会递增版本号并清空缓存；在失效之前开始构建的值写回时会被丢弃。
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._entries: "OrderedDict[Hashable, Tuple[int, float, Any]]" = OrderedDict()
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+
+        version, stored_at, value = entry
+        expired = self.ttl_seconds and time.monotonic() - stored_at > self.ttl_seconds
+        if version != self.version or expired:
+            del self._entries[key]
+            return None
+
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: Hashable, value: Any, version: Optional[int] = None) -> None:
+        # version: 构建 value 前读取的版本号；期间若发生过失效，则不写入旧数据
+        if version is not None and version != self.version:
+            return
+
+        self._entries[key] = (self.version, time.monotonic(), value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def invalidate(self) -> None:
+        self.version += 1
+        self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+# 键: (test_type, include_scores)，值: schemas.Test / schemas.TestForTaking
+test_definition_cache = VersionedLRUCache(
+    max_entries=settings.TEST_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TEST_CACHE_TTL_SECONDS,
+)
+
+# 键: (test_type, include_scores)，值: 预序列化/预压缩的 EncodedPayload
+test_payload_cache = VersionedLRUCache(
+    max_entries=settings.TEST_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TEST_CACHE_TTL_SECONDS,
+)
+
+# 键: test_id，值: TestRuntime (编译好的计分规格等)
+test_runtime_cache = VersionedLRUCache(
+    max_entries=settings.TEST_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.TEST_CACHE_TTL_SECONDS,
+)
+
+_TEST_CACHES = (test_definition_cache, test_payload_cache, test_runtime_cache)
+
+
+def invalidate_test_caches() -> None:
+    """
+    清空所有与测试定义相关的进程内缓存
+    """
+    for cache in _TEST_CACHES:
+        cache.invalidate()
+
+
+def mark_tests_changed(db: AsyncSession) -> None:
+    """
+    在写入测试定义时调用：立即失效，并在事务提交后再失效一次，
+    避免提交前被并发请求读到的旧数据留在缓存中。
+    """
+    invalidate_test_caches()
+    db.info[_TESTS_DIRTY_KEY] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_after_commit(session: Session) -> None:
+    if session.info.pop(_TESTS_DIRTY_KEY, False):
+        invalidate_test_caches()
+
+
+@event.listens_for(Session, "after_rollback")
+def _clear_dirty_flag(session: Session) -> None:
+    session.info.pop(_TESTS_DIRTY_KEY, None)
@@ -0,0 +1,76 @@
+from typing import Dict, NamedTuple, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.future import select
+from sqlalchemy.orm import selectinload
+
+from app.models.models import Test, Question
+from app.services.rule_index import RuleIndex
+from app.services.scoring import CompiledScoring, compile_scoring_spec, resolve_scoring_spec
+from app.services.test_cache import test_runtime_cache
+
+
+class OptionInfo(NamedTuple):
+    question_id: int
+    order_index: int
+    score: int
+
+
+class TestRuntime:
+    """
+    提交计分时需要的、已编译好的测试信息 (进程内缓存，随测试定义一起失效)
+    """
+
+    def __init__(
+        self,
+        test_id: int,
+        test_type: str,
+        scoring: CompiledScoring,
+        rules: RuleIndex,
+        options: Dict[int, OptionInfo],
+    ):
+        self.test_id = test_id
+        self.test_type = test_type
+        self.scoring = scoring
+        self.rules = rules
+        # 选项 ID -> (题目 ID, 题号, 分数)，只包含本测试的选项
+        self.options = options
+
+
+async def get_test_runtime(db: AsyncSession, test_id: int) -> Optional[TestRuntime]:
+    """
+    获取测试的计分运行时；缓存命中时不访问数据库
+    """
+    cached = test_runtime_cache.get(test_id)
+    if cached is not None:
+        return cached
+
+    version = test_runtime_cache.version
+    stmt = (
+        select(Test)
+        .where(Test.id == test_id)
+        .options(
+            selectinload(Test.questions).selectinload(Question.options),
+            selectinload(Test.results),
+        )
+    )
+    result = await db.execute(stmt)
+    db_test = result.scalars().first()
+    if not db_test:
+        return None
+
+    options = {
+        opt.id: OptionInfo(question_id=q.id, order_index=q.order_index, score=opt.score)
+        for q in db_test.questions
+        for opt in q.options
+    }
+    spec = resolve_scoring_spec(db_test.test_type, db_test.scoring_spec)
+    runtime = TestRuntime(
+        test_id=db_test.id,
+        test_type=db_test.test_type,
+        scoring=compile_scoring_spec(spec),
+        rules=RuleIndex(db_test.results),
+        options=options,
+    )
+    test_runtime_cache.put(test_id, runtime, version=version)
+    return runtime
@@ -1,26 +1,65 @@
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.future import select
 from sqlalchemy.orm import selectinload
-from sqlalchemy import func, desc
-from typing import Optional, Union, List  # [修改] 导入 Union
+from sqlalchemy import desc
+from fastapi import HTTPException
+from typing import Dict, Iterable, Optional, Union, List  # [修改] 导入 Union
 
 # 导入数据库模型
-from app.models.models import TestSession,Test, Question, QuestionOption, TestResult
+from app.models.models import Test, Question, QuestionOption, TestResult, TestStats
 # 导入 Pydantic schemas
 from app.schemas import schemas
+from app.services.test_cache import (
+    test_definition_cache, test_payload_cache, mark_tests_changed
+)
+from app.core.http_cache import EncodedPayload
+from app.services.rule_index import validate_rules
+from app.services.scoring import ScoringSpecError, compile_scoring_spec, resolve_scoring_spec
+
+
+def validate_test_definition(test: schemas.TestCreate) -> None:
+    """
+    校验计分规格 (自带的或内置的) 和结果规则，避免提交时才发现错误；不合法时抛出 400
+    """
+    try:
+        scoring = compile_scoring_spec(resolve_scoring_spec(test.test_type, test.scoring_spec))
+    except ScoringSpecError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # 精确匹配只作用于总结果规则，维度规则始终按区间匹配
+    exact = scoring.result_match == "exact"
+    problems = validate_rules([r for r in test.results if r.dimension_code is None], exact=exact)
+    problems += validate_rules([r for r in test.results if r.dimension_code is not None])
+    if problems:
+        raise HTTPException(status_code=400, detail=f"Invalid result rules: {'; '.join(problems)}")
+
+
+async def get_test_ids_by_type(db: AsyncSession, test_types: Iterable[str]) -> Dict[str, int]:
+    """
+    test_type -> test ID；只查 tests 表的唯一索引，用于存在性检查 (不加载题目和选项)
+    """
+    test_types = list(test_types)
+    if not test_types:
+        return {}
+    result = await db.execute(select(Test.test_type, Test.id).where(Test.test_type.in_(test_types)))
+    return dict(result.all())
 
 
 async def create_test(db: AsyncSession, test: schemas.TestCreate) -> Test:
     """
     创建一个完整的测试（包含问题、选项和结果范围）
-    (此函数保持不变)
+    写入后会使测试定义缓存失效
     """
+
+    # 0. 校验计分规格和结果规则
+    validate_test_definition(test)
     
     # 1. 创建 Test 对象
     db_test = Test(
         test_type=test.test_type,
         title=test.title,
-        description=test.description
+        description=test.description,
+        scoring_spec=test.scoring_spec
     )
 
     # 2. 遍历 Pydantic schema 中的 questions 并创建 Question 和 QuestionOption 模型
@@ -46,33 +85,86 @@ async def create_test(db: AsyncSession, test: schemas.TestCreate) -> Test:
             min_score=res_in.min_score,
             max_score=res_in.max_score,
             result_range=res_in.result_range,
-            description=res_in.description
+            description=res_in.description,
+            dimension_code=res_in.dimension_code
         )
         db_test.results.append(db_result) # 附加到 Test
 
     # 5. 一次性将 Test (及其所有级联的子对象) 添加到 session
     db.add(db_test)
     
-    # 7. 刷新 db_test 以获取新 ID 和关系
-    await db.flush() # flush 以获取 ID
-    await db.refresh(db_test)
-    
-    # 刷新嵌套的关系，以便在响应中返回它们
-    await db.refresh(db_test, attribute_names=["questions", "results"])
-    
-    return db_test
+    # 6. flush 以获取 ID，并使缓存失效 (提交后会再失效一次)
+    await db.flush()
+    mark_tests_changed(db)
+
+    # 7. 重新加载完整的关系 (问题 -> 选项, 结果)，以便在响应中返回它们
+    stmt = (
+        select(Test)
+        .where(Test.id == db_test.id)
+        .options(
+            selectinload(Test.questions).selectinload(Question.options),
+            selectinload(Test.results),
+        )
+        .execution_options(populate_existing=True)
+    )
+    result = await db.execute(stmt)
+    return result.scalars().one()
 
 
 async def get_test_by_type(
     db: AsyncSession, 
     test_type: str,
-    include_scores: bool = False  # [修改] 1. 添加 'include_scores' 参数
-) -> Optional[Union[schemas.TestForTaking, Test]]: # [修改] 2. 更改返回类型
+    include_scores: bool = False
+) -> Optional[Union[schemas.TestForTaking, schemas.Test]]:
     """
-    获取测试。
-    如果 include_scores=True, 返回包含分数的完整 Test 数据库模型。
+    获取测试 (优先读取进程内缓存)。
+    如果 include_scores=True, 返回包含分数和结果范围的 schemas.Test。
     否则, 返回剥离分数的 TestForTaking schema。
     """
+    cache_key = (test_type, include_scores)
+    cached = test_definition_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    # 记录构建前的版本号，构建期间若缓存被失效则不写回
+    version = test_definition_cache.version
+    test_out = await _load_test_by_type(db, test_type, include_scores)
+    if test_out is not None:
+        test_definition_cache.put(cache_key, test_out, version=version)
+    return test_out
+
+
+async def get_test_payload(
+    db: AsyncSession,
+    test_type: str,
+    include_scores: bool = False
+) -> Optional[EncodedPayload]:
+    """
+    获取测试的预序列化 JSON (含 gzip / br 版本与 ETag)，每个测试版本只构建一次
+    """
+    cache_key = (test_type, include_scores)
+    cached = test_payload_cache.get(cache_key)
+    if cached is not None:
+        return cached
+
+    version = test_payload_cache.version
+    test_out = await get_test_by_type(db, test_type, include_scores=include_scores)
+    if test_out is None:
+        return None
+
+    payload = EncodedPayload.from_model(test_out)
+    test_payload_cache.put(cache_key, payload, version=version)
+    return payload
+
+
+async def _load_test_by_type(
+    db: AsyncSession,
+    test_type: str,
+    include_scores: bool
+) -> Optional[Union[schemas.TestForTaking, schemas.Test]]:
+    """
+    从数据库加载测试并编译成响应 schema (缓存未命中时调用)
+    """
     
     # 基础查询，总是加载问题和选项
     query_options = [
@@ -80,7 +172,7 @@ async def get_test_by_type(
         .selectinload(Question.options)
     ]
     
-    # [修改] 3. 如果需要分数，我们才预加载 'results'
+    # 如果需要分数，我们才预加载 'results'
     if include_scores:
         query_options.append(selectinload(Test.results))
 
@@ -100,12 +192,10 @@ async def get_test_by_type(
     # 确保问题按 order_index 排序
     db_test.questions = sorted(db_test.questions, key=lambda q: q.order_index)
 
-    # [修改] 4. 核心逻辑分支
+    # 核心逻辑分支
     if include_scores:
-        # 返回完整的数据库模型。
-        # FastAPI 会使用 'schemas.Test' (在 endpoints.py 中定义)
-        # 配合 orm_mode=True 自动将其序列化
-        return db_test
+        # 转换成与会话无关的 schemas.Test，才能安全地放入缓存
+        return schemas.Test.model_validate(db_test, from_attributes=True)
     else:
         # 返回“安全”的版本，剥离分数 (原始逻辑)
         questions_for_taking = []
@@ -134,39 +224,25 @@ async def get_test_by_type(
 async def get_popular_tests(db: AsyncSession, limit: int = 6) -> List[schemas.PopularTest]:
     """
     获取测试次数最多的 N 个测试
+    读取增量维护的 test_stats 计数表 (按 session_count 索引)，不再对 test_sessions 做 GROUP BY
     """
-    
-    # 1. 创建一个子查询 (Subquery)
-    #    作用: 统计 test_sessions 表中每个 test_id 出现了多少次
-    session_counts_sq = (
-        select(
-            TestSession.test_id,
-            func.count(TestSession.id).label("session_count") # COUNT(id) AS session_count
-        )
-        .group_by(TestSession.test_id) # GROUP BY test_id
-        .subquery() # 转换成子查询
-    )
-
-    # 2. 创建主查询
-    #    作用: JOIN tests 表 和 上一步的统计结果
     stmt = (
         select(
             Test.id,
             Test.test_type,
             Test.title,
             Test.description,
-            session_counts_sq.c.session_count # 'c' 代表 'columns'
-        )
-        .join(
-            session_counts_sq, Test.id == session_counts_sq.c.test_id # JOIN ON tests.id = ...
+            TestStats.session_count
         )
-        .order_by(desc(session_counts_sq.c.session_count)) # ORDER BY ... DESC
-        .limit(limit) # LIMIT 6
+        .join(TestStats, TestStats.test_id == Test.id)
+        .where(TestStats.session_count > 0)
+        .order_by(desc(TestStats.session_count))
+        .limit(limit)
     )
     
     result = await db.execute(stmt)
     
-    # 3. 将查询结果 (SQLAlchemy Rows) 转换为 Pydantic 模型
+    # 将查询结果 (SQLAlchemy Rows) 转换为 Pydantic 模型
     popular_tests = [
         schemas.PopularTest(
             id=row.id,
@@ -174,7 +250,7 @@ async def get_popular_tests(db: AsyncSession, limit: int = 6) -> List[schemas.Po
             title=row.title,
             description=row.description,
             session_count=row.session_count
-        ) for row in result.all() # .all() 是安全的，因为我们 limit 了 6 个
+        ) for row in result.all() # .all() 是安全的，因为我们 limit 了 N 个
     ]
     
-    return popular_tests
\ No newline at end of file
+    return popular_tests
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import func, select, text
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+from app.db.session import AsyncSessionLocal, engine
+from app.models.models import Test, TestStats
+from app.services.test_runtime import get_test_runtime
+from app.services.test_service import get_test_payload
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------
+# 启动预热 (在 lifespan 中执行)
+#
+# 新 worker 的第一批请求原本要承担建连、加载测试定义和编译计分规则的开销。
+# 预热阶段提前完成这些工作：
+#   connections  并发建立 WARMUP_DB_CONNECTIONS 个连接并归还给连接池
+#   tests        按会话数从多到少预加载测试的响应体缓存和计分运行时
+# 预热结束 (无论成功与否) 后 /health/ready 才返回 200；失败只记录日志，缓存会在请求时按需加载。
+# 启动总耗时 (导入 + 预热) 与 BOOT_TIME_BUDGET_SECONDS 比较，超出时告警。
+# ---------------------------------------------------------------
+
+
+class WarmupState:
+    def __init__(self):
+        self.ready = False
+        self.import_seconds: Optional[float] = None
+        self.phases: Dict[str, float] = {}
+        self.connections = 0
+        self.tests = 0
+        self.error: Optional[str] = None
+
+    @property
+    def boot_seconds(self) -> Optional[float]:
+        if self.import_seconds is None or not self.ready:
+            return None
+        return self.import_seconds + sum(self.phases.values())
+
+    def to_dict(self) -> Dict[str, Any]:
+        boot = self.boot_seconds
+        return {
+            "ready": self.ready,
+            "import_seconds": round(self.import_seconds, 4) if self.import_seconds is not None else None,
+            "phases": {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            "boot_seconds": round(boot, 4) if boot is not None else None,
+            "boot_budget_seconds": settings.BOOT_TIME_BUDGET_SECONDS,
+            "connections": self.connections,
+            "tests": self.tests,
+            "error": self.error,
+        }
+
+
+warmup_state = WarmupState()
+
+REGISTRY.callback_gauge("app_ready", "1 once startup warm-up has finished.", lambda: int(warmup_state.ready))
+REGISTRY.callback_gauge(
+    "app_boot_seconds", "Import plus warm-up time of this worker.", lambda: warmup_state.boot_seconds or 0.0
+)
+
+
+async def _open_connections(count: int) -> int:
+    """
+    并发建立 count 个连接 (各执行一次 SELECT 1)，全部归还后留在连接池中
+    """
+    opened = 0
+    all_open = asyncio.Event()
+
+    async def checkout() -> None:
+        nonlocal opened
+        try:
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+                opened += 1
+                if opened == count:
+                    all_open.set()
+                # 所有连接同时借出，连接池才会真正新建 count 个连接
+                await all_open.wait()
+        finally:
+            # 某个连接失败时不让其它连接一直等待
+            all_open.set()
+
+    await asyncio.gather(*(checkout() for _ in range(count)))
+    return opened
+
+
+async def _preload_tests(limit: int) -> int:
+    """
+    预加载热门测试：答题页响应体 (含测试定义缓存) 与计分运行时
+    """
+    async with AsyncSessionLocal() as db:
+        rows = (await db.execute(
+            select(Test.id, Test.test_type)
+            .outerjoin(TestStats, TestStats.test_id == Test.id)
+            .order_by(func.coalesce(TestStats.session_count, 0).desc(), Test.id)
+            .limit(limit)
+        )).all()
+        for test_id, test_type in rows:
+            await get_test_payload(db, test_type, include_scores=False)
+            await get_test_runtime(db, test_id)
+    return len(rows)
+
+
+async def warm_up(import_seconds: Optional[float] = None, state: WarmupState = warmup_state) -> WarmupState:
+    state.import_seconds = import_seconds
+    try:
+        connections = min(settings.WARMUP_DB_CONNECTIONS, settings.DB_POOL_SIZE)
+        if connections > 0:
+            started = time.perf_counter()
+            state.connections = await _open_connections(connections)
+            state.phases["connections"] = time.perf_counter() - started
+
+        # 每个测试在定义 / 响应体缓存中各占一项，不超过缓存容量
+        limit = min(settings.WARMUP_MAX_TESTS, settings.TEST_CACHE_MAX_ENTRIES)
+        if limit > 0:
+            started = time.perf_counter()
+            state.tests = await _preload_tests(limit)
+            state.phases["tests"] = time.perf_counter() - started
+    except Exception as e:
+        state.error = f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"
+        logger.warning("startup warm-up failed, continuing cold: %s", state.error)
+    finally:
+        state.ready = True
+
+    boot = state.boot_seconds
+    if boot is not None and boot > settings.BOOT_TIME_BUDGET_SECONDS:
+        logger.warning(
+            "boot took %.2fs, over the %.2fs budget (%s)",
+            boot, settings.BOOT_TIME_BUDGET_SECONDS, state.to_dict()["phases"]
+        )
+    else:
+        logger.info("warm-up finished: %s", state.to_dict())
+    return state
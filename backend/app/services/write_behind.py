@@ -0,0 +1,516 @@
+import asyncio
+import glob
+import json
+import logging
+import os
+import time
+import uuid
+from collections import deque
+from dataclasses import asdict
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, TextIO, Tuple, Union
+
+from sqlalchemy import delete, insert, select, update
+from sqlalchemy.exc import DBAPIError, InterfaceError, OperationalError, TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import AsyncSession
+
+try:
+    import fcntl  # (可选依赖) Windows 上没有：无法判断 spool 的所属进程是否存活，不接管其它 spool
+except ImportError:
+    fcntl = None
+
+from app.core.config import settings
+from app.core.metrics import REGISTRY
+from app.db.session import AsyncSessionLocal
+from app.models.models import TestSession, TestSessionDimension, WriteBehindCheckpoint
+from app.schemas import schemas
+from app.services.session_service import (
+    ScoredSession, build_session_schema, calculate_session, scored_session_dict,
+    save_scored_session, save_scored_sessions
+)
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------
+# 提交写入的 write-behind 缓冲
+#
+# 开启后，提交接口计分完成即返回结果，待写入的会话进入进程内有界队列，
+# 由后台任务按数量或时间阈值合并成多行 INSERT 写入数据库。
+#
+# spool：每个进程在 WRITE_BEHIND_SPOOL_DIR 下有自己的 spool 文件 (<pid>-<随机串>.spool)，
+# 存活期间持有该文件的排它锁 (flock)。每条记录 ({"seq": n, "session": {...}}) 追加到 spool
+# 并 fsync 之后才返回给客户端 (同一时刻的多个提交共用一次 fsync)。
+# 写库进度保存在 write_behind_checkpoints 表 (spool_id -> 已写入的最大 seq)，与会话在同一事务中提交，
+# 重放时跳过 seq <= 检查点的记录，不会重复写入。队列清空后截断本进程的 spool，避免无限增长。
+# 启动时以及运行期间每隔 WRITE_BEHIND_ADOPT_INTERVAL 秒扫描 spool 目录：能加上锁的 spool
+# 属于已退出的进程，由本进程接管，写完其中未写入的记录后删除文件和检查点。
+#
+# 失败处理：整批写入失败时逐条重试，找出出错的记录。连接中断、死锁等暂时性错误只退避不计次数；
+# 其它错误累计 WRITE_BEHIND_MAX_ATTEMPTS 次后，该记录写入死信文件 (<spool_id>.dead.ndjson) 并跳过，
+# 不会阻塞后面的记录。入队前按表结构校验字段长度，不合格的记录改为同步写入，由数据库直接报告错误。
+# ---------------------------------------------------------------
+
+_SPOOL_SUFFIX = ".spool"
+_DEAD_LETTER_SUFFIX = ".dead.ndjson"
+
+
+class WriteBehindFull(Exception):
+    """
+    队列已满或缓冲未运行，调用方应改为同步写入
+    """
+
+
+class WriteBehindRejected(Exception):
+    """
+    记录不满足表结构约束 (如字段超长)，调用方应改为同步写入
+    """
+
+
+class _Spool:
+    """
+    一个 spool 文件及其中尚未写库的记录 (本进程的，或接管的已退出进程的)
+    """
+
+    def __init__(self, spool_id: str, path: str, file: TextIO):
+        self.spool_id = spool_id
+        self.path = path
+        self.file = file
+        self.pending: Deque[Tuple[int, ScoredSession]] = deque()
+        self.attempts: Dict[int, int] = {}
+
+
+class WriteBehindBuffer:
+    def __init__(
+        self,
+        spool_dir: str,
+        max_queue: int,
+        max_batch: int,
+        flush_interval: float,
+        max_attempts: int,
+        adopt_interval: float,
+    ):
+        self.spool_dir = spool_dir
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.flush_interval = flush_interval
+        self.max_attempts = max_attempts
+        self.adopt_interval = adopt_interval
+
+        self._own: Optional[_Spool] = None
+        self._adopted: List[_Spool] = []
+        self._seq = 0
+        self._synced_seq = 0
+        self._sync_task: Optional[asyncio.Task] = None
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self._next_adopt = 0.0
+
+        # 运行状态 (用于排查，同时由 /metrics 暴露)
+        self.flushed_total = 0
+        self.dead_lettered_total = 0
+        self.adopted_total = 0
+        self.last_error: Optional[str] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    @property
+    def pending(self) -> int:
+        own = len(self._own.pending) if self._own is not None else 0
+        return own + sum(len(spool.pending) for spool in self._adopted)
+
+    # --- 生命周期 ---
+    async def start(self) -> None:
+        os.makedirs(self.spool_dir, exist_ok=True)
+        self._own = _create_spool(self.spool_dir)
+        self._seq = self._synced_seq = 0
+        await self._adopt_orphans()
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """
+        停止后台任务，并尽量把剩余记录写入数据库；
+        写不完的记录留在 spool 中，由下一个启动的进程接管
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if self._task is not None:
+            await self._task
+            self._task = None
+        if self._sync_task is not None:
+            await asyncio.gather(self._sync_task, return_exceptions=True)
+
+        for spool in self._adopted:
+            spool.file.close()
+        self._adopted = []
+        if self._own is not None:
+            if not self._own.pending:
+                await self._release(self._own)
+            else:
+                self._own.file.close()
+            self._own = None
+
+    # --- 入队 ---
+    async def submit(self, scored: ScoredSession) -> None:
+        """
+        记录写入 spool 并 fsync 后返回 (此时才可以向客户端确认)
+        """
+        if not self.running or len(self._own.pending) >= self.max_queue:
+            raise WriteBehindFull()
+        if not _fits_columns(scored):
+            raise WriteBehindRejected()
+
+        self._seq += 1
+        seq = self._seq
+        self._own.file.write(json.dumps({"seq": seq, "session": _encode(scored)}, ensure_ascii=False) + "\n")
+        self._own.pending.append((seq, scored))
+        if len(self._own.pending) >= self.max_batch:
+            self._wakeup.set()
+        await self._sync(seq)
+
+    async def _sync(self, seq: int) -> None:
+        # 组提交：一次 fsync 覆盖发起时已写入的所有记录，期间到达的提交等待下一次
+        while self._synced_seq < seq:
+            if self._sync_task is None:
+                self._sync_task = asyncio.create_task(self._fsync())
+            await asyncio.shield(self._sync_task)
+
+    async def _fsync(self) -> None:
+        try:
+            target = self._seq
+            self._own.file.flush()
+            await asyncio.to_thread(os.fsync, self._own.file.fileno())
+            self._synced_seq = target
+        finally:
+            self._sync_task = None
+
+    # --- 后台写入 ---
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+
+            ok = True
+            for spool in [self._own, *self._adopted]:
+                while spool.pending and ok:
+                    ok = await self._flush_once(spool)
+            for spool in [s for s in self._adopted if not s.pending]:
+                self._adopted.remove(spool)
+                await self._release(spool)
+
+            if self._stopping:
+                return
+            if not ok:
+                # 数据库不可用时退避，记录仍在队列和 spool 中
+                await asyncio.sleep(self.flush_interval)
+            elif time.monotonic() >= self._next_adopt:
+                await self._adopt_orphans()
+
+    async def _flush_once(self, spool: _Spool) -> bool:
+        batch = [spool.pending[i] for i in range(min(self.max_batch, len(spool.pending)))]
+        try:
+            await _write(spool.spool_id, batch)
+        except Exception as e:
+            self._record_error(e, len(batch))
+            if _is_transient(e):
+                return False
+            if len(batch) == 1:
+                return await self._row_failed(spool, *batch[0], e)
+            # 逐条重试，找出出错的记录
+            return await self._flush_rows(spool, batch)
+
+        self._done(spool, batch)
+        return True
+
+    async def _flush_rows(self, spool: _Spool, batch: List[Tuple[int, ScoredSession]]) -> bool:
+        for seq, scored in batch:
+            try:
+                await _write(spool.spool_id, [(seq, scored)])
+            except Exception as e:
+                self._record_error(e, 1)
+                if _is_transient(e) or not await self._row_failed(spool, seq, scored, e):
+                    return False
+                continue
+            self._done(spool, [(seq, scored)])
+        return True
+
+    async def _row_failed(self, spool: _Spool, seq: int, scored: ScoredSession, error: Exception) -> bool:
+        """
+        记录一次失败；达到 max_attempts 时写入死信文件并出队，返回 True 表示可以继续写后面的记录
+        """
+        attempts = spool.attempts[seq] = spool.attempts.get(seq, 0) + 1
+        if attempts < self.max_attempts:
+            return False
+
+        path = os.path.join(self.spool_dir, spool.spool_id + _DEAD_LETTER_SUFFIX)
+        line = json.dumps(
+            {"seq": seq, "error": repr(error), "attempts": attempts, "session": _encode(scored)},
+            ensure_ascii=False,
+        ) + "\n"
+        await asyncio.to_thread(_append_durably, path, line)
+        logger.error("write-behind: session %s/%d moved to %s after %d attempts", spool.spool_id, seq, path, attempts)
+        self.dead_lettered_total += 1
+        spool.pending.popleft()
+        spool.attempts.pop(seq, None)
+
+        # 尽量同时推进检查点；失败也无妨，后面的记录写入时会一并推进
+        try:
+            await _write(spool.spool_id, [(seq, None)])
+        except Exception as e:
+            self._record_error(e, 0)
+        return True
+
+    def _done(self, spool: _Spool, batch: List[Tuple[int, ScoredSession]]) -> None:
+        for seq, _ in batch:
+            spool.pending.popleft()
+            spool.attempts.pop(seq, None)
+        self.flushed_total += len(batch)
+
+        # 本进程的队列清空时截断 spool (期间没有 await，不会与 submit 交错)
+        if spool is self._own and not spool.pending:
+            spool.file.seek(0)
+            spool.file.truncate()
+            spool.file.flush()
+
+    def _record_error(self, error: Exception, count: int) -> None:
+        self.last_error = repr(error)
+        logger.warning("write-behind flush of %d sessions failed: %r", count, error)
+
+    # --- 接管已退出进程的 spool ---
+    async def _adopt_orphans(self) -> None:
+        self._next_adopt = time.monotonic() + self.adopt_interval
+        if fcntl is None:
+            return
+
+        known = {self._own.path, *(spool.path for spool in self._adopted)}
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "*" + _SPOOL_SUFFIX))):
+            if path in known:
+                continue
+            spool = _lock_orphan(path)
+            if spool is None:
+                continue
+            try:
+                checkpoint = await _load_checkpoint(spool.spool_id)
+                records = await asyncio.to_thread(_read_spool, spool.file)
+            except Exception as e:
+                # 数据库不可用：释放锁，下次再接管
+                spool.file.close()
+                self._record_error(e, 0)
+                return
+            spool.pending.extend(record for record in records if record[0] > checkpoint)
+            self._adopted.append(spool)
+            self.adopted_total += 1
+            logger.warning("write-behind: adopted %s with %d unwritten sessions", path, len(spool.pending))
+
+    async def _release(self, spool: _Spool) -> None:
+        # 先删除文件 (持有锁期间)，再删除检查点；检查点删除失败只会留下一行无用的记录
+        os.unlink(spool.path)
+        spool.file.close()
+        try:
+            async with AsyncSessionLocal() as db:
+                await db.execute(
+                    delete(WriteBehindCheckpoint).where(WriteBehindCheckpoint.spool_id == spool.spool_id)
+                )
+                await db.commit()
+        except Exception as e:
+            self._record_error(e, 0)
+
+
+# ---------------------------------------------------------------
+# 写库：会话与检查点在同一事务中提交
+# ---------------------------------------------------------------
+async def _write(spool_id: str, batch: List[Tuple[int, Optional[ScoredSession]]]) -> None:
+    """
+    写入 batch 中的会话 (None 表示只推进检查点) 并把检查点更新为最后一条的 seq
+    """
+    async with AsyncSessionLocal() as db:
+        sessions = [scored for _, scored in batch if scored is not None]
+        if sessions:
+            await save_scored_sessions(db, sessions)
+        await _save_checkpoint(db, spool_id, batch[-1][0])
+        await db.commit()
+
+
+async def _save_checkpoint(db: AsyncSession, spool_id: str, seq: int) -> None:
+    row = {"spool_id": spool_id, "seq": seq}
+    dialect = db.get_bind().dialect.name
+    if dialect == "mysql":
+        from sqlalchemy.dialects import mysql
+        stmt = mysql.insert(WriteBehindCheckpoint).values(row)
+        await db.execute(stmt.on_duplicate_key_update(seq=stmt.inserted.seq))
+        return
+    if dialect in ("sqlite", "postgresql"):
+        if dialect == "sqlite":
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(WriteBehindCheckpoint).values(row)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[WriteBehindCheckpoint.spool_id], set_={"seq": stmt.excluded.seq}
+        ))
+        return
+
+    # 其它数据库：先 UPDATE，不存在时再 INSERT
+    result = await db.execute(
+        update(WriteBehindCheckpoint).where(WriteBehindCheckpoint.spool_id == spool_id).values(seq=seq)
+    )
+    if result.rowcount == 0:
+        await db.execute(insert(WriteBehindCheckpoint).values(**row))
+
+
+async def _load_checkpoint(spool_id: str) -> int:
+    async with AsyncSessionLocal() as db:
+        seq = await db.scalar(
+            select(WriteBehindCheckpoint.seq).where(WriteBehindCheckpoint.spool_id == spool_id)
+        )
+    return seq or 0
+
+
+def _is_transient(error: Exception) -> bool:
+    """
+    连接中断、锁等待超时、死锁、连接池超时等：重试通常能成功，不计入记录的失败次数
+    """
+    if isinstance(error, DBAPIError):
+        return error.connection_invalidated or isinstance(error, (OperationalError, InterfaceError))
+    return isinstance(error, (PoolTimeoutError, OSError, asyncio.TimeoutError))
+
+
+# 入队前按表结构校验的字符串列 (超长的记录在 MySQL 严格模式下会写库失败)
+_USER_ID_LENGTH = TestSession.user_id.type.length
+_RESULT_LENGTH = TestSession.result.type.length
+_DIMENSION_CODE_LENGTH = TestSessionDimension.dimension_code.type.length
+_RESULT_RANGE_LENGTH = TestSessionDimension.result_range.type.length
+
+
+def _fits_columns(scored: ScoredSession) -> bool:
+    if len(scored.user_id) > _USER_ID_LENGTH or len(scored.result) > _RESULT_LENGTH:
+        return False
+    if settings.SESSION_STORAGE_COMPACT:
+        # 紧凑存储时维度打包在 TEXT 列中，没有单独的长度限制
+        return True
+    return all(
+        len(code) <= _DIMENSION_CODE_LENGTH and len(text) <= _RESULT_RANGE_LENGTH
+        for code, _, text in scored.dimensions
+    )
+
+
+# ---------------------------------------------------------------
+# spool 文件
+# ---------------------------------------------------------------
+def _create_spool(spool_dir: str) -> _Spool:
+    spool_id = f"{os.getpid()}-{uuid.uuid4().hex[:12]}"
+    path = os.path.join(spool_dir, spool_id + _SPOOL_SUFFIX)
+    # 先以临时文件名创建并加锁，再改名：其它进程扫描时不会看到未加锁的新 spool
+    tmp_path = path + ".tmp"
+    f = open(tmp_path, "a", encoding="utf-8")
+    if fcntl is not None:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    os.rename(tmp_path, path)
+    return _Spool(spool_id, path, f)
+
+
+def _lock_orphan(path: str) -> Optional[_Spool]:
+    """
+    能加上锁说明所属进程已退出；返回持有锁的 _Spool，否则返回 None
+    """
+    try:
+        f = open(path, encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    try:
+        fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    if os.fstat(f.fileno()).st_nlink == 0:
+        # 加锁前已被其它进程接管并删除
+        f.close()
+        return None
+    return _Spool(os.path.basename(path)[:-len(_SPOOL_SUFFIX)], path, f)
+
+
+def _read_spool(f: TextIO) -> List[Tuple[int, ScoredSession]]:
+    records: List[Tuple[int, ScoredSession]] = []
+    for line in f:
+        try:
+            record = json.loads(line)
+        except ValueError:
+            # 崩溃时写了一半的最后一行 (未 fsync，也未向客户端确认)
+            continue
+        if "seq" not in record:
+            # 旧版本的完成标记等
+            continue
+        records.append((record["seq"], _decode(record["session"])))
+    return records
+
+
+def _append_durably(path: str, line: str) -> None:
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(line)
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _encode(scored: ScoredSession) -> Dict[str, Any]:
+    data = asdict(scored)
+    data["created_at"] = scored.created_at.isoformat()
+    return data
+
+
+def _decode(data: Dict[str, Any]) -> ScoredSession:
+    return ScoredSession(
+        user_id=data["user_id"],
+        test_id=data["test_id"],
+        result=data["result"],
+        total_score=data["total_score"],
+        created_at=datetime.fromisoformat(data["created_at"]),
+        answers=[tuple(a) for a in data["answers"]],
+        dimensions=[tuple(d) for d in data["dimensions"]],
+    )
+
+
+write_behind_buffer = WriteBehindBuffer(
+    spool_dir=settings.WRITE_BEHIND_SPOOL_DIR,
+    max_queue=settings.WRITE_BEHIND_MAX_QUEUE,
+    max_batch=settings.WRITE_BEHIND_MAX_BATCH,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL,
+    max_attempts=settings.WRITE_BEHIND_MAX_ATTEMPTS,
+    adopt_interval=settings.WRITE_BEHIND_ADOPT_INTERVAL,
+)
+
+REGISTRY.callback_gauge(
+    "write_behind_pending", "Sessions queued for write-behind in this process.",
+    lambda: write_behind_buffer.pending,
+)
+REGISTRY.callback_counter(
+    "write_behind_flushed_total", "Sessions written by the write-behind buffer.",
+    lambda: write_behind_buffer.flushed_total,
+)
+REGISTRY.callback_counter(
+    "write_behind_dead_lettered_total", "Sessions moved to the write-behind dead-letter file.",
+    lambda: write_behind_buffer.dead_lettered_total,
+)
+
+
+async def calculate_and_queue_session(
+    db: AsyncSession,
+    test_id: int,
+    submission: schemas.TestSubmission,
+    as_dict: bool = False
+) -> Union[schemas.TestSession, Dict[str, Any]]:
+    """
+    计分后立即返回结果，会话交给 write-behind 缓冲写入；
+    缓冲未运行、已满或记录不满足表结构约束时退回同步写入。
+    """
+    scored = await calculate_session(db, test_id, submission)
+    try:
+        await write_behind_buffer.submit(scored)
+    except (WriteBehindFull, WriteBehindRejected):
+        return await save_scored_session(db, scored, as_dict=as_dict)
+    return scored_session_dict(None, scored) if as_dict else build_session_schema(None, scored)
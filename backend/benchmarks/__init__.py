@@ -0,0 +1,8 @@
+"""
+基准测试与压测工具 (不随应用部署)。
+
+用法 (在 backend 目录下):
+    python -m benchmarks.micro --output bench.json [--compare old.json]
+    python -m benchmarks.seed_data --database-url ... --sessions 1000000
+    python -m benchmarks.load_driver --database-url ... --concurrency 1,8,32
+"""
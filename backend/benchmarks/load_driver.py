@@ -0,0 +1,188 @@
+"""
+压测：对每个接口分别做并发扫描，报告吞吐量与 p50 / p95 / p99 延迟。
+默认在进程内直接调用 FastAPI 应用 (不经过网络，限流关闭)；给出 --base-url 时压测已启动的服务
+(此时需要把服务的 RATE_LIMIT_DEFAULT 调大)。先用 benchmarks.seed_data 造数。
+
+用法 (在 backend 目录下):
+    python -m benchmarks.load_driver --database-url sqlite+aiosqlite:///./load.sqlite3 \\
+        --concurrency 1,8,32 --duration 10 --output load.json
+    python -m benchmarks.load_driver --base-url http://127.0.0.1:8000 --users 200000
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, List
+
+try:
+    import httpx
+except ImportError:  # pragma: no cover
+    httpx = None
+
+from benchmarks.seed_data import SCALE_WEIGHTS, pick_user_rank, user_id_for
+
+API = "/api/v1"
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """
+    最近秩法的百分位数 (输入已排序)
+    """
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(q / 100 * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+async def run_level(
+    make_request: Callable[[random.Random], Awaitable[int]],
+    concurrency: int,
+    duration: float,
+    seed: int,
+) -> Dict[str, Any]:
+    latencies: List[float] = []
+    statuses: Dict[int, int] = {}
+    deadline = time.perf_counter() + duration
+
+    async def worker(worker_id: int) -> None:
+        rng = random.Random(seed * 1000 + worker_id)
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            status = await make_request(rng)
+            latencies.append(time.perf_counter() - started)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker(i) for i in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    errors = sum(n for status, n in statuses.items() if status >= 400)
+    return {
+        "concurrency": concurrency,
+        "requests": len(latencies),
+        "rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "max_ms": round(latencies[-1] * 1000, 3) if latencies else 0.0,
+        "errors": errors,
+        "statuses": {str(k): v for k, v in sorted(statuses.items())},
+    }
+
+
+async def build_scenarios(client: "httpx.AsyncClient", args: argparse.Namespace):
+    """
+    每个接口一个请求生成函数；提交用的题目 / 选项从测试接口读取
+    """
+    test_types = [scale for scale in SCALE_WEIGHTS]
+    tests = {}
+    for test_type in test_types:
+        response = await client.get(f"{API}/tests/{test_type}")
+        if response.status_code == 200:
+            tests[test_type] = response.json()
+    if not tests:
+        raise SystemExit("no tests found: run python -m benchmarks.seed_data first")
+    weights = [SCALE_WEIGHTS[t] for t in tests]
+    test_list = list(tests.values())
+
+    async def get_test(rng: random.Random) -> int:
+        test = rng.choices(test_list, weights=weights)[0]
+        return (await client.get(f"{API}/tests/{test['test_type']}")).status_code
+
+    async def popular(rng: random.Random) -> int:
+        return (await client.get(f"{API}/tests/popular")).status_code
+
+    async def user_sessions(rng: random.Random) -> int:
+        user_id = user_id_for(pick_user_rank(rng, args.users))
+        return (await client.get(f"{API}/users/{user_id}/sessions", params={"limit": 20})).status_code
+
+    async def submit(rng: random.Random) -> int:
+        test = rng.choices(test_list, weights=weights)[0]
+        body = {
+            "user_id": user_id_for(pick_user_rank(rng, args.users)),
+            "answers": [
+                {"question_id": q["id"], "selected_option_id": rng.choice(q["options"])["id"]}
+                for q in test["questions"]
+            ],
+        }
+        return (await client.post(f"{API}/tests/{test['id']}/submit", json=body)).status_code
+
+    scenarios = {
+        "GET /tests/{test_type}": get_test,
+        "GET /tests/popular": popular,
+        "GET /users/{user_id}/sessions": user_sessions,
+        "POST /tests/{test_id}/submit": submit,
+    }
+    if args.endpoints:
+        wanted = args.endpoints.split(",")
+        scenarios = {name: fn for name, fn in scenarios.items() if any(w in name for w in wanted)}
+    return scenarios
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    levels = [int(c) for c in args.concurrency.split(",")]
+    limits = httpx.Limits(max_connections=max(levels), max_keepalive_connections=max(levels))
+
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=30.0)
+        lifespan = None
+    else:
+        # 应用模块在导入时读取 DATABASE_URL，必须在设置之后再导入
+        from app.main import app, limiter
+
+        limiter.enabled = False
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://load", timeout=30.0)
+        lifespan = app.router.lifespan_context(app)
+
+    report: Dict[str, Any] = {}
+    try:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        scenarios = await build_scenarios(client, args)
+        for name, make_request in scenarios.items():
+            report[name] = []
+            for concurrency in levels:
+                result = await run_level(make_request, concurrency, args.duration, args.seed)
+                report[name].append(result)
+                print(
+                    f"{name:<32} c={concurrency:<4} {result['rps']:>9.1f} req/s  "
+                    f"p50 {result['p50_ms']:>8.2f}ms  p95 {result['p95_ms']:>8.2f}ms  "
+                    f"p99 {result['p99_ms']:>8.2f}ms  errors {result['errors']}"
+                )
+    finally:
+        if lifespan is not None:
+            await lifespan.__aexit__(None, None, None)
+        await client.aclose()
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--database-url", help="进程内压测使用的数据库")
+    target.add_argument("--base-url", help="压测已启动的服务，如 http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", default="1,8,32", help="逗号分隔的并发级别")
+    parser.add_argument("--duration", type=float, default=10.0, help="每个并发级别持续的秒数")
+    parser.add_argument("--users", type=int, default=200_000, help="与造数时的 --users 一致")
+    parser.add_argument("--endpoints", help="只压测名称包含这些字符串的接口 (逗号分隔)")
+    parser.add_argument("--output", help="结果 JSON 文件")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    if httpx is None:
+        raise SystemExit("benchmarks.load_driver requires httpx (pip install httpx)")
+    if args.database_url:
+        os.environ["DATABASE_URL"] = args.database_url
+
+    report = asyncio.run(run(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\nresults written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+微基准测试：计分、测试定义读取、会话序列化。
+默认使用临时 SQLite 文件数据库，结果写入 JSON，便于在不同提交之间比较。
+
+用法 (在 backend 目录下):
+    python -m benchmarks.micro --output bench.json
+    python -m benchmarks.micro --output new.json --compare bench.json
+    python -m benchmarks.micro --filter scoring
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+
+class Runner:
+    """
+    计时：先校准每轮循环次数 (每轮至少 min_time 秒)，再重复 rounds 轮，按每次调用的耗时统计
+    """
+
+    def __init__(self, min_time: float, rounds: int, name_filter: Optional[str]):
+        self.min_time = min_time
+        self.rounds = rounds
+        self.name_filter = name_filter
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def wants(self, name: str) -> bool:
+        return not self.name_filter or self.name_filter in name
+
+    def _record(self, name: str, loops: int, timings: List[float]) -> None:
+        per_op = [t / loops * 1e6 for t in timings]
+        median = statistics.median(per_op)
+        self.results[name] = {
+            "median_us": round(median, 3),
+            "mean_us": round(statistics.mean(per_op), 3),
+            "min_us": round(min(per_op), 3),
+            "stdev_us": round(statistics.stdev(per_op), 3) if len(per_op) > 1 else 0.0,
+            "ops_per_sec": round(1e6 / median, 1) if median else None,
+            "loops": loops,
+            "rounds": len(per_op),
+        }
+        print(f"{name:<55} {median:>12.2f} us/op")
+
+    def bench(self, name: str, fn: Callable[[], Any]) -> None:
+        if not self.wants(name):
+            return
+        loops = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            if time.perf_counter() - started >= self.min_time or loops >= 1 << 20:
+                break
+            loops *= 2
+        timings = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            for _ in range(loops):
+                fn()
+            timings.append(time.perf_counter() - started)
+        self._record(name, loops, timings)
+
+    async def bench_async(self, name: str, fn: Callable[[], Awaitable[Any]]) -> None:
+        if not self.wants(name):
+            return
+        loops = 1
+        while True:
+            started = time.perf_counter()
+            for _ in range(loops):
+                await fn()
+            if time.perf_counter() - started >= self.min_time or loops >= 1 << 16:
+                break
+            loops *= 2
+        timings = []
+        for _ in range(self.rounds):
+            started = time.perf_counter()
+            for _ in range(loops):
+                await fn()
+            timings.append(time.perf_counter() - started)
+        self._record(name, loops, timings)
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL, text=True
+        ).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args: argparse.Namespace) -> Dict[str, Any]:
+    # 应用模块在导入时读取 DATABASE_URL，必须在设置之后再导入
+    from app.db.base_class import Base
+    from app.db.session import AsyncSessionLocal, engine
+    from app.models import models  # noqa: F401
+    from app.models.models import TestSession, UserAnswer, TestSessionDimension
+    from app.schemas import schemas
+    from app.services import session_service, test_service
+    from app.services.test_cache import invalidate_test_caches
+    from app.services.test_runtime import get_test_runtime
+    from benchmarks.scales import SCALE_SHAPES, build_scale_test, random_answers
+
+    runner = Runner(args.min_time, args.rounds, args.filter)
+    rng = random.Random(args.seed)
+
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+
+    async with AsyncSessionLocal() as db:
+        test_ids: Dict[str, int] = {}
+        for test_type in SCALE_SHAPES:
+            db_test = await test_service.create_test(db, build_scale_test(test_type))
+            test_ids[test_type] = db_test.id
+        await db.commit()
+
+    async with AsyncSessionLocal() as db:
+        # --- 1. 计分 (各量表)：校验 + 计分 + 规则匹配，不含写库 ---
+        for test_type, test_id in test_ids.items():
+            runtime = await get_test_runtime(db, test_id)
+            full = await test_service.get_test_by_type(db, test_type, include_scores=True)
+            submissions = [
+                schemas.TestSubmission(user_id=f"u{i}", answers=random_answers(full, rng)) for i in range(64)
+            ]
+            answer_pairs = [
+                [(runtime.options[a.selected_option_id].order_index, runtime.options[a.selected_option_id].score)
+                 for a in sub.answers]
+                for sub in submissions
+            ]
+            cycle = iter(range(1 << 62))
+
+            runner.bench(
+                f"scoring.compiled_score[{test_type}]",
+                lambda: runtime.scoring.score(answer_pairs[next(cycle) % 64]),
+            )
+            runner.bench(
+                f"scoring.score_submission[{test_type}]",
+                lambda: session_service.score_submission(runtime, submissions[next(cycle) % 64]),
+            )
+
+        # --- 2. get_test_by_type 构建 TestForTaking：未命中缓存 (查库 + 构建) / 命中缓存 ---
+        for test_type in test_ids:
+            async def cold(test_type=test_type):
+                invalidate_test_caches()
+                return await test_service.get_test_by_type(db, test_type)
+
+            async def warm(test_type=test_type):
+                return await test_service.get_test_by_type(db, test_type)
+
+            await runner.bench_async(f"get_test_by_type.cold[{test_type}]", cold)
+            await runner.bench_async(f"get_test_by_type.warm[{test_type}]", warm)
+
+    # --- 3. 会话序列化：ORM 对象 -> schemas.TestSession -> JSON ---
+    for n_answers in (30, 200, 1000):
+        created_at = datetime(2024, 1, 1, 12, 0, 0)
+        session = TestSession(
+            id=1, user_id="bench-user", test_id=1, result="结果<SEP>描述", total_score=n_answers * 3,
+            created_at=created_at,
+        )
+        session.answers = [
+            UserAnswer(id=i, session_id=1, question_id=i, selected_option_id=i * 4) for i in range(n_answers)
+        ]
+        session.dimensions = [
+            TestSessionDimension(id=i, session_id=1, dimension_code=f"D{i}", score=i * 10, result_range="维度说明")
+            for i in range(7)
+        ]
+        session_schema = session_service.session_to_schema(session)
+
+        runner.bench(
+            f"serialize.session_to_schema[{n_answers}]",
+            lambda session=session: session_service.session_to_schema(session),
+        )
+        runner.bench(
+            f"serialize.model_dump_json[{n_answers}]",
+            lambda session_schema=session_schema: session_schema.model_dump_json(),
+        )
+        data = session_schema.model_dump()
+        runner.bench(
+            f"serialize.model_validate[{n_answers}]",
+            lambda data=data: schemas.TestSession.model_validate(data),
+        )
+
+    await engine.dispose()
+    return runner.results
+
+
+def compare(old_path: str, results: Dict[str, Dict[str, Any]], threshold: float) -> int:
+    """
+    与旧结果比较中位数；变慢超过 threshold 的条目标记为回归，返回回归数量
+    """
+    with open(old_path, encoding="utf-8") as f:
+        old = json.load(f)["results"]
+    regressions = 0
+    print(f"\n{'benchmark':<55} {'old us':>10} {'new us':>10} {'ratio':>7}")
+    for name, new in results.items():
+        if name not in old:
+            continue
+        ratio = new["median_us"] / old[name]["median_us"] if old[name]["median_us"] else float("inf")
+        flag = ""
+        if ratio > 1 + threshold:
+            flag = "  << slower"
+            regressions += 1
+        elif ratio < 1 - threshold:
+            flag = "  faster"
+        print(f"{name:<55} {old[name]['median_us']:>10.2f} {new['median_us']:>10.2f} {ratio:>7.2f}{flag}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", default="bench.json", help="结果 JSON 文件")
+    parser.add_argument("--compare", help="与之前保存的结果 JSON 比较")
+    parser.add_argument("--threshold", type=float, default=0.15, help="判定回归的相对变慢比例")
+    parser.add_argument("--filter", help="只运行名称包含该字符串的基准")
+    parser.add_argument("--database-url", help="默认使用临时 SQLite 文件")
+    parser.add_argument("--min-time", type=float, default=0.05, help="每轮最短耗时(秒)")
+    parser.add_argument("--rounds", type=int, default=7)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    database_url = args.database_url or "sqlite+aiosqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.sqlite3")
+    os.environ["DATABASE_URL"] = database_url
+
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "commit": _git_commit(),
+            "created_at": datetime.now().isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "database": database_url.split("://", 1)[0],
+        },
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"\nresults written to {args.output}")
+
+    if args.compare and compare(args.compare, results, args.threshold):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
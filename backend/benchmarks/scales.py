@@ -0,0 +1,100 @@
+"""
+与线上量表形状一致的测试定义 (题量 / 选项分数 / 维度 / 结果规则)，供基准测试和造数使用。
+"""
+import random
+from itertools import product
+from typing import Dict, List, Sequence, Tuple
+
+from app.schemas import schemas
+from app.services.scoring_specs import BUILTIN_SCORING_SPECS, MBTI_SCORING_SPEC
+
+# test_type -> (题量, 每题的选项分数)；MBTI 的选项分数按轴编码字母，单独生成
+SCALE_SHAPES: Dict[str, Tuple[int, Sequence[int]]] = {
+    "mbti": (28, ()),
+    "hpls": (40, (1, 2, 3, 4)),
+    "mps": (29, (1, 2, 3, 4, 5)),
+    "ipvs": (15, (1, 2, 3, 4, 5)),
+    # 没有内置规格：默认按总分加总
+    "sum": (20, (1, 2, 3, 4, 5)),
+}
+
+
+def _bands(code, lo: int, hi: int) -> List[schemas.TestResultCreate]:
+    """
+    把 [lo, hi] 切成低 / 中 / 高三段互不重叠、没有空隙的规则
+    """
+    step = max((hi - lo + 1) // 3, 1)
+    cuts = [lo, lo + step, lo + 2 * step, hi + 1]
+    rules = []
+    for label, start, end in zip(("低", "中", "高"), cuts, cuts[1:]):
+        if start < end:
+            rules.append(schemas.TestResultCreate(
+                min_score=start, max_score=end - 1, result_range=f"{code or '总分'}{label}",
+                description=f"{label}分段说明", dimension_code=code,
+            ))
+    return rules
+
+
+def _mbti_option_scores(order_index: int) -> Sequence[int]:
+    letters_to_score = {v: k for k, v in MBTI_SCORING_SPEC["type_letters"]["score_letters"].items()}
+    for axis in MBTI_SCORING_SPEC["type_letters"]["axes"]:
+        if order_index in axis["items"]:
+            return tuple(letters_to_score[letter] for letter in axis["letters"])
+    return (1, 2)
+
+
+def build_scale_test(test_type: str, suffix: str = "") -> schemas.TestCreate:
+    """
+    生成一个形状与 test_type 对应量表一致的测试；suffix 用于生成多个同形状的测试
+    """
+    n_questions, option_scores = SCALE_SHAPES[test_type]
+    questions = []
+    for order_index in range(1, n_questions + 1):
+        scores = _mbti_option_scores(order_index) if test_type == "mbti" else option_scores
+        questions.append(schemas.QuestionCreate(
+            text=f"第 {order_index} 题",
+            order_index=order_index,
+            options=[schemas.QuestionOptionCreate(text=f"选项 {s}", score=s) for s in scores],
+        ))
+
+    results: List[schemas.TestResultCreate] = []
+    spec = BUILTIN_SCORING_SPECS.get(test_type)
+    if test_type == "mbti":
+        # 16 种类型，按字母编码之和精确匹配
+        encoding = MBTI_SCORING_SPEC["type_letters"]["encoding"]
+        axes = [axis["letters"] for axis in MBTI_SCORING_SPEC["type_letters"]["axes"]]
+        for letters in product(*axes):
+            code = "".join(letters)
+            value = sum(encoding[letter] for letter in letters)
+            results.append(schemas.TestResultCreate(
+                min_score=value, max_score=value, result_range=code, description=f"{code} 类型说明",
+            ))
+    else:
+        lo_score, hi_score = min(option_scores), max(option_scores)
+        dimensions = dict((spec or {}).get("dimensions") or {})
+        for code, parts in ((spec or {}).get("composites") or {}).items():
+            dimensions[code] = [item for part in parts for item in dimensions[part]]
+        for code, items in dimensions.items():
+            results.extend(_bands(code, len(items) * lo_score, len(items) * hi_score))
+        if not spec or spec["result"]["source"] == "total":
+            results.extend(_bands(None, n_questions * lo_score, n_questions * hi_score))
+
+    return schemas.TestCreate(
+        title=f"{test_type.upper()} {suffix}".strip(),
+        description=f"{test_type} 基准测试量表",
+        test_type=f"{test_type}{suffix}",
+        questions=questions,
+        results=results,
+        # 内置规格按 test_type 查找；带后缀的副本需要显式保存规格
+        scoring_spec=spec if (spec and suffix) else None,
+    )
+
+
+def random_answers(test: schemas.Test, rng: random.Random) -> List[schemas.UserAnswerInput]:
+    """
+    为每道题随机选择一个选项
+    """
+    return [
+        schemas.UserAnswerInput(question_id=q.id, selected_option_id=rng.choice(q.options).id)
+        for q in test.questions
+    ]
@@ -0,0 +1,167 @@
+"""
+造数：按线上量表的形状创建测试，并批量写入大量会话 / 答案 / 维度结果。
+会话由真实的计分逻辑产生；用户分布为少量重度用户 + 大量长尾用户，测试热度按量表加权。
+
+用法 (在 backend 目录下；--database-url 必须显式给出，避免误写生产库):
+    python -m benchmarks.seed_data --database-url sqlite+aiosqlite:///./load.sqlite3 --create-schema \\
+        --sessions 1000000 --users 200000
+"""
+import argparse
+import asyncio
+import os
+import random
+import time
+from datetime import timedelta
+from typing import Dict, List, NamedTuple
+
+# 各量表的相对热度
+SCALE_WEIGHTS: Dict[str, float] = {"mbti": 0.40, "ipvs": 0.20, "hpls": 0.15, "mps": 0.15, "sum": 0.10}
+# 来自重度用户 (帕累托分布的头部) 的会话比例
+HEAVY_USER_SHARE = 0.2
+
+
+class _Answer(NamedTuple):
+    question_id: int
+    selected_option_id: int
+
+
+class _Submission(NamedTuple):
+    # score_submission 只读取这两个属性；跳过 pydantic 校验以加快造数
+    user_id: str
+    answers: List[_Answer]
+
+
+def user_id_for(rank: int) -> str:
+    return f"user-{rank:07d}"
+
+
+def pick_user_rank(rng: random.Random, n_users: int) -> int:
+    if rng.random() < HEAVY_USER_SHARE:
+        # 头部用户：排名越靠前的用户会话越多 (前几百名用户拥有大量历史)
+        return min(int((rng.paretovariate(1.2) - 1) * 10), n_users - 1)
+    return rng.randrange(n_users)
+
+
+async def run(args: argparse.Namespace) -> None:
+    # 应用模块在导入时读取 DATABASE_URL，必须在设置之后再导入
+    from sqlalchemy import func, select
+
+    from app.core.clock import utc_now
+    from app.core.config import settings
+    from app.db.base_class import Base
+    from app.db.session import AsyncSessionLocal, engine
+    from app.models.models import TestSession, TestSessionDimension, UserAnswer
+    from app.services import test_service
+    from app.services.session_codec import pack_answers, pack_dimensions
+    from app.services.session_service import score_submission
+    from app.services.distribution_service import rebuild_score_distributions
+    from app.services.stats_service import rebuild_test_stats
+    from app.services.test_runtime import get_test_runtime
+    from benchmarks.scales import build_scale_test
+
+    rng = random.Random(args.seed)
+
+    if args.create_schema:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    # 1. 测试：每种量表 tests_per_scale 个 (已存在的 test_type 直接复用)
+    runtimes = []
+    weights = []
+    options_by_test = {}
+    async with AsyncSessionLocal() as db:
+        for scale, weight in SCALE_WEIGHTS.items():
+            for i in range(args.tests_per_scale):
+                suffix = f"-{i}" if i else ""
+                test_type = f"{scale}{suffix}"
+                full = await test_service.get_test_by_type(db, test_type, include_scores=True)
+                if full is None:
+                    await test_service.create_test(db, build_scale_test(scale, suffix))
+                    await db.commit()
+                    full = await test_service.get_test_by_type(db, test_type, include_scores=True)
+                runtime = await get_test_runtime(db, full.id)
+                runtimes.append(runtime)
+                weights.append(weight / args.tests_per_scale)
+                options_by_test[full.id] = [(q.id, [o.id for o in q.options]) for q in full.questions]
+        next_id = (await db.execute(select(func.max(TestSession.id)))).scalar() or 0
+
+    # 2. 会话：显式分配主键，会话头 / 答案 / 维度都用 Core 层的多行 INSERT (绕过 ORM)，每批一个事务
+    compact = settings.SESSION_STORAGE_COMPACT
+    now = utc_now()
+    span_seconds = args.days * 86400
+    started = time.perf_counter()
+    written = 0
+    while written < args.sessions:
+        batch = min(args.batch_size, args.sessions - written)
+        session_rows: List[dict] = []
+        answer_rows: List[dict] = []
+        dimension_rows: List[dict] = []
+        for runtime in rng.choices(runtimes, weights=weights, k=batch):
+            next_id += 1
+            questions = options_by_test[runtime.test_id]
+            submission = _Submission(
+                user_id=user_id_for(pick_user_rank(rng, args.users)),
+                answers=[_Answer(q_id, rng.choice(opts)) for q_id, opts in questions],
+            )
+            scored = score_submission(runtime, submission)
+            row = {
+                "id": next_id,
+                "user_id": scored.user_id,
+                "test_id": scored.test_id,
+                "result": scored.result,
+                "total_score": scored.total_score,
+                "created_at": now - timedelta(seconds=rng.randrange(span_seconds)),
+            }
+            if compact:
+                row["answers_packed"] = pack_answers(scored.answers)
+                row["dimensions_packed"] = pack_dimensions(scored.dimensions)
+            else:
+                answer_rows.extend(
+                    {"session_id": next_id, "question_id": q_id, "selected_option_id": opt_id}
+                    for q_id, opt_id in scored.answers
+                )
+                dimension_rows.extend(
+                    {"session_id": next_id, "dimension_code": code, "score": score, "result_range": text}
+                    for code, score, text in scored.dimensions
+                )
+            session_rows.append(row)
+
+        async with engine.begin() as conn:
+            await conn.execute(TestSession.__table__.insert(), session_rows)
+            if answer_rows:
+                await conn.execute(UserAnswer.__table__.insert(), answer_rows)
+            if dimension_rows:
+                await conn.execute(TestSessionDimension.__table__.insert(), dimension_rows)
+
+        written += batch
+        elapsed = time.perf_counter() - started
+        print(f"{written}/{args.sessions} sessions ({written / elapsed:,.0f}/s)")
+
+    # 3. 重建 test_stats 计数与得分分布 (造数时没有逐条维护)
+    async with AsyncSessionLocal() as db:
+        await rebuild_test_stats(db)
+        await rebuild_score_distributions(db)
+        await db.commit()
+
+    await engine.dispose()
+    print(f"done: {written} sessions in {time.perf_counter() - started:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", required=True)
+    parser.add_argument("--create-schema", action="store_true", help="直接按模型建表 (SQLite 等不跑 alembic 的场景)")
+    parser.add_argument("--sessions", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=200_000)
+    parser.add_argument("--tests-per-scale", type=int, default=1)
+    parser.add_argument("--days", type=int, default=365, help="会话时间分布在最近多少天内")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+import os
+
+# 单元测试不连接真实数据库：在导入 app 之前指定内存 SQLite (环境变量优先于 .env)
+os.environ.setdefault("DATABASE_URL", "sqlite+aiosqlite://")
@@ -0,0 +1,30 @@
+from fastapi import Depends, FastAPI
+from fastapi.testclient import TestClient
+
+from app.core import admin
+from app.core.admin import require_admin
+
+
+def make_client() -> TestClient:
+    app = FastAPI()
+
+    @app.get("/ops", dependencies=[Depends(require_admin)])
+    async def ops():
+        return {"ok": True}
+
+    return TestClient(app)
+
+
+def test_admin_routes_disabled_without_token(monkeypatch):
+    monkeypatch.setattr(admin.settings, "ADMIN_TOKEN", "")
+    client = make_client()
+    assert client.get("/ops").status_code == 404
+    assert client.get("/ops", headers={"X-Admin-Token": ""}).status_code == 404
+
+
+def test_admin_token_required(monkeypatch):
+    monkeypatch.setattr(admin.settings, "ADMIN_TOKEN", "s3cret")
+    client = make_client()
+    assert client.get("/ops").status_code == 403
+    assert client.get("/ops", headers={"X-Admin-Token": "wrong"}).status_code == 403
+    assert client.get("/ops", headers={"X-Admin-Token": "s3cret"}).json() == {"ok": True}
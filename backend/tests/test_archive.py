@@ -0,0 +1,124 @@
+import asyncio
+import gzip
+import json
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, select
+
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.models.models import ArchivedSession, Question, QuestionOption, Test, TestSession
+from app.services import session_service
+from app.services.archive_service import archive_session_batch
+from app.services.export_service import iter_session_batches
+from app.services.session_service import ScoredSession, save_scored_sessions
+
+USERS = ("archive-u0", "archive-u1")
+CUTOFF = datetime(2025, 3, 1)
+
+
+async def seed(monkeypatch):
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        test = Test(test_type="archive", title="Archive", description="d")
+        for i in range(3):
+            question = Question(text=f"q{i}", order_index=i)
+            question.options = [QuestionOption(text=f"o{s}", score=s) for s in range(3)]
+            test.questions.append(question)
+        db.add(test)
+        await db.commit()
+        options = [[o.id for o in q.options] for q in test.questions]
+        questions = [q.id for q in test.questions]
+
+        rng = random.Random(5)
+        start = datetime(2025, 1, 10)
+        # 1-2 月的会话早于 cutoff，之后的留在热表；逐行存储与紧凑存储交替
+        for day in range(0, 120, 6):
+            monkeypatch.setattr(settings, "SESSION_STORAGE_COMPACT", day % 12 == 0)
+            await save_scored_sessions(db, [
+                ScoredSession(
+                    user_id, test.id, "r", rng.randint(0, 6), start + timedelta(days=day),
+                    [(q, rng.choice(opts)) for q, opts in zip(questions, options)],
+                    [("A", rng.randint(0, 3), "a")],
+                )
+                for user_id in USERS
+            ])
+            await db.commit()
+        return test.id
+
+
+def strip_answer_ids(session):
+    # 归档记录中没有答案行 ID
+    return {**session, "answers": [{**a, "id": None} for a in session["answers"]]}
+
+
+async def snapshot(test_id, ids):
+    async with AsyncSessionLocal() as db:
+        sessions = [strip_answer_ids(await session_service.get_session(db, i, as_dict=True)) for i in ids]
+        history = {}
+        for user_id in USERS:
+            items, cursor = [], None
+            while True:
+                page = await session_service.get_user_sessions(
+                    db, user_id, limit=4, cursor=cursor, include_answers=True, as_dict=True
+                )
+                items += [strip_answer_ids(item) for item in page["items"]]
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            history[user_id] = items
+    exported = [record async for batch in iter_session_batches(test_id, batch_size=7) for record in batch]
+    return sessions, history, exported
+
+
+async def remove_archived(test_id):
+    # 内存数据库在测试之间共享：归档索引指向的临时目录随本测试删除
+    async with AsyncSessionLocal() as db:
+        await db.execute(delete(ArchivedSession).where(ArchivedSession.test_id == test_id))
+        await db.commit()
+
+
+def test_archive_round_trip_and_merge(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "ARCHIVE_DIR", str(tmp_path))
+
+    async def run():
+        test_id = await seed(monkeypatch)
+        async with AsyncSessionLocal() as db:
+            ids = (await db.scalars(
+                select(TestSession.id).where(TestSession.test_id == test_id).order_by(TestSession.id)
+            )).all()
+        before = await snapshot(test_id, ids)
+        archived, after_id = 0, 0
+        try:
+            async with AsyncSessionLocal() as db:
+                while True:
+                    count, after_id = await archive_session_batch(db, CUTOFF, after_id, batch_size=5)
+                    await db.commit()
+                    if not count:
+                        break
+                    archived += count
+                hot = await db.scalar(select(func.count()).where(TestSession.test_id == test_id))
+            return ids, before, await snapshot(test_id, ids), archived, hot
+        finally:
+            await remove_archived(test_id)
+
+    ids, before, after, archived, hot = asyncio.run(run())
+    sessions, history, exported = before
+    old_ids = [s["id"] for s in sessions if s["created_at"] < CUTOFF]
+    assert archived == len(old_ids) == 18 and hot == len(ids) - archived
+
+    # 单个会话、用户历史 (热表与归档合并分页) 与导出的内容都不变
+    assert after == before
+    assert [[s["created_at"] for s in history[u]] == sorted((s["created_at"] for s in history[u]), reverse=True)
+            for u in USERS] == [True, True]
+
+    # 按月份分文件，多个 gzip 成员拼接后仍可直接解压
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["sessions-2025-01.ndjson.gz", "sessions-2025-02.ndjson.gz"]
+    in_files = []
+    for path in sorted(tmp_path.iterdir()):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            in_files += [json.loads(line)["id"] for line in f]
+    assert sorted(in_files) == old_ids
@@ -0,0 +1,88 @@
+import asyncio
+import random
+
+from app.core.clock import utc_now
+from app.core.config import settings
+from app.db.base_class import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.models.models import Test
+from app.services.compact_storage import pack_session_batch
+from app.services.distribution_service import (
+    TOTAL_DIMENSION, ScoreHistogram, get_histograms, rebuild_score_distributions
+)
+from app.services.session_service import ScoredSession, save_scored_sessions
+
+
+def brute_force_rank(scores, score):
+    below = sum(1 for s in scores if s < score)
+    equal = sum(1 for s in scores if s == score)
+    return round((below + equal / 2) / len(scores) * 100, 2)
+
+
+def histogram_of(scores):
+    return ScoreHistogram(sorted((s, scores.count(s)) for s in set(scores)))
+
+
+def test_percentile_rank_matches_brute_force():
+    rng = random.Random(7)
+    for _ in range(50):
+        scores = [rng.randint(0, 20) for _ in range(rng.randint(1, 60))]
+        histogram = histogram_of(scores)
+        assert histogram.total == len(scores)
+        assert histogram.mean == sum(scores) / len(scores)
+        # 包括未出现过的分值和超出范围的分值
+        for score in range(-2, 23):
+            assert histogram.percentile_rank(score) == brute_force_rank(scores, score)
+
+
+def test_percentile_rank_edges():
+    assert ScoreHistogram([]).percentile_rank(5) is None
+    assert ScoreHistogram([]).mean is None
+    histogram = ScoreHistogram([(10, 4)])
+    assert histogram.percentile_rank(10) == 50.0
+    assert histogram.percentile_rank(9) == 0.0
+    assert histogram.percentile_rank(11) == 100.0
+
+
+def test_incremental_histograms_match_rebuild(monkeypatch):
+    rng = random.Random(3)
+
+    async def histograms(db, test_id):
+        return {code: h.buckets for code, h in (await get_histograms(db, test_id)).items()}
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            test = Test(test_type="distribution", title="Distribution", description="d")
+            db.add(test)
+            await db.commit()
+            # 逐行存储与紧凑存储混合
+            for compact in (False, True):
+                monkeypatch.setattr(settings, "SESSION_STORAGE_COMPACT", compact)
+                await save_scored_sessions(db, [
+                    ScoredSession(
+                        f"u{i}", test.id, "r", rng.randint(0, 10), utc_now(), [],
+                        [("A", rng.randint(0, 5), "a"), ("B", rng.randint(0, 5), "b")],
+                    )
+                    for i in range(20)
+                ])
+                await db.commit()
+            incremental = await histograms(db, test.id)
+
+            await rebuild_score_distributions(db)
+            await db.commit()
+            rebuilt = await histograms(db, test.id)
+
+            # 以 --keep-rows 打包后重建：保留下来的维度行不重复计数
+            monkeypatch.setattr(settings, "SESSION_STORAGE_COMPACT", False)
+            await pack_session_batch(db, 0, 1000, True)
+            await db.commit()
+            await rebuild_score_distributions(db)
+            await db.commit()
+            return test.id, incremental, rebuilt, await histograms(db, test.id)
+
+    _, incremental, rebuilt, after_pack = asyncio.run(run())
+    assert set(incremental) == {TOTAL_DIMENSION, "A", "B"}
+    assert sum(n for _, n in incremental[TOTAL_DIMENSION]) == 40
+    assert incremental == rebuilt == after_pack
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+from app.api import endpoints
+from app.db.base_class import Base
+from app.db.session import engine
+from app.models import models  # noqa: F401
+from app.services import export_service
+
+
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+
+
+async def export(fmt="csv"):
+    # 直接调用路由函数 (跳过管理令牌依赖)
+    return await endpoints.export_sessions(
+        fmt=fmt, test_id=None, created_from=None, created_to=None, gzip=False, include_archived=False
+    )
+
+
+def test_export_slot_held_only_while_streaming(monkeypatch):
+    monkeypatch.setattr(export_service, "export_slots", asyncio.Semaphore(1))
+    slots = export_service.export_slots
+
+    async def run():
+        await create_tables()
+        # 响应体从未开始迭代 (如客户端在发送响应头前断开)：不占用名额
+        for _ in range(3):
+            await export()
+        assert not slots.locked()
+
+        body = (await export()).body_iterator
+        assert (await body.__anext__()).startswith(b"id,user_id")
+        assert slots.locked()
+        with pytest.raises(HTTPException) as e:
+            await export()
+        assert e.value.status_code == 503
+
+        async for _ in body:
+            pass
+        assert not slots.locked()
+
+    asyncio.run(run())
+
+
+def test_export_slot_released_when_client_disconnects(monkeypatch):
+    monkeypatch.setattr(export_service, "export_slots", asyncio.Semaphore(1))
+
+    async def run():
+        await create_tables()
+        body = (await export()).body_iterator
+        await body.__anext__()
+        # 输出中途断开：服务器关闭生成器
+        await body.aclose()
+        return export_service.export_slots.locked()
+
+    assert asyncio.run(run()) is False
@@ -0,0 +1,24 @@
+from datetime import datetime, timezone
+
+import pytest
+
+from app.core import fast_json
+from app.services.session_service import ScoredSession, build_session_schema, scored_session_dict
+
+SESSIONS = [
+    (None, ScoredSession("u", 1, "r", 3, datetime(2026, 1, 1, 8, 30), [(1, 2), (2, 5)], []), None),
+    (7, ScoredSession("用户", 2, "内向型 “I”", -4, datetime(2026, 1, 1, 8, 30, 0, 123),
+                      [(1, 2)], [("E", 3, "外向"), ("I", 0, "")]), [11]),
+    (8, ScoredSession("u", 3, "r", 0, datetime(2026, 1, 1, tzinfo=timezone.utc), [], [("A", 1, "a")]), None),
+]
+
+
+@pytest.mark.parametrize("use_orjson", [True, False])
+def test_fast_dict_matches_pydantic_json(monkeypatch, use_orjson):
+    if not use_orjson:
+        monkeypatch.setattr(fast_json, "orjson", None)
+    elif fast_json.orjson is None:
+        pytest.skip("orjson not installed")
+    for session_id, scored, answer_ids in SESSIONS:
+        expected = build_session_schema(session_id, scored, answer_ids).model_dump_json().encode("utf-8")
+        assert fast_json.dumps(scored_session_dict(session_id, scored, answer_ids)) == expected
@@ -0,0 +1,54 @@
+import gzip
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.http_cache import EncodedPayload, encoded_json_response
+
+BODY = b'{"test_type":"mbti","questions":[]}'
+
+
+def make_client(payload: EncodedPayload) -> TestClient:
+    app = FastAPI()
+
+    @app.get("/payload")
+    async def read(request: Request):
+        return encoded_json_response(request, payload)
+
+    return TestClient(app)
+
+
+def test_precompressed_body_selected_by_accept_encoding():
+    payload = EncodedPayload(BODY)
+    assert gzip.decompress(payload.bodies["gzip"]) == BODY
+    assert payload.select_encoding("gzip, deflate") == "gzip"
+    assert payload.select_encoding("gzip;q=0, identity") == "identity"
+    assert payload.select_encoding(None) == "identity"
+
+    client = make_client(payload)
+    response = client.get("/payload", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == payload.etags["gzip"]
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.content == BODY
+
+
+def test_if_none_match_returns_304():
+    payload = EncodedPayload(BODY)
+    client = make_client(payload)
+    etag = client.get("/payload", headers={"Accept-Encoding": "identity"}).headers["etag"]
+
+    response = client.get("/payload", headers={"Accept-Encoding": "identity", "If-None-Match": etag})
+    assert response.status_code == 304 and response.content == b""
+    assert response.headers["etag"] == etag
+    # 弱比较：其它编码版本的 ETag、W/ 前缀和列表中的任一项都命中
+    for header in (payload.etags["gzip"], f"W/{etag}", f'"other", {etag}', "*"):
+        assert client.get("/payload", headers={"If-None-Match": header}).status_code == 304
+
+
+def test_changed_body_gets_new_etag():
+    old, new = EncodedPayload(BODY), EncodedPayload(BODY.replace(b"mbti", b"disc"))
+    assert old.etags["identity"] != new.etags["identity"]
+    client = make_client(new)
+    assert client.get("/payload", headers={"If-None-Match": old.etags["identity"]}).status_code == 200
@@ -0,0 +1,116 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.schemas import schemas
+from app.services.import_service import ImportConflict, _diff_test
+
+
+def make_test_in(questions, results=(), title="T", description="d", scoring_spec=None):
+    """
+    questions: [(order_index, text, [(选项文本, 分数), ...])]
+    """
+    return schemas.TestCreate(
+        test_type="t", title=title, description=description, scoring_spec=scoring_spec,
+        questions=[
+            schemas.QuestionCreate(
+                order_index=order_index, text=text,
+                options=[schemas.QuestionOptionCreate(text=o, score=s) for o, s in options],
+            )
+            for order_index, text, options in questions
+        ],
+        results=[schemas.TestResultCreate(**r) for r in results],
+    )
+
+
+def make_current(test_in: schemas.TestCreate, has_sessions=False):
+    # 与 _load_existing 的结构一致；题目 ID = order_index * 100，选项 ID = 题目 ID + 位置
+    questions = {
+        q.order_index: {
+            "row": SimpleNamespace(id=q.order_index * 100, text=q.text, order_index=q.order_index),
+            "options": [
+                SimpleNamespace(id=q.order_index * 100 + position, text=o.text, score=o.score)
+                for position, o in enumerate(q.options)
+            ],
+        }
+        for q in test_in.questions
+    }
+    return {
+        "row": SimpleNamespace(title=test_in.title, description=test_in.description, scoring_spec=test_in.scoring_spec),
+        "questions": questions,
+        "results": [SimpleNamespace(**r.model_dump()) for r in test_in.results],
+        "has_sessions": has_sessions,
+    }
+
+
+QUESTIONS = [
+    (1, "q1", [("a", 1), ("b", 2)]),
+    (2, "q2", [("a", 1), ("b", 2)]),
+]
+RESULTS = [
+    {"min_score": 0, "max_score": 2, "result_range": "低"},
+    {"min_score": 3, "max_score": None, "result_range": "高", "description": "说明"},
+]
+
+
+def test_unchanged():
+    test_in = make_test_in(QUESTIONS, RESULTS)
+    diff = _diff_test(make_current(test_in), test_in)
+    assert diff.changes == 0
+
+
+def test_test_fields():
+    current = make_current(make_test_in(QUESTIONS, RESULTS))
+    diff = _diff_test(current, make_test_in(QUESTIONS, RESULTS, title="T2", scoring_spec={"dimensions": {"A": [1]}}))
+    assert diff.test_values == {"title": "T2", "scoring_spec": {"dimensions": {"A": [1]}}}
+    assert diff.changes == 1
+
+
+def test_question_and_option_updates():
+    current = make_current(make_test_in(QUESTIONS, RESULTS))
+    test_in = make_test_in([
+        (1, "q1 改", [("a", 1), ("b", 3), ("c", 4)]),
+        (2, "q2", [("a", 1), ("b", 2)]),
+        (3, "q3", [("a", 1)]),
+    ], RESULTS)
+    diff = _diff_test(current, test_in)
+    assert diff.question_updates == [{"id": 100, "text": "q1 改"}]
+    assert diff.option_updates == [{"id": 101, "text": "b", "score": 3}]
+    assert diff.new_options == [{"question_id": 100, "text": "c", "score": 4}]
+    assert [q.order_index for q in diff.new_questions] == [3]
+    assert diff.removed_question_ids == [] and diff.removed_option_ids == []
+    assert not diff.replace_results
+    assert diff.changes == 4
+
+
+def test_removals_without_sessions():
+    current = make_current(make_test_in(QUESTIONS, RESULTS))
+    diff = _diff_test(current, make_test_in([(1, "q1", [("a", 1)])], RESULTS))
+    assert diff.removed_option_ids == [101]
+    assert diff.removed_question_ids == [200]
+
+
+@pytest.mark.parametrize("questions", [
+    [(1, "q1", [("a", 1)]), (2, "q2", [("a", 1), ("b", 2)])],   # 删除选项
+    [(1, "q1", [("a", 1), ("b", 2)])],                          # 删除题目
+])
+def test_removals_rejected_when_test_has_sessions(questions):
+    current = make_current(make_test_in(QUESTIONS, RESULTS), has_sessions=True)
+    with pytest.raises(ImportConflict):
+        _diff_test(current, make_test_in(questions, RESULTS))
+
+
+def test_additions_allowed_when_test_has_sessions():
+    current = make_current(make_test_in(QUESTIONS, RESULTS), has_sessions=True)
+    diff = _diff_test(current, make_test_in(QUESTIONS + [(3, "q3", [("a", 1)])], RESULTS))
+    assert [q.order_index for q in diff.new_questions] == [3]
+
+
+def test_results_compared_as_a_set():
+    current = make_current(make_test_in(QUESTIONS, RESULTS))
+    assert not _diff_test(current, make_test_in(QUESTIONS, list(reversed(RESULTS)))).replace_results
+
+    changed = [dict(RESULTS[0]), dict(RESULTS[1], description="新说明")]
+    diff = _diff_test(current, make_test_in(QUESTIONS, changed))
+    assert diff.replace_results
+    assert diff.changes == 1
@@ -0,0 +1,84 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.models.models import UserAnswer
+from app.services import session_service
+
+
+class FakeMySQLSession:
+    """
+    模拟 MySQL：没有 RETURNING，多行 INSERT 的 lastrowid 为本条语句第一行的 ID
+    """
+
+    def __init__(self, next_id: int, step: int):
+        self.next_id = next_id
+        self.step = step
+        self.statements = []
+        self.step_queries = 0
+        self.info = {}
+
+    def get_bind(self):
+        return SimpleNamespace(dialect=SimpleNamespace(
+            name="mysql", insert_executemany_returning_sort_by_parameter_order=False
+        ))
+
+    async def connection(self):
+        return self
+
+    async def scalar(self, statement):
+        self.step_queries += 1
+        return self.step
+
+    async def execute(self, statement):
+        rows = len(statement._multi_values[0])
+        self.statements.append(rows)
+        first = self.next_id
+        # 其它会话的并发插入只会出现在本条语句分配的区间之外
+        self.next_id += rows * self.step + 7
+        return SimpleNamespace(lastrowid=first)
+
+
+def test_mysql_multi_row_insert_recovers_ids(monkeypatch):
+    monkeypatch.setattr(session_service, "_INSERT_CHUNK_ROWS", 4)
+    db = FakeMySQLSession(next_id=100, step=2)
+    rows = [{"session_id": 1, "question_id": i, "selected_option_id": i} for i in range(10)]
+
+    ids = asyncio.run(session_service._insert_returning_ids(db, UserAnswer, rows))
+
+    assert db.statements == [4, 4, 2]
+    assert ids == [100, 102, 104, 106, 115, 117, 119, 121, 130, 132]
+    # auto_increment_increment 每个连接只查询一次
+    asyncio.run(session_service._insert_returning_ids(db, UserAnswer, rows[:1]))
+    assert db.step_queries == 1
+
+
+def test_empty_insert_is_a_no_op():
+    db = FakeMySQLSession(next_id=1, step=1)
+    assert asyncio.run(session_service._insert_returning_ids(db, UserAnswer, [])) == []
+    assert db.statements == []
+
+
+def test_sqlite_multi_row_insert_ids(monkeypatch):
+    from sqlalchemy import select
+    from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+
+    monkeypatch.setattr(session_service, "_INSERT_CHUNK_ROWS", 4)
+
+    async def run():
+        engine = create_async_engine("sqlite+aiosqlite://")
+        async with engine.begin() as conn:
+            await conn.run_sync(UserAnswer.__table__.create)
+        async with AsyncSession(engine) as db:
+            first = [{"session_id": 1, "question_id": i, "selected_option_id": i} for i in range(3)]
+            rows = [{"session_id": 2, "question_id": i, "selected_option_id": 100 + i} for i in range(10)]
+            await session_service._insert_returning_ids(db, UserAnswer, first)
+            ids = await session_service._insert_returning_ids(db, UserAnswer, rows)
+            stored = (await db.execute(
+                select(UserAnswer.id, UserAnswer.selected_option_id).where(UserAnswer.session_id == 2)
+            )).all()
+        await engine.dispose()
+        return ids, dict(stored)
+
+    ids, stored = asyncio.run(run())
+    assert ids == list(range(4, 14))
+    assert [stored[i] for i in ids] == [100 + i for i in range(10)]
@@ -0,0 +1,89 @@
+import asyncio
+import sqlite3
+
+import pytest
+
+from app.core.rate_limit import MemoryBackend, RouteCosts, SQLiteBackend, TokenBucketLimiter
+
+
+def test_memory_limiter_rejects_after_burst():
+    limiter = TokenBucketLimiter(MemoryBackend(), "3/minute")
+
+    async def run():
+        return [await limiter.hit("ip") for _ in range(4)]
+
+    results = asyncio.run(run())
+    assert [allowed for allowed, _ in results] == [True, True, True, False]
+    assert results[-1][1] == pytest.approx(20.0, rel=0.01)
+
+
+def test_route_costs_prefer_fixed_paths():
+    costs = RouteCosts({
+        "GET /api/v1/tests/{test_type}": 0.25,
+        "GET /api/v1/tests/popular": 0.5,
+        "POST /api/v1/tests/{test_id}/submit": 10,
+    }, default_cost=1.0)
+
+    def cost(method, path):
+        return costs.resolve({"method": method, "path": path})
+
+    assert cost("GET", "/api/v1/tests/popular") == 0.5
+    assert cost("GET", "/api/v1/tests/mbti") == 0.25
+    assert cost("POST", "/api/v1/tests/3/submit") == 10
+    # 方法不同或路径不匹配时使用默认开销
+    assert cost("POST", "/api/v1/tests/mbti") == 1.0
+    assert cost("GET", "/api/v1/tests/3/submit/extra") == 1.0
+    with pytest.raises(ValueError):
+        RouteCosts({"GET tests": 1})
+
+
+def test_expensive_request_goes_into_debt():
+    limiter = TokenBucketLimiter(MemoryBackend(), "120/minute")
+
+    async def run():
+        # 超过整个桶的请求在桶满时放行，之后需要等透支部分恢复
+        first = await limiter.hit("ip", cost=150)
+        second = await limiter.hit("ip", cost=0.25)
+        return first, second
+
+    first, (allowed, retry_after) = asyncio.run(run())
+    assert first == (True, 0.0)
+    assert not allowed and retry_after == pytest.approx(15.0, rel=0.02)
+
+
+def test_sqlite_backend_fails_open_when_locked(tmp_path):
+    path = tmp_path / "ratelimit.sqlite3"
+    backend = SQLiteBackend(f"sqlite:///{path}")
+    limiter = TokenBucketLimiter(backend, "3/minute")
+    # 其它进程持有写锁：BEGIN IMMEDIATE 等锁超时，没有打开的事务
+    other = sqlite3.connect(path, isolation_level=None)
+    other.execute("BEGIN IMMEDIATE")
+    try:
+        assert asyncio.run(limiter.hit("ip")) == (True, 0.0)
+    finally:
+        other.execute("ROLLBACK")
+        other.close()
+    assert limiter.errors == 1
+    assert asyncio.run(limiter.hit("ip"))[0]
+    backend.close()
+
+
+def test_sqlite_backend_requires_absolute_path():
+    with pytest.raises(ValueError):
+        SQLiteBackend("sqlite:///ratelimit.sqlite3")
+
+
+def test_default_storage_is_shared_and_absolute():
+    from app.core.config import Settings
+
+    # 默认是绝对路径的 SQLite 文件 (不依赖工作目录)，所有 worker 共享
+    assert Settings().RATE_LIMIT_STORAGE_URI.startswith("sqlite:////")
+    assert SQLiteBackend.shared and not MemoryBackend.shared
+
+
+def test_per_process_storage_warns_with_several_workers(caplog):
+    from app.core.rate_limit import warn_if_not_shared
+
+    assert not warn_if_not_shared(MemoryBackend(), 1)
+    assert warn_if_not_shared(MemoryBackend(), 4)
+    assert "4x the configured limit" in caplog.text
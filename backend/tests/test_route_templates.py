@@ -0,0 +1,55 @@
+from fastapi import APIRouter, FastAPI
+
+from app.core.metrics import RouteTemplates, method_label
+
+
+def make_app() -> FastAPI:
+    router = APIRouter()
+
+    @router.get("/tests/popular")
+    async def popular():
+        return []
+
+    @router.get("/tests/{test_type}")
+    async def get_test(test_type: str):
+        return {}
+
+    app = FastAPI()
+    app.include_router(router, prefix="/api/v1")
+    return app
+
+
+def scope(app, method, path, route=None):
+    s = {"type": "http", "app": app, "method": method, "path": path}
+    if route is not None:
+        s["route"] = route
+    return s
+
+
+def test_unrouted_requests_resolve_to_templates():
+    app = make_app()
+    templates = RouteTemplates()
+    # 在路由之前返回的请求 (如被限流)
+    assert templates.resolve(scope(app, "GET", "/api/v1/tests/mbti")) == "/api/v1/tests/{test_type}"
+    assert templates.resolve(scope(app, "GET", "/api/v1/tests/popular")) == "/api/v1/tests/popular"
+    # 方法不匹配 (405) 仍归到该模板；没有路由匹配时为 None
+    assert templates.resolve(scope(app, "DELETE", "/api/v1/tests/mbti")) == "/api/v1/tests/{test_type}"
+    assert templates.resolve(scope(app, "GET", "/nope")) is None
+
+
+def test_routed_request_uses_own_template():
+    app = make_app()
+    templates = RouteTemplates()
+
+    class Route:
+        path = "/tests/{test_type}"
+
+    # 同一路径同时匹配两个模板时，取以已路由的路由模板结尾的那个
+    route = Route()
+    assert templates.resolve(scope(app, "GET", "/api/v1/tests/popular", route)) == "/api/v1/tests/{test_type}"
+    assert templates.resolve(scope(app, "GET", "/api/v1/tests/mbti", route)) == "/api/v1/tests/{test_type}"
+
+
+def test_method_label_is_bounded():
+    assert method_label({"method": "PATCH"}) == "PATCH"
+    assert method_label({"method": "FOOBAR"}) == "OTHER"
@@ -0,0 +1,89 @@
+import random
+from types import SimpleNamespace
+
+from app.services.rule_index import RuleIndex, format_rule, validate_rules
+
+
+def rule(min_score, max_score, result_range, dimension_code=None, description=None):
+    return SimpleNamespace(
+        min_score=min_score, max_score=max_score, result_range=result_range,
+        dimension_code=dimension_code, description=description,
+    )
+
+
+def linear_match(rules, dimension_code, score):
+    # 原先逐条扫描的语义：按写入顺序第一条命中的规则
+    for r in rules:
+        if r.dimension_code == dimension_code and r.min_score <= score and (r.max_score is None or r.max_score >= score):
+            return format_rule(r)
+    return None
+
+
+def test_match_ranges_and_gaps():
+    index = RuleIndex([rule(0, 9, "低"), rule(10, 19, "中", description="说明"), rule(30, None, "高")])
+    assert index.match(None, -1) is None
+    assert index.match(None, 0) == "低"
+    assert index.match(None, 9) == "低"
+    assert index.match(None, 10) == "中<SEP>说明"
+    assert index.match(None, 19) == "中<SEP>说明"
+    # 20-29 没有规则
+    assert index.match(None, 20) is None
+    assert index.match(None, 29) is None
+    # 没有上限
+    assert index.match(None, 30) == "高"
+    assert index.match(None, 10 ** 6) == "高"
+
+
+def test_dimensions_are_separate():
+    index = RuleIndex([rule(0, 10, "总分"), rule(0, 10, "HR 低", "HR")])
+    assert index.match(None, 5) == "总分"
+    assert index.match("HR", 5) == "HR 低"
+    assert index.match("PA", 5) is None
+
+
+def test_overlapping_rules_keep_first_match():
+    index = RuleIndex([rule(5, 15, "A"), rule(0, 20, "B"), rule(10, 12, "C")])
+    assert [index.match(None, s) for s in (0, 4, 5, 12, 15, 16, 20, 21)] == ["B", "B", "A", "A", "A", "B", "B", None]
+
+
+def test_exact_match_keeps_first_rule():
+    index = RuleIndex([rule(1111, 1111, "ESFP"), rule(1111, 1111, "dup"), rule(2222, 2222, "INTJ")])
+    assert index.match(None, 1111, exact=True) == "ESFP"
+    assert index.match(None, 2222, exact=True) == "INTJ"
+    assert index.match(None, 1112, exact=True) is None
+    # 精确匹配不看区间
+    assert index.match(None, 1500, exact=True) is None
+
+
+def test_random_rules_match_linear_scan():
+    rng = random.Random(7)
+    for _ in range(200):
+        rules = []
+        for n in range(rng.randint(0, 6)):
+            lo = rng.randint(-5, 40)
+            rules.append(rule(
+                lo, None if rng.random() < 0.2 else lo + rng.randint(-2, 20), f"r{n}",
+                dimension_code=rng.choice([None, "A"]), description=rng.choice([None, "", "d"]),
+            ))
+        index = RuleIndex(rules)
+        for code in (None, "A"):
+            for score in range(-10, 70):
+                assert index.match(code, score) == linear_match(rules, code, score)
+
+
+def test_validate_rules_reports_gaps_and_overlaps():
+    assert validate_rules([rule(0, 9, "低"), rule(10, 19, "中"), rule(20, None, "高")]) == []
+
+    problems = validate_rules([rule(0, 9, "低"), rule(12, 19, "中"), rule(15, 30, "高"), rule(0, 5, "HR", "HR")])
+    assert problems == [
+        "[total] gap between 9 and 12",
+        "[total] '中' overlaps '高' at 15",
+    ]
+
+    assert validate_rules([rule(0, None, "a"), rule(10, 20, "b")]) == ["[total] 'a' overlaps 'b' at 10"]
+    assert validate_rules([rule(10, 5, "x", "HR")]) == ["[HR] empty range 10-5"]
+
+
+def test_validate_rules_exact_only_checks_duplicates():
+    rules = [rule(1111, 1111, "ESFP"), rule(2222, 2222, "INTJ"), rule(1111, 1111, "dup")]
+    assert validate_rules(rules, exact=True) == ["[total] duplicate rule for score 1111"]
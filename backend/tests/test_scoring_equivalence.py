@@ -0,0 +1,242 @@
+"""
+声明式计分引擎与原先按 test_type 分支计分的实现逐条对比。
+
+下面的 _legacy_* 按原 session_service 中的计分函数改写为纯函数 (计分地图原样保留，
+规则查询改为按写入顺序取第一条命中的规则，与原先 SELECT ... first() 相同)，
+随机生成测试定义 (含重叠 / 有空隙的规则) 和提交，比较总分、结果文本和维度行。
+"""
+import random
+from types import SimpleNamespace
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import pytest
+from fastapi import HTTPException
+
+from app.schemas import schemas
+from app.services.rule_index import RuleIndex
+from app.services.scoring import compile_scoring_spec, resolve_scoring_spec
+from app.services.session_service import score_submission
+from app.services import test_runtime
+from app.services.test_runtime import OptionInfo
+
+# ---------------------------------------------------------------
+# 原实现 (计分地图与分支逻辑)
+# ---------------------------------------------------------------
+HPLP_DIMENSION_MAP: Dict[int, str] = {
+    1: "HR", 6: "HR", 12: "HR", 14: "HR", 19: "HR", 24: "HR", 28: "HR", 32: "HR", 35: "HR", 38: "HR", 40: "HR",
+    2: "PA", 8: "PA", 15: "PA", 21: "PA", 26: "PA", 31: "PA", 37: "PA", 39: "PA",
+    3: "N", 9: "N", 16: "N", 22: "N", 27: "N", 34: "N",
+    4: "IR", 10: "IR", 17: "IR", 23: "IR", 30: "IR",
+    5: "SM", 11: "SM", 18: "SM", 25: "SM", 33: "SM",
+    7: "SG", 13: "SG", 20: "SG", 29: "SG", 36: "SG",
+}
+
+MPS_DIMENSION_MAP: Dict[int, List[str]] = {
+    2: ["SOP", "HST"], 4: ["SOP", "HST"], 14: ["SOP", "HST"], 15: ["SOP", "HST"], 26: ["SOP", "HST"],
+    10: ["OOP", "HST"], 11: ["OOP", "HST"], 12: ["OOP", "HST"], 19: ["OOP", "HST"], 24: ["OOP", "HST"],
+    1: ["SPP", "HST"], 6: ["SPP", "HST"], 21: ["SPP", "HST"], 25: ["SPP", "HST"], 29: ["SPP", "HST"],
+    3: ["EMO", "ADT"], 5: ["EMO", "ADT"], 7: ["EMO", "ADT"], 9: ["EMO", "ADT"], 13: ["EMO", "ADT"],
+    17: ["EMO", "ADT"], 22: ["EMO", "ADT"], 23: ["EMO", "ADT"], 28: ["EMO", "ADT"],
+    8: ["CB", "ADT"], 16: ["CB", "ADT"], 18: ["CB", "ADT"], 20: ["CB", "ADT"], 27: ["CB", "ADT"],
+}
+
+IPVS_DIMENSION_MAP: Dict[int, str] = {
+    1: "power", 2: "power", 3: "power", 4: "power",
+    5: "emotional", 6: "emotional", 7: "emotional", 8: "emotional", 9: "emotional", 10: "emotional", 11: "emotional",
+    12: "value", 13: "value", 14: "value", 15: "value",
+}
+
+DIMENSION_CODES = {
+    "hpls": ["HR", "PA", "N", "IR", "SM", "SG"],
+    "mps": ["SOP", "OOP", "SPP", "EMO", "CB", "HST", "ADT"],
+    "ipvs": ["power", "emotional", "value"],
+}
+
+
+def _legacy_text(rule) -> str:
+    return f"{rule.result_range}<SEP>{rule.description}" if rule.description else rule.result_range
+
+
+def _legacy_first(rules, code: Optional[str], score: int):
+    for rule in rules:
+        if rule.dimension_code == code and rule.min_score <= score and (rule.max_score is None or rule.max_score >= score):
+            return rule
+    return None
+
+
+def _legacy_dimensions(dim_scores: Dict[str, int], rules, fallback: str) -> List[Tuple[str, int, str]]:
+    dims = []
+    for code, score in dim_scores.items():
+        rule = _legacy_first([r for r in rules if r.dimension_code is not None], code, score)
+        dims.append((code, score, _legacy_text(rule) if rule else fallback.format(code=code, score=score)))
+    return dims
+
+
+def _legacy_mbti(options: Sequence[Tuple[int, int]]) -> Tuple[int, str]:
+    trait_map = {1: 'E', 2: 'I', 3: 'N', 4: 'S', 5: 'F', 6: 'T', 7: 'J', 8: 'P'}
+    counts = {'EI': {'E': 0, 'I': 0}, 'SN': {'S': 0, 'N': 0}, 'TF': {'T': 0, 'F': 0}, 'JP': {'J': 0, 'P': 0}}
+    for order_idx, score in options:
+        trait_letter = trait_map.get(score)
+        if not trait_letter:
+            continue
+        if 1 <= order_idx <= 7 and trait_letter in counts['EI']: counts['EI'][trait_letter] += 1
+        elif 8 <= order_idx <= 14 and trait_letter in counts['SN']: counts['SN'][trait_letter] += 1
+        elif 15 <= order_idx <= 21 and trait_letter in counts['TF']: counts['TF'][trait_letter] += 1
+        elif 22 <= order_idx <= 28 and trait_letter in counts['JP']: counts['JP'][trait_letter] += 1
+    type_code = ""
+    type_code += "I" if counts['EI']['I'] > counts['EI']['E'] else "E"
+    type_code += "N" if counts['SN']['N'] > counts['SN']['S'] else "S"
+    type_code += "T" if counts['TF']['T'] > counts['TF']['F'] else "F"
+    type_code += "J" if counts['JP']['J'] > counts['JP']['P'] else "P"
+    score_encoding = {'E': 1000, 'I': 2000, 'S': 100, 'N': 200, 'T': 10, 'F': 20, 'J': 1, 'P': 2}
+    return sum(score_encoding[letter] for letter in type_code), type_code
+
+
+def legacy_score(test_type: str, options: Sequence[Tuple[int, int]], rules) -> Tuple[int, str, List[Tuple[str, int, str]]]:
+    """
+    options: 去重后的 (题号, 选项分数)；返回 (总分, 结果文本, 维度行)
+    """
+    total_score = sum(score for _, score in options)
+    dimensions: List[Tuple[str, int, str]] = []
+    result_text = "未定义的结果"
+
+    if test_type == "mbti":
+        total_score, result_text = _legacy_mbti(options)
+        rule = next((r for r in rules if r.dimension_code is None and r.min_score == total_score), None)
+    elif test_type == "hpls":
+        dim_scores = dict.fromkeys(DIMENSION_CODES["hpls"], 0)
+        for order_index, score in options:
+            if HPLP_DIMENSION_MAP.get(order_index) in dim_scores:
+                dim_scores[HPLP_DIMENSION_MAP[order_index]] += score
+        dimensions = _legacy_dimensions(dim_scores, rules, "未找到 {code} 的规则")
+        rule = _legacy_first(rules, None, total_score)
+    elif test_type == "mps":
+        dim_scores = dict.fromkeys(DIMENSION_CODES["mps"], 0)
+        for order_index, score in options:
+            for code in MPS_DIMENSION_MAP.get(order_index, []):
+                dim_scores[code] += score
+        dimensions = _legacy_dimensions(dim_scores, rules, "分数: {score}")
+        rule = _legacy_first(rules, "HST", dim_scores["HST"])
+    elif test_type == "ipvs":
+        dim_scores = dict.fromkeys(DIMENSION_CODES["ipvs"], 0)
+        for order_index, score in options:
+            if IPVS_DIMENSION_MAP.get(order_index):
+                dim_scores[IPVS_DIMENSION_MAP[order_index]] += score
+        dimensions = _legacy_dimensions(dim_scores, rules, "分数: {score}")
+        rule = _legacy_first(rules, None, total_score)
+    else:
+        rule = _legacy_first(rules, None, total_score)
+        result_text = "未定义的结果范围"
+
+    if rule is not None:
+        result_text = _legacy_text(rule)
+    return total_score, result_text, dimensions
+
+
+# ---------------------------------------------------------------
+# 随机测试定义与提交
+# ---------------------------------------------------------------
+# test_type -> (题量, 选项分数)；"phq" 没有内置规格，走默认加总
+SHAPES = {
+    "mbti": (28, range(1, 9)),
+    "hpls": (40, range(1, 5)),
+    "mps": (29, range(1, 6)),
+    "ipvs": (15, range(0, 4)),
+    "phq": (9, range(0, 4)),
+}
+
+
+def _random_rules(rng: random.Random, code: Optional[str], hi: int) -> List[SimpleNamespace]:
+    # 随机区间：可能重叠、有空隙或不设上限
+    rules = []
+    for n in range(rng.randint(0, 4)):
+        lo = rng.randint(0, hi)
+        rules.append(SimpleNamespace(
+            dimension_code=code,
+            min_score=lo,
+            max_score=None if rng.random() < 0.2 else lo + rng.randint(0, hi // 2),
+            result_range=f"{code or 'total'}-{n}",
+            description=rng.choice([None, "", f"说明 {n}"]),
+        ))
+    return rules
+
+
+def _random_test(rng: random.Random, test_id: int, test_type: str):
+    n_questions, scores = SHAPES[test_type]
+    options: Dict[int, OptionInfo] = {}
+    questions: Dict[int, List[int]] = {}
+    for order_index in range(1, n_questions + 1):
+        question_id = test_id * 1000 + order_index
+        questions[question_id] = []
+        for score in rng.sample(list(scores), k=min(3, len(scores))):
+            option_id = question_id * 10 + len(questions[question_id])
+            options[option_id] = OptionInfo(question_id=question_id, order_index=order_index, score=score)
+            questions[question_id].append(option_id)
+
+    hi = n_questions * max(scores)
+    rules = _random_rules(rng, None, hi)
+    for code in DIMENSION_CODES.get(test_type, []):
+        rules += _random_rules(rng, code, hi)
+    if test_type == "mbti":
+        # 按类型编码精确匹配的规则，外加一条重复的编码 (保留第一条)
+        for value in rng.sample([1111, 1112, 1121, 2211, 2222, 1212, 2121, 1122], k=5) + [1111]:
+            rules.insert(rng.randint(0, len(rules)), SimpleNamespace(
+                dimension_code=None, min_score=value, max_score=value,
+                result_range=f"type-{value}", description=rng.choice([None, "类型说明"]),
+            ))
+
+    runtime = test_runtime.TestRuntime(
+        test_id=test_id,
+        test_type=test_type,
+        scoring=compile_scoring_spec(resolve_scoring_spec(test_type)),
+        rules=RuleIndex(rules),
+        options=options,
+    )
+    return runtime, questions, rules
+
+
+def _random_submission(rng: random.Random, questions: Dict[int, List[int]]) -> schemas.TestSubmission:
+    answers = [
+        schemas.UserAnswerInput(question_id=question_id, selected_option_id=rng.choice(option_ids))
+        for question_id, option_ids in questions.items()
+        if rng.random() < 0.9
+    ]
+    if answers and rng.random() < 0.2:
+        # 重复提交同一选项只计一次
+        answers.append(rng.choice(answers))
+    if not answers:
+        question_id, option_ids = next(iter(questions.items()))
+        answers = [schemas.UserAnswerInput(question_id=question_id, selected_option_id=option_ids[0])]
+    return schemas.TestSubmission(user_id="u", answers=answers)
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_engine_matches_legacy_scoring(seed):
+    rng = random.Random(seed)
+    tests = [_random_test(rng, test_id, test_type) for test_id, test_type in enumerate(SHAPES, start=1)]
+
+    for _ in range(100):
+        runtime, questions, rules = rng.choice(tests)
+        submission = _random_submission(rng, questions)
+
+        scored = score_submission(runtime, submission)
+
+        unique_option_ids = dict.fromkeys(a.selected_option_id for a in submission.answers)
+        options = [(runtime.options[o].order_index, runtime.options[o].score) for o in unique_option_ids]
+        total_score, result_text, dimensions = legacy_score(runtime.test_type, options, rules)
+
+        assert scored.total_score == total_score
+        assert scored.result == result_text
+        assert scored.dimensions == dimensions
+        assert scored.answers == [(a.question_id, a.selected_option_id) for a in submission.answers]
+
+
+def test_rejects_option_from_another_question():
+    runtime, questions, _ = _random_test(random.Random(0), 1, "phq")
+    (q1, q1_options), (q2, _) = list(questions.items())[:2]
+    submission = schemas.TestSubmission(
+        user_id="u", answers=[schemas.UserAnswerInput(question_id=q2, selected_option_id=q1_options[0])]
+    )
+    with pytest.raises(HTTPException) as excinfo:
+        score_submission(runtime, submission)
+    assert excinfo.value.status_code == 400
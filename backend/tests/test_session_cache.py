@@ -0,0 +1,47 @@
+import asyncio
+
+from sqlalchemy import text
+
+from app.core.http_cache import EncodedPayload
+from app.db.session import AsyncSessionLocal
+from app.services.session_cache import ByteBudgetLRUCache, cache_after_commit, session_result_cache
+
+
+def payload(size: int) -> EncodedPayload:
+    return EncodedPayload(b"x" * size, compress=False)
+
+
+def test_byte_budget_lru():
+    cache = ByteBudgetLRUCache(max_bytes=3 * (1000 + 256))
+    for key in (1, 2, 3):
+        cache.put(key, payload(1000))
+    assert cache.get(1) is not None  # 1 变为最近使用
+    cache.put(4, payload(1000))
+    assert cache.get(2) is None and cache.evictions == 1
+    assert cache.bytes == 3 * (1000 + 256) and len(cache) == 3
+    # 替换同一个键不重复计数；超过整个预算的条目不缓存
+    cache.put(4, payload(10))
+    assert cache.bytes == 2 * (1000 + 256) + 10 + 256
+    cache.put(5, payload(5000))
+    assert cache.get(5) is None
+
+
+def test_results_cached_only_after_commit():
+    session_result_cache.clear()
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+            cache_after_commit(db, [(901, {"id": 901})])
+            await db.rollback()
+            assert session_result_cache.get(901) is None
+
+            await db.execute(text("SELECT 1"))
+            cache_after_commit(db, [(902, {"id": 902})])
+            assert session_result_cache.get(902) is None
+            await db.commit()
+            return session_result_cache.get(902)
+
+    cached = asyncio.run(run())
+    assert cached is not None and cached.body == b'{"id":902}'
+    assert session_result_cache.get(901) is None
@@ -0,0 +1,38 @@
+import pytest
+
+from app.services.session_codec import pack_answers, pack_dimensions, unpack_answers, unpack_dimensions
+
+
+def test_answers_round_trip():
+    answers = [(1, 10), (2, 21), (4294967295, 0), (7, 7)]
+    data = pack_answers(answers)
+    # 1 字节版本号 + 每个答案 8 字节
+    assert len(data) == 1 + 8 * len(answers)
+    assert unpack_answers(data) == answers
+
+
+def test_answers_empty():
+    assert unpack_answers(pack_answers([])) == []
+    assert unpack_answers(None) == []
+    assert unpack_answers(b"") == []
+
+
+def test_answers_unknown_version():
+    data = bytearray(pack_answers([(1, 2)]))
+    data[0] = 99
+    with pytest.raises(ValueError):
+        unpack_answers(bytes(data))
+
+
+def test_dimensions_round_trip():
+    dimensions = [("HR", 31, "中等<SEP>保持良好的健康责任"), ("PA", -3, "分数: -3"), ("SG", 0, "")]
+    data = pack_dimensions(dimensions)
+    # 中文不转义，存储更紧凑
+    assert "中等" in data
+    assert unpack_dimensions(data) == dimensions
+
+
+def test_dimensions_empty():
+    assert unpack_dimensions(pack_dimensions([])) == []
+    assert unpack_dimensions(None) == []
+    assert unpack_dimensions("") == []
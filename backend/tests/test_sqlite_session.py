@@ -0,0 +1,18 @@
+from sqlalchemy import delete, insert, literal, select, text, update
+
+from app.db.sqlite import is_write_statement
+from app.models.models import TestSession
+
+
+def test_only_selects_skip_the_write_lock():
+    assert not is_write_statement(select(literal(1)))
+    assert not is_write_statement(text("  SELECT 1"))
+    assert not is_write_statement(text("select * from tests").columns())
+
+    assert is_write_statement(insert(TestSession))
+    assert is_write_statement(update(TestSession).values(result="r"))
+    assert is_write_statement(delete(TestSession))
+    # text() 写语句没有 is_dml 标记，同样需要写锁
+    assert is_write_statement(text("DELETE FROM test_sessions"))
+    assert is_write_statement(text("INSERT INTO test_stats (test_id, session_count) VALUES (1, 0)"))
+    assert is_write_statement(text("CREATE INDEX ix ON test_sessions (user_id)"))
@@ -0,0 +1,60 @@
+import asyncio
+
+from sqlalchemy import text
+
+from app.db.session import AsyncSessionLocal
+from app.services import test_cache
+from app.services.test_cache import VersionedLRUCache, mark_tests_changed, test_definition_cache
+
+
+def test_put_built_before_invalidate_is_dropped():
+    cache = VersionedLRUCache(max_entries=4)
+    version = cache.version
+    cache.invalidate()
+    # 失效之前开始构建的旧值不会写回
+    cache.put("mbti", "old", version=version)
+    assert cache.get("mbti") is None
+    cache.put("mbti", "new", version=cache.version)
+    assert cache.get("mbti") == "new"
+
+
+def test_lru_eviction_and_ttl(monkeypatch):
+    cache = VersionedLRUCache(max_entries=2, ttl_seconds=10)
+    now = [100.0]
+    monkeypatch.setattr(test_cache.time, "monotonic", lambda: now[0])
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1  # a 变为最近使用
+    cache.put("c", 3)
+    assert cache.get("b") is None and len(cache) == 2
+    now[0] += 11
+    assert cache.get("a") is None
+
+
+def test_invalidated_again_after_commit():
+    test_definition_cache.invalidate()
+
+    async def run():
+        async with AsyncSessionLocal() as db:
+            mark_tests_changed(db)
+            # 提交之前并发请求读到旧定义并写入缓存
+            test_definition_cache.put(("mbti", False), "stale", version=test_definition_cache.version)
+            assert test_definition_cache.get(("mbti", False)) == "stale"
+            await db.commit()
+            return test_definition_cache.get(("mbti", False))
+
+    assert asyncio.run(run()) is None
+
+
+def test_rollback_clears_pending_invalidation():
+    async def run():
+        async with AsyncSessionLocal() as db:
+            await db.execute(text("SELECT 1"))
+            mark_tests_changed(db)
+            await db.rollback()
+            test_definition_cache.put(("mbti", False), "fresh")
+            # 回滚后的下一次提交不再失效
+            await db.commit()
+            return test_definition_cache.get(("mbti", False))
+
+    assert asyncio.run(run()) == "fresh"
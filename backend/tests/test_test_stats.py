@@ -0,0 +1,45 @@
+import asyncio
+
+from sqlalchemy import select
+
+from app.db.base_class import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.models.models import Test, TestSession, TestStats
+from app.services import test_service
+from app.services.stats_service import increment_session_counts, rebuild_test_stats
+
+
+def test_counters_match_rebuild_and_order_popular_tests():
+    async def counts(db, test_ids):
+        rows = await db.execute(
+            select(TestStats.test_id, TestStats.session_count).where(TestStats.test_id.in_(test_ids))
+        )
+        return dict(rows.all())
+
+    async def run():
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        async with AsyncSessionLocal() as db:
+            tests = [Test(test_type=f"stats-{i}", title=f"Stats {i}", description="d") for i in range(3)]
+            db.add_all(tests)
+            await db.flush()
+            ids = [t.id for t in tests]
+            # 第三个测试没有会话
+            for test_id, n in ((ids[0], 2), (ids[1], 5)):
+                db.add_all(TestSession(user_id="u", test_id=test_id, result="r", total_score=0) for _ in range(n))
+            # 提交路径分两次累加：第一次插入计数行，第二次在已有行上累加
+            await increment_session_counts(db, {ids[0]: 1, ids[1]: 5})
+            await increment_session_counts(db, {ids[0]: 1})
+            await db.commit()
+            incremental = await counts(db, ids)
+
+            await rebuild_test_stats(db)
+            await db.commit()
+            rebuilt = await counts(db, ids)
+            popular = [t.id for t in await test_service.get_popular_tests(db, limit=100) if t.id in ids]
+            return ids, incremental, rebuilt, popular
+
+    ids, incremental, rebuilt, popular = asyncio.run(run())
+    assert incremental == {ids[0]: 2, ids[1]: 5}
+    assert rebuilt == {ids[0]: 2, ids[1]: 5, ids[2]: 0}
+    assert popular == [ids[1], ids[0]]
@@ -0,0 +1,69 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+from app.db.base_class import Base
+from app.db.session import AsyncSessionLocal, engine
+from app.models.models import Test, TestSession
+from app.services import session_service
+
+USER = "history-user"
+
+
+async def seed_sessions():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with AsyncSessionLocal() as db:
+        test = Test(test_type="history", title="History", description="d")
+        db.add(test)
+        await db.flush()
+        start = datetime(2026, 1, 1)
+        # 每两个会话共用一个 created_at：同一时间内按 id 倒序
+        for i in range(7):
+            for user_id in (USER, "someone-else"):
+                db.add(TestSession(
+                    user_id=user_id, test_id=test.id, result="r", total_score=i,
+                    created_at=start + timedelta(minutes=i // 2),
+                ))
+        await db.commit()
+
+
+async def walk(limit, as_dict):
+    pages, cursor = [], None
+    async with AsyncSessionLocal() as db:
+        while True:
+            page = await session_service.get_user_sessions(
+                db, USER, limit=limit, cursor=cursor, as_dict=as_dict
+            )
+            items = page["items"] if as_dict else [item.model_dump() for item in page.items]
+            cursor = page["next_cursor"] if as_dict else page.next_cursor
+            pages.append(items)
+            if cursor is None:
+                return pages
+
+
+def test_keyset_pages_cover_history_in_order():
+    async def run():
+        await seed_sessions()
+        return await walk(2, as_dict=False), await walk(3, as_dict=True)
+
+    by_two, by_three = asyncio.run(run())
+    assert [len(p) for p in by_two] == [2, 2, 2, 1]
+    assert [len(p) for p in by_three] == [3, 3, 1]
+    keys = [(item["created_at"], item["id"]) for page in by_two for item in page]
+    assert keys == sorted(keys, reverse=True) and len(set(keys)) == 7
+    assert [item["total_score"] for page in by_two for item in page] == [6, 5, 4, 3, 2, 1, 0]
+    assert all(item["user_id"] == USER for page in by_two for item in page)
+    assert keys == [(item["created_at"], item["id"]) for page in by_three for item in page]
+
+
+def test_cursor_round_trip_and_invalid_cursor():
+    created_at = datetime(2026, 1, 1, 8, 30)
+    cursor = session_service.encode_session_cursor(created_at, 42)
+    assert "=" not in cursor
+    assert session_service.decode_session_cursor(cursor) == (created_at, 42)
+    with pytest.raises(HTTPException) as e:
+        session_service.decode_session_cursor("not-a-cursor")
+    assert e.value.status_code == 400
@@ -0,0 +1,109 @@
+import asyncio
+import json
+import os
+
+from sqlalchemy import select
+from sqlalchemy.exc import IntegrityError
+
+from app.core.clock import utc_now
+from app.db.session import AsyncSessionLocal, engine
+from app.models.models import WriteBehindCheckpoint
+from app.services import write_behind
+from app.services.session_service import ScoredSession
+
+
+def make_scored(user_id: str) -> ScoredSession:
+    return ScoredSession(user_id, 1, "r", 3, utc_now(), [(1, 2)], [("A", 3, "中")])
+
+
+def make_buffer(spool_dir, max_attempts=5) -> write_behind.WriteBehindBuffer:
+    return write_behind.WriteBehindBuffer(
+        spool_dir=str(spool_dir), max_queue=100, max_batch=10, flush_interval=0.01,
+        max_attempts=max_attempts, adopt_interval=60.0,
+    )
+
+
+async def create_checkpoints_table():
+    async with engine.begin() as conn:
+        await conn.run_sync(WriteBehindCheckpoint.__table__.create, checkfirst=True)
+        await conn.execute(WriteBehindCheckpoint.__table__.delete())
+
+
+async def checkpoints():
+    async with AsyncSessionLocal() as db:
+        return (await db.execute(select(WriteBehindCheckpoint.spool_id, WriteBehindCheckpoint.seq))).all()
+
+
+def fake_save(monkeypatch, saved, bad=()):
+    async def save(db, sessions):
+        if any(s.user_id in bad for s in sessions):
+            raise IntegrityError("INSERT", {}, Exception("bad row"))
+        saved.extend(s.user_id for s in sessions)
+    monkeypatch.setattr(write_behind, "save_scored_sessions", save)
+
+
+async def wait_until(condition, timeout=2.0):
+    for _ in range(int(timeout / 0.01)):
+        if condition():
+            return
+        await asyncio.sleep(0.01)
+    raise AssertionError("timed out")
+
+
+def test_orphan_spool_replays_after_checkpoint(tmp_path, monkeypatch):
+    saved = []
+    fake_save(monkeypatch, saved)
+
+    # 已退出进程的 spool：seq 1 已写入 (检查点)，最后一行只写了一半
+    orphan = tmp_path / "999-dead.spool"
+    with open(orphan, "w", encoding="utf-8") as f:
+        for seq in (1, 2, 3):
+            record = {"seq": seq, "session": write_behind._encode(make_scored(f"u{seq}"))}
+            f.write(json.dumps(record) + "\n")
+        f.write('{"seq": 4, "sess')
+
+    async def run():
+        await create_checkpoints_table()
+        async with AsyncSessionLocal() as db:
+            db.add(WriteBehindCheckpoint(spool_id="999-dead", seq=1))
+            await db.commit()
+        buffer = make_buffer(tmp_path)
+        await buffer.start()
+        await wait_until(lambda: buffer.adopted_total == 1 and not orphan.exists())
+        await buffer.stop()
+        return await checkpoints()
+
+    assert asyncio.run(run()) == []
+    assert saved == ["u2", "u3"]
+    assert os.listdir(tmp_path) == []
+
+
+def test_failing_record_is_dead_lettered(tmp_path, monkeypatch):
+    saved = []
+    fake_save(monkeypatch, saved, bad={"bad"})
+
+    async def run():
+        await create_checkpoints_table()
+        buffer = make_buffer(tmp_path, max_attempts=2)
+        await buffer.start()
+        for user_id in ("u1", "bad", "u2"):
+            await buffer.submit(make_scored(user_id))
+        await wait_until(lambda: buffer.pending == 0)
+        state = (buffer.dead_lettered_total, buffer._own.spool_id, await checkpoints())
+        await buffer.stop()
+        return state
+
+    dead, spool_id, rows = asyncio.run(run())
+    assert dead == 1
+    assert saved == ["u1", "u2"]
+    assert rows == [(spool_id, 3)]
+    with open(tmp_path / f"{spool_id}.dead.ndjson", encoding="utf-8") as f:
+        record = json.loads(f.readline())
+    assert record["seq"] == 2 and record["session"]["user_id"] == "bad" and record["attempts"] == 2
+    # 正常停止时删除自己的 spool，只留下死信文件
+    assert os.listdir(tmp_path) == [f"{spool_id}.dead.ndjson"]
+
+
+def test_overlong_fields_are_rejected():
+    assert write_behind._fits_columns(make_scored("u"))
+    assert not write_behind._fits_columns(make_scored("u" * 256))